@@ -0,0 +1,184 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from PySide2.QtCore import QObject, Signal
+
+from .ReadVersionResolver import ReadVersionResolver
+from .RenderCatalog import RenderCatalog
+from .ShotIndex import ShotIndex
+from .VersionPolicy import VersionPolicy
+
+# ######################################################################################################################
+
+_MAX_WORKERS = 2
+
+
+# ######################################################################################################################
+
+
+class AsyncRefresh(QObject):
+    """
+    Scan the shot and resolve the versions in worker threads. The results are sent with signals so they are
+    received in the thread of the panel, a new request makes the results of the previous ones stale
+    """
+    # request id, shot path
+    shot_scanned = Signal(int, str)
+    # request id, layer, (version, beauty sequence, utility sequence) or None, layer has versions
+    layer_resolved = Signal(int, str, object, bool)
+    # request id, [(layer, current version, last version, last version path, read node), ...]
+    reads_resolved = Signal(int, object)
+    # request id, comp cost or None if it can't be estimated
+    cost_estimated = Signal(int, object)
+    # request id
+    finished = Signal(int)
+
+    def __init__(self, parent=None):
+        """
+        Constructor
+        :param parent
+        """
+        super(AsyncRefresh, self).__init__(parent)
+        self.__executor = ThreadPoolExecutor(max_workers=_MAX_WORKERS)
+        self.__request_id = 0
+        self.__lock = threading.Lock()
+
+    def request(self, shot_path, read_paths, policy):
+        """
+        Start a new refresh and cancel the previous ones
+        :param shot_path : shot to scan or None to not refresh the layers
+        :param read_paths : [(read node, file path), ...] gathered in the main thread or None to not refresh the reads
+        :param policy : version policy
+        :return: request id
+        """
+        with self.__lock:
+            self.__request_id += 1
+            request_id = self.__request_id
+        self.__executor.submit(self.__run, request_id, shot_path, read_paths, policy)
+        return request_id
+
+    def request_cost(self, shot_path, estimator, policy):
+        """
+        Start a new estimate of the cost of a comp and cancel the previous requests
+        :param shot_path
+        :param estimator : comp cost estimator of the unpack mode
+        :param policy : version policy
+        :return: request id
+        """
+        with self.__lock:
+            self.__request_id += 1
+            request_id = self.__request_id
+        self.__executor.submit(self.__run_cost, request_id, shot_path, estimator, policy)
+        return request_id
+
+    def cancel(self):
+        """
+        Make all the running requests stale
+        :return:
+        """
+        with self.__lock:
+            self.__request_id += 1
+
+    def is_current(self, request_id):
+        """
+        Getter of whether a request is the last one
+        :param request_id
+        :return: is current
+        """
+        with self.__lock:
+            return request_id == self.__request_id
+
+    def shutdown(self):
+        """
+        Cancel the requests and stop the workers
+        :return:
+        """
+        self.cancel()
+        self.__executor.shutdown(wait=False)
+
+    def __emit(self, request_id, signal, *args):
+        """
+        Emit a signal if the request is still the current one
+        :param request_id
+        :param signal
+        :param args
+        :return: is emitted
+        """
+        if not self.is_current(request_id):
+            return False
+        try:
+            signal.emit(request_id, *args)
+        except RuntimeError:
+            # The panel has been deleted
+            self.cancel()
+            return False
+        return True
+
+    def __run(self, request_id, shot_path, read_paths, policy):
+        """
+        Worker function of a request
+        :param request_id
+        :param shot_path
+        :param read_paths
+        :param policy
+        :return:
+        """
+        try:
+            if shot_path is not None:
+                self.__run_layers(request_id, shot_path, policy)
+            if read_paths is not None:
+                self.__run_reads(request_id, read_paths, policy)
+            self.__emit(request_id, self.finished)
+        except Exception as e:
+            print("### Warning : AsyncRefresh failed : " + str(e))
+
+    def __run_cost(self, request_id, shot_path, estimator, policy):
+        """
+        Worker function of a cost estimate
+        :param request_id
+        :param shot_path
+        :param estimator
+        :param policy
+        :return:
+        """
+        try:
+            cost = estimator.estimate(shot_path, policy)
+        except Exception as e:
+            print("### Warning : Comp cost estimate failed : " + str(e))
+            cost = None
+        self.__emit(request_id, self.cost_estimated, cost)
+
+    def __run_layers(self, request_id, shot_path, policy):
+        """
+        Scan the shot and resolve the version of each layer
+        :param request_id
+        :param shot_path
+        :param policy
+        :return:
+        """
+        # The scan stops as soon as a new request is made (shot path edited again for instance)
+        shot_index = ShotIndex.get_index(shot_path, is_cancelled=lambda: not self.is_current(request_id))
+        if shot_index is None or not self.__emit(request_id, self.shot_scanned, shot_path):
+            return
+        latest_policy = VersionPolicy()
+        for layer in shot_index.get_layers():
+            version_data = policy.resolve(shot_index, layer)
+            has_versions = version_data is not None or latest_policy.resolve(shot_index, layer) is not None
+            if not self.__emit(request_id, self.layer_resolved, layer, version_data, has_versions):
+                return
+
+    def __run_reads(self, request_id, read_paths, policy):
+        """
+        Resolve the last versions of the read nodes, one layer folder at a time.
+        The shots stored in the render catalog are resolved first from it then from the scan
+        :param request_id
+        :param read_paths
+        :param policy
+        :return:
+        """
+        if RenderCatalog.get_current() is not None:
+            for folder_resolved in ReadVersionResolver(policy, catalog_only=True).iter_resolve(read_paths):
+                if not self.__emit(request_id, self.reads_resolved, folder_resolved):
+                    return
+        for folder_resolved in ReadVersionResolver(policy).iter_resolve(read_paths):
+            if not self.__emit(request_id, self.reads_resolved, folder_resolved):
+                return
@@ -1,5 +1,4 @@
 import os
-import re
 import sys
 
 from PySide2 import QtCore
@@ -19,6 +18,21 @@ from nukescripts import panels
 from .AutoCompFactory import AutoCompFactory
 from .ShuffleMode import ShuffleMode
 from .UnpackMode import UnpackMode
+from .ShotIndex import ShotIndex
+from .AsyncRefresh import AsyncRefresh
+from .RenderWatcher import RenderWatcher
+from .ReadVersionResolver import ReadVersionResolver
+from .PathCache import PathCache
+from .ShotPrefetcher import ShotPrefetcher
+from .RenderCatalog import RenderCatalog
+from .IndexDaemonClient import IndexDaemonClient
+from .FrameCache import FrameCache
+from .ReadLocalizer import *
+from .ShotBrowser import ShotBrowser
+from .ChannelCatalog import ChannelCatalog
+from .CompCostEstimator import CompCostEstimator
+from .ExrPixelStats import ExrPixelStats, DEFAULT_EMPTY_THRESHOLD
+from .VersionPolicy import *
 
 # ######################################################################################################################
 
@@ -30,6 +44,11 @@ _UNPACK_MODES_DIR = os.path.dirname(__file__) + "/mode"
 
 _COLOR_GREY_DISABLE = 105,105,105
 
+# Delay after the last edit of the shot path before scanning it
+_SHOT_PATH_DEBOUNCE_MS = 400
+
+_BYTES_PER_GB = 1024 ** 3
+
 
 # ######################################################################################################################
 
@@ -38,11 +57,11 @@ class AutoComp(QWidget):
     @staticmethod
     def __is_correct_shot_folder(folder):
         """
-        Test if a folder is a correct shot path
+        Test if a folder is a correct shot path (the result is cached for a short time)
         :param folder
         :return: is correct shot folder
         """
-        return os.path.isdir(os.path.join(folder, "render_out")) and os.path.isdir(folder)
+        return PathCache.is_dir(os.path.join(folder, "render_out")) and PathCache.is_dir(folder)
 
     def __init__(self, prt=None):
         super(AutoComp, self).__init__(prt)
@@ -61,8 +80,26 @@ class AutoComp(QWidget):
         self.__selected_read_node = None
         self.__read_nodes_list_for_update = []
         self.__selected_read_nodes_for_update_data = []
+        self.__version_policy_mode = POLICY_LATEST
+        self.__settle_time = DEFAULT_SETTLE_TIME
+        self.__watch_renders = False
+        self.__skip_empty_light_groups = False
+        # Path of the render catalog database ("" to disable it)
+        self.__render_catalog_path = ""
+        self.__frame_cache_enabled = False
+        self.__localize_mode = LOCALIZE_MODE_COPY
+        self.__frame_cache_budget_gb = FrameCache.get_current().get_budget() // _BYTES_PER_GB
+        self.__selected_frame_cache_entries = []
+        # {network path: [read nodes to repoint once the sequence is copied]}
+        self.__localizing_reads = {}
+        # {network version folder: copy progress in percent}
+        self.__localize_progress = {}
 
         self.__retrieve_unpack_modes(_UNPACK_MODES_DIR)
+        # Start from fresh shot indexes when the panel is opened
+        ShotIndex.invalidate()
+        # The shots are scanned by the index daemon of the workstation when it is running
+        ShotIndex.set_index_provider(IndexDaemonClient.get_index)
 
         # UI attributes
         self.__ui_width = 400
@@ -73,9 +110,25 @@ class AutoComp(QWidget):
 
         self.__retrieve_prefs()
         self.__retrieve_default_unpack_mode()
-        self.__retrieve_read_nodes_to_update()
 
-        self.__scan_layers()
+        # Scan of the shot and resolution of the versions in worker threads (one for the layers, one for the reads)
+        self.__async_layers = AsyncRefresh(self)
+        self.__async_layers.shot_scanned.connect(self.__on_shot_scanned)
+        self.__async_layers.layer_resolved.connect(self.__on_layer_resolved)
+        self.__async_reads = AsyncRefresh(self)
+        self.__async_reads.reads_resolved.connect(self.__on_reads_resolved)
+        # Estimate of the cost of the comp of the selected unpack mode (from the EXR headers, without Nuke)
+        self.__async_cost = AsyncRefresh(self)
+        self.__async_cost.cost_estimated.connect(self.__on_cost_estimated)
+        # Watcher of the new renders of the shot
+        self.__render_watcher = RenderWatcher(self)
+        self.__render_watcher.layers_changed.connect(self.__on_layers_changed)
+        # Warm the indexes of the next shots of the sequence
+        self.__shot_prefetcher = ShotPrefetcher()
+        # Copy of the sequences of the Read nodes in the local frame cache
+        self.__read_localizer = ReadLocalizer(self)
+        self.__read_localizer.progress.connect(self.__on_localize_progress)
+        self.__read_localizer.localized.connect(self.__on_read_localized)
 
         # name the window
         self.setWindowTitle("AutoComp")
@@ -87,6 +140,24 @@ class AutoComp(QWidget):
         # Create the layout, linking it to actions and refresh the display
         self.__create_ui()
         self.__refresh_ui()
+        # Fill the layers and the read nodes as the results arrive
+        self.__request_refresh()
+
+    def closeEvent(self, event):
+        """
+        Stop the workers on close
+        :param event
+        :return:
+        """
+        self.__async_layers.shutdown()
+        self.__async_reads.shutdown()
+        self.__async_cost.shutdown()
+        self.__render_watcher.stop()
+        self.__shot_prefetcher.cancel()
+        self.__read_localizer.shutdown()
+        self.__ui_shot_browser.shutdown()
+        ChannelCatalog.get_current().save()
+        super(AutoComp, self).closeEvent(event)
 
     def showEvent(self, arg__1):
         """
@@ -104,6 +175,7 @@ class AutoComp(QWidget):
         """
         # self.remove_callbacks()
         self.__save_prefs()
+        ChannelCatalog.get_current().save()
 
     def remove_callbacks(self):
         """
@@ -119,6 +191,15 @@ class AutoComp(QWidget):
         """
         if self.__selected_unpack_mode is not None:
             self.__prefs["unpack_mode"] = self.__selected_unpack_mode.get_name()
+        self.__prefs["scan_threads"] = ShotIndex.get_scan_threads()
+        self.__prefs["version_policy"] = self.__version_policy_mode
+        self.__prefs["settle_time"] = self.__settle_time
+        self.__prefs["watch_renders"] = self.__watch_renders
+        self.__prefs["skip_empty_light_groups"] = self.__skip_empty_light_groups
+        self.__prefs["render_catalog"] = self.__render_catalog_path
+        self.__prefs["frame_cache"] = self.__frame_cache_enabled
+        self.__prefs["localize_mode"] = self.__localize_mode
+        self.__prefs["frame_cache_budget"] = self.__frame_cache_budget_gb
 
     def __retrieve_prefs(self):
         """
@@ -126,10 +207,60 @@ class AutoComp(QWidget):
         :return:
         """
         self.__retrieve_unpack_mode_prefs()
+        self.__retrieve_scan_prefs()
+        self.__retrieve_version_policy_prefs()
+        self.__retrieve_frame_cache_prefs()
+
+    def __retrieve_scan_prefs(self):
+        """
+        Retrieve the number of threads used to scan the shots and the render catalog stored in preferences
+        :return:
+        """
+        if "scan_threads" in self.__prefs:
+            try:
+                ShotIndex.set_scan_threads(int(self.__prefs["scan_threads"]))
+            except (TypeError, ValueError):
+                pass
+        if "render_catalog" in self.__prefs and self.__prefs["render_catalog"]:
+            self.__render_catalog_path = str(self.__prefs["render_catalog"])
+        RenderCatalog.set_path(self.__render_catalog_path)
+
+    def __retrieve_version_policy_prefs(self):
+        """
+        Retrieve the version policy and its settle time stored in preferences
+        :return:
+        """
+        if "version_policy" in self.__prefs and str(self.__prefs["version_policy"]) in POLICIES:
+            self.__version_policy_mode = str(self.__prefs["version_policy"])
+        if "settle_time" in self.__prefs:
+            try:
+                self.__settle_time = float(self.__prefs["settle_time"])
+            except (TypeError, ValueError):
+                pass
+        if "watch_renders" in self.__prefs:
+            self.__watch_renders = bool(self.__prefs["watch_renders"])
+
+    def __retrieve_frame_cache_prefs(self):
+        """
+        Retrieve the frame cache options stored in preferences
+        :return:
+        """
+        if "frame_cache" in self.__prefs:
+            self.__frame_cache_enabled = bool(self.__prefs["frame_cache"])
+        if "localize_mode" in self.__prefs and str(self.__prefs["localize_mode"]) in LOCALIZE_MODES:
+            self.__localize_mode = str(self.__prefs["localize_mode"])
+        if "frame_cache_budget" in self.__prefs:
+            try:
+                self.__frame_cache_budget_gb = max(1, int(self.__prefs["frame_cache_budget"]))
+            except (TypeError, ValueError):
+                pass
+        # The sequences read by the localized Read nodes of the script must not be evicted by the new budget
+        self.__pin_localized_reads()
+        FrameCache.get_current().set_budget(self.__frame_cache_budget_gb * _BYTES_PER_GB)
 
     def __retrieve_unpack_mode_prefs(self):
         """
-        Retrieve the mode stored in preferences
+        Retrieve the mode and the empty light groups option stored in preferences
         :return:
         """
         if "unpack_mode" in self.__prefs:
@@ -138,6 +269,17 @@ class AutoComp(QWidget):
                 if unpack_mode.get_name() == str(sel_unpack_mode_name):
                     self.__selected_unpack_mode = unpack_mode
                     break
+        if "skip_empty_light_groups" in self.__prefs:
+            self.__skip_empty_light_groups = bool(self.__prefs["skip_empty_light_groups"])
+        self.__refresh_empty_light_group_threshold()
+
+    def __refresh_empty_light_group_threshold(self):
+        """
+        Enable the skip of the empty light groups of the Unpack Modes if the option is checked
+        :return:
+        """
+        UnpackMode.set_empty_light_group_threshold(
+            DEFAULT_EMPTY_THRESHOLD if self.__skip_empty_light_groups and ExrPixelStats.is_available() else None)
 
     def __retrieve_unpack_modes(self, unpack_mode_dir):
         """
@@ -230,16 +372,29 @@ class AutoComp(QWidget):
 
         self.__ui_shot_path = QLineEdit(self.__shot_path)
         self.__ui_shot_path.setPlaceholderText("Path of the shot to AutoComp")
-        self.__ui_shot_path.textChanged.connect(self.__on_folder_changed)
+        # The shot is scanned only once the path is not edited anymore
+        self.__shot_path_timer = QTimer(self)
+        self.__shot_path_timer.setSingleShot(True)
+        self.__shot_path_timer.setInterval(_SHOT_PATH_DEBOUNCE_MS)
+        self.__shot_path_timer.timeout.connect(self.__on_folder_changed)
+        self.__ui_shot_path.textChanged.connect(self.__on_folder_edited)
         browse_shot_path_lyt.addWidget(self.__ui_shot_path)
 
         browse_btn = QPushButton()
         browse_btn.setIconSize(QtCore.QSize(18, 18))
         browse_btn.setFixedSize(QtCore.QSize(24, 24))
         browse_btn.setIcon(QIcon(QPixmap(browse_icon_path)))
+        browse_btn.setToolTip("Browse the shots of the project")
         browse_btn.clicked.connect(partial(self.__browse_folder))
         browse_shot_path_lyt.addWidget(browse_btn)
 
+        # The project tree is filled from a cache and listed in the background instead of a native dialog
+        self.__ui_shot_browser = ShotBrowser(_DEFAULT_SHOT_DIR)
+        self.__ui_shot_browser.setMinimumHeight(200)
+        self.__ui_shot_browser.shot_selected.connect(self.__on_browser_shot_selected)
+        self.__ui_shot_browser.hide()
+        shot_path_lyt.addWidget(self.__ui_shot_browser)
+
         unpack_mode_lyt = QVBoxLayout()
         unpack_mode_lyt.setSpacing(5)
         unpack_mode_lyt.setAlignment(Qt.AlignTop)
@@ -255,6 +410,38 @@ class AutoComp(QWidget):
         self.__ui_unpack_mode.currentIndexChanged.connect(self.__on_unpack_mode_changed)
         unpack_mode_lyt.addWidget(self.__ui_unpack_mode)
 
+        lbl_version_policy = QLabel("Version")
+        unpack_mode_lyt.addWidget(lbl_version_policy)
+
+        self.__ui_version_policy = QComboBox()
+        for policy in POLICIES:
+            self.__ui_version_policy.addItem(POLICY_LABELS[policy], userData=policy)
+        self.__ui_version_policy.setToolTip("Latest : last version with frames\n"
+                                            "Latest complete : last version without missing frames\n"
+                                            "Latest stable : last complete version without new frames for "
+                                            + str(int(self.__settle_time)) + "s")
+        self.__ui_version_policy.setCurrentIndex(POLICIES.index(self.__version_policy_mode))
+        self.__ui_version_policy.currentIndexChanged.connect(self.__on_version_policy_changed)
+        unpack_mode_lyt.addWidget(self.__ui_version_policy)
+
+        self.__ui_watch_renders = QCheckBox("Watch new renders")
+        self.__ui_watch_renders.setToolTip("Update the layers and the Update Reads table when new versions or frames "
+                                           "are written in the render_out folder of the shot")
+        self.__ui_watch_renders.setChecked(self.__watch_renders)
+        self.__ui_watch_renders.stateChanged.connect(self.__on_watch_renders_changed)
+        unpack_mode_lyt.addWidget(self.__ui_watch_renders)
+
+        self.__ui_skip_empty_light_groups = QCheckBox("Skip empty light groups")
+        if ExrPixelStats.is_available():
+            self.__ui_skip_empty_light_groups.setToolTip(
+                "Decode a few frames of each layer and don't shuffle the light groups that are black in all of them")
+        else:
+            self.__ui_skip_empty_light_groups.setToolTip("Needs NumPy")
+            self.__ui_skip_empty_light_groups.setEnabled(False)
+        self.__ui_skip_empty_light_groups.setChecked(self.__skip_empty_light_groups)
+        self.__ui_skip_empty_light_groups.stateChanged.connect(self.__on_skip_empty_light_groups_changed)
+        unpack_mode_lyt.addWidget(self.__ui_skip_empty_light_groups)
+
         content_shot_autocomp_lyt = QGridLayout()
         content_shot_autocomp_lyt.setSpacing(5)
         shot_to_autocomp_lyt.addLayout(content_shot_autocomp_lyt)
@@ -286,6 +473,10 @@ class AutoComp(QWidget):
         self.__ui_shuffle_layer_btn.clicked.connect(self.__shuffle_layer)
         content_shot_autocomp_lyt.addWidget(self.__ui_shuffle_layer_btn,2,1)
 
+        self.__ui_comp_cost = QLabel()
+        self.__ui_comp_cost.setWordWrap(True)
+        content_shot_autocomp_lyt.addWidget(self.__ui_comp_cost, 3, 0, 1, 2)
+
         # SHUFFLE READ CHANNEL PART
 
         shuffle_read_channel_lyt = QVBoxLayout()
@@ -324,7 +515,7 @@ class AutoComp(QWidget):
         refresh_reads_to_update_btn.setIconSize(QtCore.QSize(16, 16))
         refresh_reads_to_update_btn.setFixedSize(QtCore.QSize(24, 24))
         refresh_reads_to_update_btn.setIcon(QIcon(QPixmap(reload_icon_path)))
-        refresh_reads_to_update_btn.clicked.connect(partial(self.__refresh_read_nodes_to_update))
+        refresh_reads_to_update_btn.clicked.connect(partial(self.__reload_shots))
 
         update_reads_lyt.addLayout(AutoComp.__get_header_ui("Update Reads", button = refresh_reads_to_update_btn))
 
@@ -344,6 +535,65 @@ class AutoComp(QWidget):
         self.__ui_update_reads_btn.clicked.connect(self.__update_read)
         update_reads_lyt.addWidget(self.__ui_update_reads_btn)
 
+        # FRAME CACHE PART
+
+        frame_cache_lyt = QVBoxLayout()
+        frame_cache_lyt.setSpacing(8)
+        frame_cache_lyt.setContentsMargins(0, 0, 0, 15)
+        main_lyt.addLayout(frame_cache_lyt)
+
+        frame_cache_lyt.addLayout(AutoComp.__get_header_ui("Frame Cache"))
+
+        frame_cache_options_lyt = QHBoxLayout()
+        frame_cache_lyt.addLayout(frame_cache_options_lyt)
+
+        self.__ui_frame_cache = QCheckBox("Localize reads")
+        self.__ui_frame_cache.setToolTip("Copy the sequences of the selected layers on the local disk and read them "
+                                         "from there. Unchecking points the Read nodes back to the network")
+        self.__ui_frame_cache.setChecked(self.__frame_cache_enabled)
+        self.__ui_frame_cache.stateChanged.connect(self.__on_frame_cache_changed)
+        frame_cache_options_lyt.addWidget(self.__ui_frame_cache)
+
+        self.__ui_localize_mode = QComboBox()
+        for localize_mode in LOCALIZE_MODES:
+            self.__ui_localize_mode.addItem(LOCALIZE_MODE_LABELS[localize_mode], userData=localize_mode)
+        self.__ui_localize_mode.setCurrentIndex(LOCALIZE_MODES.index(self.__localize_mode))
+        self.__ui_localize_mode.currentIndexChanged.connect(self.__on_localize_mode_changed)
+        frame_cache_options_lyt.addWidget(self.__ui_localize_mode)
+
+        self.__ui_frame_cache_budget = QSpinBox()
+        self.__ui_frame_cache_budget.setRange(1, 10000)
+        self.__ui_frame_cache_budget.setSuffix(" GB")
+        self.__ui_frame_cache_budget.setToolTip("Maximum size of the frame cache, the least recently used versions "
+                                                "are evicted beyond it")
+        self.__ui_frame_cache_budget.setValue(self.__frame_cache_budget_gb)
+        self.__ui_frame_cache_budget.valueChanged.connect(self.__on_frame_cache_budget_changed)
+        frame_cache_options_lyt.addWidget(self.__ui_frame_cache_budget)
+
+        self.__ui_frame_cache_table = QTableWidget(0, 3)
+        self.__ui_frame_cache_table.setHorizontalHeaderLabels(["Version", "Size", "State"])
+        self.__ui_frame_cache_table.setSizePolicy(QSizePolicy.Minimum, QSizePolicy.MinimumExpanding)
+        self.__ui_frame_cache_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.__ui_frame_cache_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.__ui_frame_cache_table.verticalHeader().hide()
+        self.__ui_frame_cache_table.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.__ui_frame_cache_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.__ui_frame_cache_table.itemSelectionChanged.connect(self.__on_frame_cache_entry_selected)
+        frame_cache_lyt.addWidget(self.__ui_frame_cache_table)
+
+        frame_cache_btn_lyt = QHBoxLayout()
+        frame_cache_lyt.addLayout(frame_cache_btn_lyt)
+
+        self.__ui_localize_layers_btn = QPushButton("Localize selected layers")
+        self.__ui_localize_layers_btn.setFixedHeight(30)
+        self.__ui_localize_layers_btn.clicked.connect(self.__localize_selected_layers)
+        frame_cache_btn_lyt.addWidget(self.__ui_localize_layers_btn)
+
+        self.__ui_evict_btn = QPushButton("Evict selected versions")
+        self.__ui_evict_btn.setFixedHeight(30)
+        self.__ui_evict_btn.clicked.connect(self.__evict_selected_versions)
+        frame_cache_btn_lyt.addWidget(self.__ui_evict_btn)
+
     def __refresh_ui(self):
         """
         Refresh the ui according to the model attribute
@@ -357,6 +607,8 @@ class AutoComp(QWidget):
         self.__refresh_shuffle_channel_btn()
         self.__refresh_update_reads_table()
         self.__refresh_update_read_node_btn()
+        self.__refresh_frame_cache_table()
+        self.__refresh_frame_cache_btns()
 
     def __refresh_shot_autocomp_btn(self):
         """
@@ -366,6 +618,15 @@ class AutoComp(QWidget):
         self.__refresh_shuffle_layer_btn()
         self.__refresh_autocomp_btn()
 
+    def __refresh_frame_cache_btns(self):
+        """
+        Refresh the buttons of the frame cache part
+        :return:
+        """
+        self.__ui_localize_mode.setEnabled(self.__frame_cache_enabled)
+        self.__ui_localize_layers_btn.setEnabled(self.__frame_cache_enabled and len(self.__selected_layers) > 0)
+        self.__ui_evict_btn.setEnabled(len(self.__selected_frame_cache_entries) > 0)
+
     def __refresh_shuffle_layer_btn(self):
         """
         Refresh the shuffle layer button
@@ -373,7 +634,7 @@ class AutoComp(QWidget):
         """
         self.__ui_shuffle_layer_btn.setEnabled(
             len(self.__selected_layers) > 0 and self.__selected_unpack_mode is not None and
-            os.path.isdir(os.path.join(self.__shot_path, "render_out")))
+            self.__has_render_out())
 
     def __refresh_autocomp_btn(self):
         """
@@ -381,7 +642,16 @@ class AutoComp(QWidget):
         :return:
         """
         self.__ui_autocomp_btn.setEnabled(
-            self.__selected_unpack_mode is not None and os.path.isdir(os.path.join(self.__shot_path, "render_out")))
+            self.__selected_unpack_mode is not None and self.__has_render_out())
+
+    def __has_render_out(self):
+        """
+        Check if the current shot has a render_out folder without querying the disk each time
+        :return: has render out
+        """
+        if ShotIndex.get_cached_index(self.__shot_path) is not None:
+            return True
+        return PathCache.is_dir(ShotIndex.get_shot_render_path(self.__shot_path))
 
     def __refresh_unpack_modes(self):
         """
@@ -391,42 +661,138 @@ class AutoComp(QWidget):
         for index in range(self.__ui_unpack_mode.count()):
             if self.__ui_unpack_mode.itemData(index, Qt.UserRole) == self.__selected_unpack_mode:
                 self.__ui_unpack_mode.setCurrentIndex(index)
+        self.__refresh_unpack_modes_coverage()
+
+    def __refresh_unpack_modes_coverage(self):
+        """
+        Show for each Unpack Mode how many layers of the shot it covers and which ones it misses
+        (evaluated on the index of the shot, without access to disk)
+        :return:
+        """
+        shot_index = ShotIndex.get_cached_index(self.__shot_path, use_catalog=True)
+        for index in range(self.__ui_unpack_mode.count()):
+            unpack_mode = self.__ui_unpack_mode.itemData(index, Qt.UserRole)
+            if shot_index is None or not shot_index.exists():
+                self.__ui_unpack_mode.setItemText(index, unpack_mode.get_name())
+                self.__ui_unpack_mode.setItemData(index, None, Qt.ToolTipRole)
+                continue
+            covered_layers, missed_layers = unpack_mode.get_layer_coverage(shot_index)
+            self.__ui_unpack_mode.setItemText(index, "%s   [%d/%d layers]" % (
+                unpack_mode.get_name(), len(covered_layers), len(covered_layers) + len(missed_layers)))
+            self.__ui_unpack_mode.setItemData(
+                index, "Missed : " + ", ".join(missed_layers) if len(missed_layers) > 0 else "All the layers covered",
+                Qt.ToolTipRole)
 
     def __refresh_layers_list(self):
         """
-        Refresh the layer start var list of the current mode
+        Refresh the layer start var list of the current mode (only if the shot is already scanned)
         :return:
         """
         self.__ui_layers_list.clear()
-        # Check existence shot path
-        if not os.path.isdir(self.__shot_path): return
+        # Check existence render path (the shot stored in the render catalog is shown until it is scanned)
+        shot_index = ShotIndex.get_cached_index(self.__shot_path, use_catalog=True)
+        if shot_index is None: return
+
+        policy = VersionPolicy.get_current()
+        latest_policy = VersionPolicy()
+        for render_layer in shot_index.get_layers():
+            version_data = policy.resolve(shot_index, render_layer)
+            has_versions = version_data is not None or latest_policy.resolve(shot_index, render_layer) is not None
+            self.__add_layer_item(render_layer, version_data, has_versions)
+
+    def __add_layer_item(self, render_layer, version_data, has_versions):
+        """
+        Add a layer to the layer list
+        :param render_layer
+        :param version_data : version, beauty sequence, utility sequence accepted by the version policy or None
+        :param has_versions : whether the layer has a version with frames
+        :return:
+        """
+        item = self.__create_layer_item(render_layer, version_data, has_versions)
+        if item is not None:
+            self.__ui_layers_list.addItem(item)
 
-        if self.__shot_path.endswith("render_out"):
-            render_path = self.__shot_path
+    def __create_layer_item(self, render_layer, version_data, has_versions):
+        """
+        Create the item of a layer of the layer list
+        :param render_layer
+        :param version_data : version, beauty sequence, utility sequence accepted by the version policy or None
+        :param has_versions : whether the layer has a version with frames
+        :return: item or None
+        """
+        # Check Unpack Mode valid
+        if self.__selected_unpack_mode is None: return None
+        # Check layer folder contains shot
+        if not has_versions: return None
+
+        item = QListWidgetItem()
+        if version_data is None:
+            # Layer with versions but none accepted by the version policy
+            item.setTextColor(QColor(*_COLOR_GREY_DISABLE))
+            item.setToolTip("No version accepted by the policy " +
+                            POLICY_LABELS[VersionPolicy.get_current().get_mode()])
+        start_var = self.__selected_unpack_mode.is_layer_scanned(render_layer)
+        # Determine if known layer or unknown
+        if not start_var:
+            name = render_layer
+            if version_data is not None:
+                item.setTextColor(QColor(170,170,255))
         else:
-            render_path = os.path.join(self.__shot_path, "render_out")
+            name = render_layer + "   ["+start_var.get_name()+"]"
 
-        # Check existence render path
-        if not os.path.isdir(render_path): return
+        item.setData(Qt.UserRole, render_layer)
+        item.setText(name)
+        if version_data is not None:
+            item.setToolTip(AutoComp.__get_sequence_tooltip(*version_data))
+        return item
 
-        # Check Unpack Mode valid
-        if self.__selected_unpack_mode is None: return
-
-        for render_layer in os.listdir(render_path):
-            item = QListWidgetItem()
-            # Check layer folder contains shot
-            if UnpackMode.get_last_seq_from_layer(os.path.join(render_path, render_layer)) is None: continue
-            start_var = self.__selected_unpack_mode.is_layer_scanned(render_layer)
-            # Determine if known layer or unknown
-            if not start_var:
-                name = render_layer
-                item.setTextColor(QColor(170,170,255))
-            else:
-                name = render_layer + "   ["+start_var.get_name()+"]"
+    def __update_layer_items(self, render_layers):
+        """
+        Update only the rows of some layers in the layer list
+        :param render_layers
+        :return:
+        """
+        shot_index = ShotIndex.get_cached_index(self.__shot_path)
+        if shot_index is None: return
+        policy = VersionPolicy.get_current()
+        latest_policy = VersionPolicy()
+        for render_layer in render_layers:
+            # Remove the current row of the layer
+            was_selected = False
+            for row in range(self.__ui_layers_list.count()):
+                if self.__ui_layers_list.item(row).data(Qt.UserRole) == render_layer:
+                    was_selected = self.__ui_layers_list.item(row).isSelected()
+                    self.__ui_layers_list.takeItem(row)
+                    break
+            version_data = policy.resolve(shot_index, render_layer)
+            has_versions = version_data is not None or latest_policy.resolve(shot_index, render_layer) is not None
+            item = self.__create_layer_item(render_layer, version_data, has_versions)
+            if item is None: continue
+            # Insert the row at its alphabetical place
+            row = 0
+            while row < self.__ui_layers_list.count() and \
+                    self.__ui_layers_list.item(row).data(Qt.UserRole) < render_layer:
+                row += 1
+            self.__ui_layers_list.insertItem(row, item)
+            item.setSelected(was_selected)
 
-            item.setData(Qt.UserRole, render_layer)
-            item.setText(name)
-            self.__ui_layers_list.addItem(item)
+    @staticmethod
+    def __get_sequence_tooltip(version, beauty_seq, utility_seq):
+        """
+        Get the tooltip of a layer with the frame range and the missing frames of its last version
+        :param version
+        :param beauty_seq
+        :param utility_seq
+        :return: tooltip
+        """
+        lines = [version + " : " + str(beauty_seq)]
+        gaps = beauty_seq.get_gaps()
+        if len(gaps) > 0:
+            lines.append("Missing : " + ", ".join(
+                [str(start) if start == end else str(start) + "-" + str(end) for start, end in gaps]))
+        if not utility_seq.is_empty():
+            lines.append("Utility : " + str(utility_seq))
+        return "\n".join(lines)
 
     def __refresh_start_vars_list(self):
         """
@@ -515,16 +881,87 @@ class AutoComp(QWidget):
                 current_version_item.setTextColor(QColor(*_COLOR_GREY_DISABLE))
                 last_version_item.setTextColor(QColor(*_COLOR_GREY_DISABLE))
 
+    @staticmethod
+    def __format_size(size):
+        """
+        Format a size in bytes for the Frame Cache table
+        :param size : bytes
+        :return: text
+        """
+        if size >= _BYTES_PER_GB:
+            return "%.1f GB" % (size / float(_BYTES_PER_GB))
+        return "%.1f MB" % (size / float(1024 ** 2))
+
+    def __get_frame_cache_state(self, source, complete, is_copying, is_used):
+        """
+        Get the state of a cached version shown in the Frame Cache table
+        :param source : network version folder
+        :param complete : whether a sequence of the version is fully copied
+        :param is_copying
+        :param is_used : whether a Read node reads it
+        :return: state
+        """
+        if is_copying or source in self.__localize_progress:
+            return "Copying " + str(self.__localize_progress.get(source, 0)) + "%"
+        if is_used:
+            return "In use"
+        return "Cached" if complete else "Partial"
+
+    def __refresh_frame_cache_table(self):
+        """
+        Refresh the Frame Cache table with the cached versions, the most recently used first
+        :return:
+        """
+        self.__ui_frame_cache_table.setRowCount(0)
+        frame_cache = FrameCache.get_current()
+        used_names = set([frame_cache.get_entry_name(read_node.knob("file").value())
+                          for read_node in ReadLocalizer.get_localized_reads()])
+        row_index = 0
+        for name, source, size, last_used, complete, is_copying in frame_cache.get_entries():
+            self.__ui_frame_cache_table.insertRow(row_index)
+
+            version_item = QTableWidgetItem(os.path.basename(source))
+            version_item.setData(Qt.UserRole, (name, source))
+            version_item.setToolTip(source)
+            self.__ui_frame_cache_table.setItem(row_index, 0, version_item)
+
+            size_item = QTableWidgetItem(AutoComp.__format_size(size))
+            size_item.setTextAlignment(Qt.AlignCenter)
+            self.__ui_frame_cache_table.setItem(row_index, 1, size_item)
+
+            state_item = QTableWidgetItem(self.__get_frame_cache_state(source, complete, is_copying,
+                                                                       name in used_names))
+            state_item.setTextAlignment(Qt.AlignCenter)
+            self.__ui_frame_cache_table.setItem(row_index, 2, state_item)
+
+            if not complete and not is_copying:
+                version_item.setTextColor(QColor(*_COLOR_GREY_DISABLE))
+                size_item.setTextColor(QColor(*_COLOR_GREY_DISABLE))
+                state_item.setTextColor(QColor(*_COLOR_GREY_DISABLE))
+            row_index += 1
+
     def __browse_folder(self):
         """
-        Browse a new abc folder
+        Show or hide the shot browser, opened on the current shot (or on the folder of the script)
+        :return:
+        """
+        if self.__ui_shot_browser.isVisible():
+            self.__ui_shot_browser.hide()
+            return
+        path = self.__shot_path
+        if len(path) == 0:
+            path = os.path.dirname(nuke.root()['name'].value())
+        self.__ui_shot_browser.show()
+        self.__ui_shot_browser.reveal(path)
+
+    def __on_browser_shot_selected(self, shot_path):
+        """
+        On Shot picked in the shot browser set it as the shot path and hide the browser
+        :param shot_path
         :return:
         """
-        dirname = nuke.root()['name'].value()
-        if len(dirname) == 0:
-            dirname = _DEFAULT_SHOT_DIR
-        shot_path = QtWidgets.QFileDialog.getExistingDirectory(self, "Select Shot Directory", dirname)
         self.__set_shot_path(shot_path)
+        self.__ui_shot_browser.hide()
 
     def __set_shot_path(self, shot_path):
         """
@@ -535,20 +972,37 @@ class AutoComp(QWidget):
         if AutoComp.__is_correct_shot_folder(shot_path) and shot_path != self.__shot_path:
             self.__ui_shot_path.setText(shot_path)
 
+    def __on_folder_edited(self):
+        """
+        On folder linedit edited wait for the end of the edition before scanning
+        :return:
+        """
+        self.__shot_path_timer.start()
+
     def __on_folder_changed(self):
         """
         Retrieve the folder path on folder linedit change
         :return:
         """
-        self.__shot_path = self.__ui_shot_path.text()
-        self.__scan_layers()
+        shot_path = self.__ui_shot_path.text()
+        # Edits that end on the current path don't trigger a new scan
+        if shot_path == self.__shot_path: return
+        self.__shot_path = shot_path
+        self.__shot_prefetcher.cancel()
+        # A shot prefetched recently is served from memory, otherwise it is scanned again
+        if not ShotPrefetcher.is_prefetched_index_fresh(self.__shot_path):
+            ShotIndex.invalidate(self.__shot_path)
+        PathCache.invalidate(ShotIndex.get_shot_render_path(self.__shot_path))
+        self.__refresh_render_watcher()
         self.__refresh_shot_autocomp_btn()
-        self.__refresh_start_vars_list()
-        self.__refresh_layers_list()
+        self.__refresh_unpack_modes_coverage()
+        self.__async_cost.cancel()
+        self.__set_comp_cost(None)
+        self.__request_refresh(reads=False)
 
     def __on_unpack_mode_changed(self, index):
         """
-        On Unpack Mode combobox value changed retrieve the datas of the mode and rescan layers
+        On Unpack Mode combobox value changed match the layers of the scanned shot with the mode (in memory)
         :param index
         :return:
         """
@@ -558,6 +1012,16 @@ class AutoComp(QWidget):
         self.__refresh_layers_list()
         self.__selected_layers = []
         self.__refresh_shuffle_layer_btn()
+        self.__request_comp_cost()
+
+    def __on_version_policy_changed(self, index):
+        """
+        On Version Policy combobox value changed resolve again the layers and the read nodes versions
+        :param index
+        :return:
+        """
+        self.__version_policy_mode = self.__ui_version_policy.itemData(index, Qt.UserRole)
+        self.__request_refresh()
 
     def __on_layer_selected(self):
         """
@@ -568,6 +1032,7 @@ class AutoComp(QWidget):
         for item in self.__ui_layers_list.selectedItems():
             self.__selected_layers.append(item.data(Qt.UserRole))
         self.__refresh_shuffle_layer_btn()
+        self.__refresh_frame_cache_btns()
 
     def __on_channel_selected(self):
         """
@@ -620,64 +1085,226 @@ class AutoComp(QWidget):
                 unknown_node_found = True
                 break
         if unknown_node_found:
-            self.__retrieve_read_nodes_to_update()
-            self.__refresh_update_reads_table()
+            self.__refresh_read_nodes_to_update()
         self.__refresh_update_read_node_btn()
 
+    def __reload_shots(self):
+        """
+        Forget the shot indexes to see the new renders and refresh the layers and the read nodes
+        :return:
+        """
+        ShotIndex.invalidate()
+        IndexDaemonClient.invalidate()
+        PathCache.invalidate()
+        self.__request_refresh()
+
     def __refresh_read_nodes_to_update(self):
         """
         Retrieve the read nodes and refresh the tables
         :return:
         """
-        self.__retrieve_read_nodes_to_update()
+        self.__request_refresh(layers=False)
+
+    def __request_refresh(self, layers=True, reads=True):
+        """
+        Scan the shot and resolve the versions of the layers and of the read nodes in the worker threads.
+        Only the access to the Nuke API is done here, the lists are filled when the results arrive
+        :param layers : refresh the layers list
+        :param reads : refresh the Update Reads table
+        :return:
+        """
+        self.__apply_version_policy()
+        policy = VersionPolicy.get_current()
+        if layers:
+            self.__ui_layers_list.clear()
+            # The shot stored in the render catalog is shown while it is scanned
+            if ShotIndex.get_cached_index(self.__shot_path) is None:
+                self.__scan_layers()
+                self.__refresh_layers_list()
+            self.__async_layers.request(self.__shot_path, None, policy)
+        if reads:
+            # The localized Read nodes are resolved with their network path
+            read_paths = [(read_node, ReadLocalizer.get_network_path(read_node)) for read_node in nuke.allNodes("Read")]
+            del self.__read_nodes_list_for_update[:]
+            self.__refresh_update_reads_table()
+            self.__async_reads.request(None, read_paths, policy)
+
+    def __on_shot_scanned(self, request_id, shot_path):
+        """
+        On Shot scanned by the worker scan the layers with the current unpack mode
+        :param request_id
+        :param shot_path
+        :return:
+        """
+        if not self.__async_layers.is_current(request_id) or shot_path != self.__shot_path: return
+        self.__scan_layers()
+        self.__refresh_shot_autocomp_btn()
+        self.__refresh_start_vars_list()
+        self.__refresh_unpack_modes_coverage()
+        self.__ui_layers_list.clear()
+        self.__refresh_render_watcher()
+        self.__request_comp_cost()
+        self.__shot_prefetcher.prefetch_siblings(shot_path)
+
+    def __request_comp_cost(self):
+        """
+        Estimate the cost of the comp of the selected unpack mode on the scanned shot in a worker thread
+        :return:
+        """
+        if self.__selected_unpack_mode is None or ShotIndex.get_cached_index(self.__shot_path) is None:
+            self.__async_cost.cancel()
+            self.__set_comp_cost(None)
+            return
+        try:
+            estimator = CompCostEstimator.from_mode_file(self.__selected_unpack_mode.get_config_path())
+        except (IOError, OSError, ValueError) as e:
+            print("### Warning : Unable to read the unpack mode to estimate the comp cost : " + str(e))
+            self.__set_comp_cost(None)
+            return
+        self.__async_cost.request_cost(self.__shot_path, estimator, VersionPolicy.get_current())
+
+    def __on_cost_estimated(self, request_id, cost):
+        """
+        On Comp cost estimated by the worker show it under the layer list
+        :param request_id
+        :param cost
+        :return:
+        """
+        if not self.__async_cost.is_current(request_id): return
+        self.__set_comp_cost(cost)
+
+    def __set_comp_cost(self, cost):
+        """
+        Show the estimate of the comp cost, the details are in the tooltip
+        :param cost : comp cost or None to clear it
+        :return:
+        """
+        if cost is None:
+            self.__ui_comp_cost.setText("")
+            self.__ui_comp_cost.setToolTip("")
+            return
+        self.__ui_comp_cost.setText("Estimate : " + cost.get_summary())
+        self.__ui_comp_cost.setToolTip("\n".join(cost.get_report()))
+
+    def __on_watch_renders_changed(self, state):
+        """
+        On Watch new renders checkbox changed start or stop the watcher
+        :param state
+        :return:
+        """
+        self.__watch_renders = state == Qt.Checked
+        self.__refresh_render_watcher()
+
+    def __on_skip_empty_light_groups_changed(self, state):
+        """
+        On Skip empty light groups checkbox changed enable or disable the analysis of the sample frames
+        :param state
+        :return:
+        """
+        self.__skip_empty_light_groups = state == Qt.Checked
+        self.__refresh_empty_light_group_threshold()
+
+    def __refresh_render_watcher(self):
+        """
+        Watch the current shot if the option is enabled and the shot is scanned
+        :return:
+        """
+        if not self.__watch_renders or ShotIndex.get_cached_index(self.__shot_path) is None:
+            self.__render_watcher.stop()
+        elif self.__render_watcher.get_shot_path() != self.__shot_path:
+            self.__render_watcher.watch(self.__shot_path)
+
+    def __on_layers_changed(self, shot_path, render_layers):
+        """
+        On Layers changed on disk (the index is already patched) update their rows in the layer list and the
+        Update Reads table
+        :param shot_path
+        :param render_layers
+        :return:
+        """
+        if shot_path != self.__shot_path: return
+        self.__scan_layers()
+        self.__refresh_start_vars_list()
+        self.__refresh_unpack_modes_coverage()
+        self.__update_layer_items(render_layers)
+        self.__update_read_nodes_of_layers(render_layers)
+        self.__request_comp_cost()
+
+    def __update_read_nodes_of_layers(self, render_layers):
+        """
+        Resolve again the read nodes of some layers and refresh the Update Reads table
+        :param render_layers
+        :return:
+        """
+        read_paths = []
+        kept_read_nodes_data = []
+        for read_node_data in self.__read_nodes_list_for_update:
+            if read_node_data[0] not in render_layers:
+                kept_read_nodes_data.append(read_node_data)
+                continue
+            read_node = read_node_data[4]
+            try:
+                read_paths.append((read_node, ReadLocalizer.get_network_path(read_node)))
+            except ValueError:
+                # Read node deleted
+                continue
+        if len(read_paths) == 0: return
+        kept_read_nodes_data.extend(ReadVersionResolver().resolve(read_paths))
+        # Sort the data to have the out of date nodes at first and then alphabetically
+        self.__read_nodes_list_for_update = sorted(kept_read_nodes_data, reverse=True,
+                                                   key=lambda x: (x[1] == x[2], x[0]))
         self.__refresh_update_reads_table()
 
-    def __retrieve_read_nodes_to_update(self):
-        """
-        Refresh the read nodes list for the Update Reads Part
-        :return:
-        """
-        del self.__read_nodes_list_for_update[:]
-        read_nodes = nuke.allNodes("Read")
-        for read_node in read_nodes:
-            path = read_node.knob("file").value().replace("\\", "/")
-            # Check the current path to retrieve the layer and current version
-            match = re.match(r"^([\w\/\:\.]+\/render_out\/(\w+))\/\w+\.([0-9]+)\/[\w\.%]+\.[a-z]+$", path)
-            if not match: continue
-            folder_versions = match.group(1)
-            if not os.path.isdir(folder_versions): continue
-            versions = sorted(os.listdir(folder_versions), reverse=True)
-            last_version = None
-            last_version_path = None
-            # Retrieve the last version for the layer found
-            for version_dirname in versions:
-                version_dirpath = os.path.join(folder_versions,version_dirname)
-                for seq_file in os.listdir(version_dirpath):
-                    match_version = re.match(r"^("+version_dirname+")\.[0-9]{4}(\.\w+)$", seq_file)
-                    if match_version is not None:
-                        last_version = match_version.group(1).split(".")[-1]
-                        last_version_path = \
-                            os.path.join(version_dirpath,
-                                         match_version.group(1)+".####"+match_version.group(2)).replace("\\","/")
-                        break
-                if last_version is not None:
-                    break
-            if last_version is None: continue
-            # Store the retrieved data
-            self.__read_nodes_list_for_update.append(
-                (match.group(2), match.group(3),last_version,last_version_path, read_node))
+    def __on_layer_resolved(self, request_id, render_layer, version_data, has_versions):
+        """
+        On Layer version resolved by the worker add it to the layers list
+        :param request_id
+        :param render_layer
+        :param version_data
+        :param has_versions
+        :return:
+        """
+        if not self.__async_layers.is_current(request_id): return
+        self.__add_layer_item(render_layer, version_data, has_versions)
+
+    def __on_reads_resolved(self, request_id, read_nodes_data):
+        """
+        On Read nodes of a layer folder resolved by the worker add them to the Update Reads table
+        :param request_id
+        :param read_nodes_data
+        :return:
+        """
+        if not self.__async_reads.is_current(request_id): return
+        # The rows resolved from the render catalog are replaced by the ones resolved from the scan
+        read_node_ids = set([id(read_node_data[4]) for read_node_data in read_nodes_data])
+        self.__read_nodes_list_for_update = [read_node_data for read_node_data in self.__read_nodes_list_for_update
+                                             if id(read_node_data[4]) not in read_node_ids]
+        self.__read_nodes_list_for_update.extend(read_nodes_data)
         # Sort the data to have the out of date nodes at first and then alphabetically
         self.__read_nodes_list_for_update = sorted(self.__read_nodes_list_for_update, reverse=True,
                                                    key=lambda x: (x[1] == x[2], x[0]))
+        self.__refresh_update_reads_table()
 
     def __scan_layers(self):
         """
         Scan the layers with the current unpack mode
         :return:
         """
-        if self.__selected_unpack_mode is not None:
+        # The shot is scanned by the worker, only the already scanned shots (or stored in the render catalog)
+        # are unpacked here
+        if self.__selected_unpack_mode is not None and \
+                ShotIndex.get_cached_index(self.__shot_path, use_catalog=True) is not None:
             self.__selected_unpack_mode.scan_layers(self.__shot_path)
 
+    def __apply_version_policy(self):
+        """
+        Set the version policy used to resolve the versions with the frame range of the script as expected range
+        :return:
+        """
+        root = nuke.root()
+        VersionPolicy.set_current(
+            VersionPolicy(self.__version_policy_mode, self.__settle_time, (root.firstFrame(), root.lastFrame())))
+
     def __reinit_auto_comp(self):
         """
         Reinit the unpack mode to eventually start a new autocomp
@@ -711,9 +1338,17 @@ class AutoComp(QWidget):
         Update selected read nodes in the Update Reads Table to the last version of their layer
         :return:
         """
+        network_paths = []
         for read_node,new_path in self.__selected_read_nodes_for_update_data:
+            # A localized Read node is pointed to the network then its new version is localized
+            was_localized = ReadLocalizer.is_localized(read_node)
+            ReadLocalizer.restore(read_node)
             read_node.knob("file").setValue(new_path)
+            if was_localized and self.__frame_cache_enabled:
+                network_paths.extend(self.__localize_read(read_node))
+        self.__read_localizer.request(network_paths)
         self.__refresh_read_nodes_to_update()
+        self.__refresh_frame_cache_table()
 
     def __shuffle_channel(self):
         """
@@ -721,3 +1356,149 @@ class AutoComp(QWidget):
         :return:
         """
         AutoCompFactory.shuffle_channel_mode(self.__selected_read_node, self.__selected_channels)
+
+    def __pin_localized_reads(self):
+        """
+        Protect the sequences read by the localized Read nodes from the eviction of the frame cache
+        :return:
+        """
+        FrameCache.get_current().set_pinned([read_node.knob("file").value()
+                                             for read_node in ReadLocalizer.get_localized_reads()])
+
+    def __localize_read(self, read_node):
+        """
+        Localize a Read node with the localization of Nuke or prepare the copy of its sequence in the frame cache
+        :param read_node
+        :return: network paths to copy
+        """
+        if self.__localize_mode == LOCALIZE_MODE_NUKE and ReadLocalizer.set_nuke_localization(read_node):
+            return []
+        network_path = ReadLocalizer.get_network_path(read_node)
+        is_new = network_path not in self.__localizing_reads
+        self.__localizing_reads.setdefault(network_path, []).append(read_node)
+        if is_new:
+            self.__localize_progress.setdefault(os.path.dirname(network_path), 0)
+        return [network_path] if is_new else []
+
+    def __localize_selected_layers(self):
+        """
+        Localize the Read nodes of the selected layers of the shot
+        :return:
+        """
+        render_path = ShotIndex.get_shot_render_path(self.__shot_path)
+        network_paths = []
+        for read_node in nuke.allNodes("Read"):
+            read_data = ReadVersionResolver.parse_read_path(ReadLocalizer.get_network_path(read_node))
+            if read_data is None or read_data[1] not in self.__selected_layers or \
+                    os.path.dirname(read_data[0]) != render_path:
+                continue
+            network_paths.extend(self.__localize_read(read_node))
+        self.__pin_localized_reads()
+        self.__read_localizer.request(network_paths)
+        self.__refresh_frame_cache_table()
+
+    def __on_localize_progress(self, network_path, copied_size, total_size):
+        """
+        On Frames copied in the frame cache update the state of their version in the Frame Cache table
+        :param network_path
+        :param copied_size
+        :param total_size
+        :return:
+        """
+        source = os.path.dirname(network_path)
+        percent = int(100 * copied_size / max(total_size, 1))
+        if self.__localize_progress.get(source) == percent: return
+        self.__localize_progress[source] = percent
+        for row in range(self.__ui_frame_cache_table.rowCount()):
+            if self.__ui_frame_cache_table.item(row, 0).data(Qt.UserRole)[1] == source:
+                self.__ui_frame_cache_table.item(row, 2).setText("Copying " + str(percent) + "%")
+                return
+        self.__refresh_frame_cache_table()
+
+    def __on_read_localized(self, network_path, local_path):
+        """
+        On Sequence copied in the frame cache point its Read nodes to the local sequence
+        :param network_path
+        :param local_path : "" if the copy failed
+        :return:
+        """
+        read_nodes = self.__localizing_reads.pop(network_path, [])
+        source = os.path.dirname(network_path)
+        if not any([os.path.dirname(path) == source for path in self.__localizing_reads.keys()]):
+            self.__localize_progress.pop(source, None)
+        if len(local_path) > 0 and self.__frame_cache_enabled:
+            for read_node in read_nodes:
+                try:
+                    # The Read node may have been updated to another version during the copy
+                    if ReadLocalizer.get_network_path(read_node) == network_path:
+                        ReadLocalizer.set_local_path(read_node, local_path)
+                except ValueError:
+                    # Read node deleted
+                    continue
+            FrameCache.get_current().touch(local_path)
+        self.__pin_localized_reads()
+        self.__refresh_frame_cache_table()
+
+    def __on_frame_cache_changed(self, state):
+        """
+        On Localize reads checkbox changed, point all the localized Read nodes back to the network when it is disabled
+        :param state
+        :return:
+        """
+        self.__frame_cache_enabled = state == Qt.Checked
+        if not self.__frame_cache_enabled:
+            self.__read_localizer.cancel()
+            self.__localizing_reads.clear()
+            self.__localize_progress.clear()
+            for read_node in ReadLocalizer.get_localized_reads():
+                ReadLocalizer.restore(read_node)
+            self.__pin_localized_reads()
+        self.__refresh_frame_cache_table()
+        self.__refresh_frame_cache_btns()
+
+    def __on_localize_mode_changed(self, index):
+        """
+        On Localize mode combobox value changed store the mode used by the next localizations
+        :param index
+        :return:
+        """
+        self.__localize_mode = self.__ui_localize_mode.itemData(index, Qt.UserRole)
+
+    def __on_frame_cache_budget_changed(self, value):
+        """
+        On Budget changed evict the least recently used versions beyond it
+        :param value : GB
+        :return:
+        """
+        self.__frame_cache_budget_gb = value
+        self.__pin_localized_reads()
+        FrameCache.get_current().set_budget(value * _BYTES_PER_GB)
+        self.__refresh_frame_cache_table()
+
+    def __on_frame_cache_entry_selected(self):
+        """
+        On Version selected in the Frame Cache table retrieve selected and refresh the evict button
+        :return:
+        """
+        rows_selected = self.__ui_frame_cache_table.selectionModel().selectedRows()
+        self.__selected_frame_cache_entries = [
+            self.__ui_frame_cache_table.item(row_selected.row(), 0).data(Qt.UserRole)[0]
+            for row_selected in rows_selected]
+        self.__refresh_frame_cache_btns()
+
+    def __evict_selected_versions(self):
+        """
+        Remove the selected versions from the frame cache, the Read nodes reading them are pointed back to the network
+        :return:
+        """
+        frame_cache = FrameCache.get_current()
+        names = set(self.__selected_frame_cache_entries)
+        for read_node in ReadLocalizer.get_localized_reads():
+            if frame_cache.get_entry_name(read_node.knob("file").value()) in names:
+                ReadLocalizer.restore(read_node)
+        self.__pin_localized_reads()
+        for name in names:
+            frame_cache.evict(name)
+        self.__selected_frame_cache_entries = []
+        self.__refresh_frame_cache_table()
+        self.__refresh_frame_cache_btns()
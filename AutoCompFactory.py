@@ -110,6 +110,8 @@ class AutoCompFactory:
         layout_manager.build_layout_node_graph()
         # Organize all the backdrops
         layout_manager.build_layout_backdrops()
+        # Create all the nodes in the script at once
+        layout_manager.paste_graph()
 
     @staticmethod
     def __parse_rule_set(path):
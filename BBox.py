@@ -0,0 +1,138 @@
+# ######################################################################################################################
+
+# Bounding box of the output of a Merge by operation when it is smaller than the union of its inputs
+# (outside the bounding box of an input the input is black)
+_MERGE_BBOX_BY_OPERATION = {
+    "multiply": "intersection",
+    "in": "intersection",
+    "mask": "intersection",
+    "out": "A",
+    "stencil": "B",
+    "atop": "B",
+}
+# Bounding boxes of a Merge that can cut the B input : the channels a Merge doesn't merge are copied from B unchanged,
+# they would be cropped outside the bbox
+_B_CROPPING_BBOXES = ["intersection", "A"]
+# Operations whose chains can be merged in any order (commutative and associative on the merged layers)
+_REORDERABLE_OPERATIONS = ["plus", "multiply", "max", "min", "screen"]
+# Layers merged by a Merge (also_merge none), the others are passed through from B
+_MERGED_LAYERS = ["rgba"]
+
+
+# ######################################################################################################################
+
+
+class BBox:
+    """
+    Operations on the bounding boxes of the EXR windows (x min, y min, x max, y max, inclusive) used to build graphs
+    that only compute the real pixels of the layers. None is an unknown bounding box
+    """
+
+    @staticmethod
+    def get_area(bbox):
+        """
+        Get the number of pixels of a bounding box
+        :param bbox
+        :return: area or None if unknown
+        """
+        if bbox is None:
+            return None
+        return max(0, bbox[2] - bbox[0] + 1) * max(0, bbox[3] - bbox[1] + 1)
+
+    @staticmethod
+    def union(bbox_a, bbox_b):
+        """
+        Get the union of two bounding boxes
+        :param bbox_a
+        :param bbox_b
+        :return: bbox or None if one is unknown
+        """
+        if bbox_a is None or bbox_b is None:
+            return None
+        return (min(bbox_a[0], bbox_b[0]), min(bbox_a[1], bbox_b[1]),
+                max(bbox_a[2], bbox_b[2]), max(bbox_a[3], bbox_b[3]))
+
+    @staticmethod
+    def intersection(bbox_a, bbox_b):
+        """
+        Get the intersection of two bounding boxes
+        :param bbox_a
+        :param bbox_b
+        :return: bbox (empty if they don't overlap), the known one if the other is unknown
+        """
+        if bbox_a is None:
+            return bbox_b
+        if bbox_b is None:
+            return bbox_a
+        return (max(bbox_a[0], bbox_b[0]), max(bbox_a[1], bbox_b[1]),
+                min(bbox_a[2], bbox_b[2]), min(bbox_a[3], bbox_b[3]))
+
+    @staticmethod
+    def contains(bbox_a, bbox_b):
+        """
+        Check if a bounding box contains another one
+        :param bbox_a
+        :param bbox_b
+        :return: contains (False if one is unknown)
+        """
+        if bbox_a is None or bbox_b is None:
+            return False
+        return bbox_a[0] <= bbox_b[0] and bbox_a[1] <= bbox_b[1] and \
+            bbox_a[2] >= bbox_b[2] and bbox_a[3] >= bbox_b[3]
+
+    @staticmethod
+    def has_pass_through(layers):
+        """
+        Check if a node carries layers that a Merge passes through from its B input
+        :param layers : layers of the node or None if unknown
+        :return: has pass through layers (True if unknown)
+        """
+        if layers is None:
+            return True
+        return any(layer not in _MERGED_LAYERS for layer in layers)
+
+    @staticmethod
+    def get_merge_bbox(operation, bbox_a, bbox_b, pass_through=True):
+        """
+        Get the bbox knob value of a Merge and the bounding box of its output
+        :param operation
+        :param bbox_a : bounding box of the A input
+        :param bbox_b : bounding box of the B input
+        :param pass_through : the B input carries layers passed through (never cropped)
+        :return: bbox knob value (union, intersection, A or B), bbox
+        """
+        bbox_mode = _MERGE_BBOX_BY_OPERATION.get(operation, "union")
+        if pass_through and bbox_mode in _B_CROPPING_BBOXES:
+            bbox_mode = "union"
+        if bbox_mode == "intersection":
+            return bbox_mode, BBox.intersection(bbox_a, bbox_b) if bbox_a is not None and bbox_b is not None \
+                else None
+        if bbox_mode == "A":
+            return bbox_mode, bbox_a
+        if bbox_mode == "B":
+            return bbox_mode, bbox_b
+        return bbox_mode, BBox.union(bbox_a, bbox_b)
+
+    @staticmethod
+    def is_reorderable(operation):
+        """
+        Check if a chain of merges of an operation gives the same merged layers in any order of its A inputs (the B
+        input of the chain carries the layers passed through and stays first)
+        :param operation
+        :return: is reorderable
+        """
+        return operation in _REORDERABLE_OPERATIONS
+
+    @staticmethod
+    def sort_by_area(items, get_bbox):
+        """
+        Sort items by the area of their bounding box, the smallest first so that the unions of a merge chain grow
+        as late as possible. The items with an unknown bounding box are kept last, the order is stable
+        :param items
+        :param get_bbox : function giving the bounding box of an item
+        :return: sorted items
+        """
+        def __key(item):
+            area = BBox.get_area(get_bbox(item))
+            return (1, 0) if area is None else (0, area)
+        return sorted(items, key=__key)
@@ -0,0 +1,363 @@
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+from .ExrHeader import ExrHeader, PIXEL_SIZES
+from .StorageBackend import StorageBackend
+
+# ######################################################################################################################
+
+_CATALOG_PATH_ENV = "AUTO_COMP_CHANNEL_CATALOG"
+_DEFAULT_CATALOG_PATH = os.path.join(os.path.expanduser("~"), ".auto_comp", "channel_catalog.json")
+_CATALOG_FORMAT_VERSION = 5
+# Fields of an entry given to the callers
+_ENTRY_KEYS = ["layers", "light_groups", "layer_formats", "data_window", "display_window", "pixel_aspect"]
+# The sequences used the least recently are dropped when the catalog is saved
+_MAX_ENTRIES = 20000
+_FRAME_PADDING_REGEX = re.compile(r"(#+|%0?(\d*)d)")
+# Channels without layer in the EXR files that Nuke puts in its built-in layers
+_NUKE_CHANNELS = {"R": "rgba.red", "G": "rgba.green", "B": "rgba.blue", "A": "rgba.alpha", "Z": "depth.Z"}
+# Workers of the prefetch : the frames are stated by threads, the headers are parsed by processes
+_STAT_THREADS = 16
+_PREFETCH_WORKERS = min(8, os.cpu_count() or 1)
+
+
+# ######################################################################################################################
+
+
+def _read_frame_info(frame_path):
+    """
+    Worker function of the prefetch reading the channels of a frame (run in a process of the pool)
+    :param frame_path
+    :return: header info
+    """
+    return ChannelCatalog.get_header_info(ExrHeader.read(frame_path))
+
+
+def _stat_frame(frame_path):
+    """
+    Get the stat of a frame
+    :param frame_path
+    :return: stat or None if the frame can't be read
+    """
+    try:
+        return StorageBackend.get_backend(frame_path).stat(frame_path)
+    except OSError:
+        return None
+
+
+# ######################################################################################################################
+
+
+class ChannelCatalog:
+    """
+    Persistent catalog of the layers and light groups of the sequences, so that selecting a Read node or running an
+    Unpack Mode does not probe again a file that has not changed. An entry is keyed by the path pattern of a sequence
+    (which contains its version) and is valid while the size and mtime of the frame it was read from are the same.
+    The channel counts, windows and pixel aspect are None when the channels come from a node instead of the header.
+    {"format": 5, "sequences": {"<path pattern>": {"frame": int, "size": int, "mtime_ns": int, "layers": [...],
+                                                   "light_groups": [...],
+                                                   "layer_formats": {"<layer>": [nb channels, bytes per pixel]},
+                                                   "data_window": [x min, y min, x max, y max],
+                                                   "display_window": [x min, y min, x max, y max],
+                                                   "pixel_aspect": float,
+                                                   "last_used": float}}}
+    """
+    __current = None
+    __current_lock = threading.Lock()
+
+    @staticmethod
+    def get_current():
+        """
+        Getter of the catalog in use (AUTO_COMP_CHANNEL_CATALOG or ~/.auto_comp/channel_catalog.json)
+        :return: channel catalog
+        """
+        with ChannelCatalog.__current_lock:
+            if ChannelCatalog.__current is None:
+                ChannelCatalog.__current = ChannelCatalog(os.environ.get(_CATALOG_PATH_ENV, _DEFAULT_CATALOG_PATH))
+            return ChannelCatalog.__current
+
+    @staticmethod
+    def get_frame_path(seq_path, frame):
+        """
+        Get the path of a frame of a sequence (#### or %04d padding)
+        :param seq_path
+        :param frame
+        :return: frame path
+        """
+        def __pad(match):
+            if match.group(1).startswith("#"):
+                return "%0*d" % (len(match.group(1)), frame)
+            return "%0*d" % (int(match.group(2) or 0), frame)
+        return _FRAME_PADDING_REGEX.sub(__pad, seq_path)
+
+    @staticmethod
+    def get_nuke_channel(channel):
+        """
+        Get the name Nuke gives to a channel of an EXR file (the names of node.channels() are unchanged)
+        :param channel : channel name (layer.channel or channel without layer)
+        :return: Nuke channel name
+        """
+        return _NUKE_CHANNELS.get(channel, channel)
+
+    @staticmethod
+    def get_layers(channels):
+        """
+        Get the layers of channel names (in the order of the channels, named like in Nuke)
+        :param channels : channel names of an EXR header or of node.channels()
+        :return: layer names
+        """
+        layers = []
+        for channel in channels:
+            layer = ChannelCatalog.get_nuke_channel(channel).split(".")[0]
+            if layer not in layers:
+                layers.append(layer)
+        return layers
+
+    @staticmethod
+    def get_layer_formats(channel_infos):
+        """
+        Get the number of channels and the bytes per pixel (in the file) of each layer
+        :param channel_infos : [(name, pixel type, x sampling, y sampling)]
+        :return: {layer: [nb channels, bytes per pixel]}
+        """
+        layer_formats = {}
+        for name, pixel_type, _, _ in channel_infos:
+            layer = ChannelCatalog.get_layers([name])[0]
+            layer_format = layer_formats.setdefault(layer, [0, 0])
+            layer_format[0] += 1
+            layer_format[1] += PIXEL_SIZES.get(pixel_type, 4)
+        return layer_formats
+
+    @staticmethod
+    def get_header_info(header):
+        """
+        Get the informations of an EXR header stored in the catalog
+        :param header
+        :return: {"channels": [...], "layer_formats": {...}, "data_window": [...], "display_window": [...],
+                  "pixel_aspect": float}
+        """
+        channel_infos = header.get_channel_infos()
+        data_window = header.get_data_window()
+        display_window = header.get_display_window()
+        return {"channels": [channel[0] for channel in channel_infos],
+                "layer_formats": ChannelCatalog.get_layer_formats(channel_infos),
+                "data_window": list(data_window) if data_window is not None else None,
+                "display_window": list(display_window) if display_window is not None else None,
+                "pixel_aspect": header.get_pixel_aspect()}
+
+    def __init__(self, catalog_path):
+        """
+        Constructor
+        :param catalog_path
+        """
+        self.__catalog_path = catalog_path
+        # {path pattern: entry}
+        self.__sequences = None
+        self.__dirty = False
+        # The catalog is read by the panel and by the scan workers
+        self.__lock = threading.Lock()
+
+    def __load(self):
+        """
+        Load the catalog file once, a missing or corrupted file gives an empty catalog (called with the lock)
+        :return:
+        """
+        if self.__sequences is not None:
+            return
+        self.__sequences = {}
+        try:
+            with open(self.__catalog_path, "r") as f:
+                data = json.load(f)
+        except (IOError, OSError, ValueError):
+            return
+        if isinstance(data, dict) and data.get("format") == _CATALOG_FORMAT_VERSION and \
+                isinstance(data.get("sequences"), dict):
+            self.__sequences = data["sequences"]
+
+    @staticmethod
+    def can_use_processes():
+        """
+        Getter of whether the headers can be parsed in a pool of processes : the processes start the executable of
+        the session, which is Nuke and not a Python interpreter in the GUI, so threads are used there
+        :return: can use processes
+        """
+        return os.path.basename(sys.executable).lower().startswith("python")
+
+    def __get_cached_entry(self, seq_path, frame, stat_result):
+        """
+        Get the entry of a sequence if it was read from the same frame with the same size and mtime
+        :param seq_path
+        :param frame
+        :param stat_result : current stat of the frame
+        :return: entry or None
+        """
+        with self.__lock:
+            self.__load()
+            entry = self.__sequences.get(seq_path)
+            if not isinstance(entry, dict) or entry.get("frame") != frame or \
+                    entry.get("size") != stat_result.st_size or entry.get("mtime_ns") != stat_result.st_mtime_ns:
+                return None
+            entry["last_used"] = time.time()
+            self.__dirty = True
+            return dict((key, entry.get(key)) for key in _ENTRY_KEYS)
+
+    def __store_entry(self, seq_path, frame, stat_result, info):
+        """
+        Store the channels of a sequence
+        :param seq_path
+        :param frame
+        :param stat_result : stat of the frame taken before reading it, None to not store the entry
+        :param info : header info or {"channels": [...]} when the channels come from a node
+        :return: entry
+        """
+        # The layers are named like in Nuke whether the channels come from the header or from the node
+        layers = ChannelCatalog.get_layers(info["channels"])
+        entry = {"layers": layers, "light_groups": ExrHeader.get_light_group_channels(layers),
+                 "layer_formats": info.get("layer_formats"), "data_window": info.get("data_window"),
+                 "display_window": info.get("display_window"), "pixel_aspect": info.get("pixel_aspect")}
+        # A sequence without readable frame is not stored : its channels come from the fallback
+        if stat_result is not None:
+            with self.__lock:
+                self.__load()
+                self.__sequences[seq_path] = dict(entry, frame=frame, size=stat_result.st_size,
+                                                  mtime_ns=stat_result.st_mtime_ns, last_used=time.time())
+                self.__dirty = True
+        return entry
+
+    def get_entry(self, seq_path, frame, channels_getter=None):
+        """
+        Get the layers and light groups of a sequence, read from the header of one of its frames if the catalog has
+        no entry for it or if the frame changed since
+        :param seq_path : path pattern of the sequence
+        :param frame : frame to read
+        :param channels_getter : function giving the channel names when the header can't be read (node.channels)
+        :return: {"layers": [...], "light_groups": [...], "layer_formats": {...} or None,
+                  "data_window": [...] or None, "display_window": [...] or None, "pixel_aspect": float or None}
+                 or None if the channels are unknown
+        """
+        frame_path = ChannelCatalog.get_frame_path(seq_path, frame)
+        backend = StorageBackend.get_backend(frame_path)
+        try:
+            stat_result = backend.stat(frame_path)
+        except OSError:
+            stat_result = None
+        if stat_result is not None:
+            entry = self.__get_cached_entry(seq_path, frame, stat_result)
+            if entry is not None:
+                return entry
+        info = None
+        if stat_result is not None:
+            try:
+                info = ChannelCatalog.get_header_info(ExrHeader.read(frame_path, backend))
+            except (IOError, OSError, ValueError) as e:
+                print("### Warning : Unable to read the channels of " + frame_path + " : " + str(e))
+        if info is None:
+            if channels_getter is None:
+                return None
+            info = {"channels": channels_getter()}
+        return self.__store_entry(seq_path, frame, stat_result, info)
+
+    def prefetch(self, seq_frames):
+        """
+        Get the entries of many sequences at once : the frames are stated in parallel and the headers of the
+        sequences not cataloged (or changed) are parsed in a pool of processes
+        :param seq_frames : [(seq_path, frame)]
+        :return: {(seq_path, frame): entry (see get_entry) or None if the channels are unknown}
+        """
+        seq_frames = list(dict.fromkeys(seq_frames))
+        entries = {}
+        if len(seq_frames) == 0:
+            return entries
+        with ThreadPoolExecutor(max_workers=min(_STAT_THREADS, len(seq_frames))) as executor:
+            stat_results = list(executor.map(
+                lambda seq_frame: _stat_frame(ChannelCatalog.get_frame_path(*seq_frame)), seq_frames))
+        to_read = {}
+        for seq_frame, stat_result in zip(seq_frames, stat_results):
+            entries[seq_frame] = None
+            if stat_result is None:
+                continue
+            entries[seq_frame] = self.__get_cached_entry(seq_frame[0], seq_frame[1], stat_result)
+            if entries[seq_frame] is None:
+                to_read[seq_frame] = stat_result
+        if len(to_read) == 0:
+            return entries
+        executor_cls = ProcessPoolExecutor if ChannelCatalog.can_use_processes() else ThreadPoolExecutor
+        try:
+            infos_by_seq = self.__read_infos(executor_cls, to_read.keys())
+        except (OSError, BrokenProcessPool) as e:
+            print("### Warning : Channel prefetch processes failed, using threads : " + str(e))
+            infos_by_seq = self.__read_infos(ThreadPoolExecutor, to_read.keys())
+        for seq_frame, info in infos_by_seq.items():
+            if info is not None:
+                entries[seq_frame] = self.__store_entry(seq_frame[0], seq_frame[1], to_read[seq_frame], info)
+        return entries
+
+    @staticmethod
+    def __read_infos(executor_cls, seq_frames):
+        """
+        Read the headers of the first frame of sequences in a pool
+        :param executor_cls : ProcessPoolExecutor or ThreadPoolExecutor
+        :param seq_frames : [(seq_path, frame)]
+        :return: {(seq_path, frame): header info or None if the header can't be read}
+        """
+        seq_frames = list(seq_frames)
+        infos_by_seq = {}
+        with executor_cls(max_workers=min(_PREFETCH_WORKERS, len(seq_frames))) as executor:
+            futures = {executor.submit(_read_frame_info, ChannelCatalog.get_frame_path(*seq_frame)): seq_frame
+                       for seq_frame in seq_frames}
+            for future in as_completed(futures):
+                seq_frame = futures[future]
+                try:
+                    infos_by_seq[seq_frame] = future.result()
+                except (IOError, OSError, ValueError) as e:
+                    print("### Warning : Unable to read the channels of " +
+                          ChannelCatalog.get_frame_path(*seq_frame) + " : " + str(e))
+                    infos_by_seq[seq_frame] = None
+        return infos_by_seq
+
+    def get_light_groups(self, seq_path, frame, channels_getter=None):
+        """
+        Get the light groups of a sequence (RGBA_* and emission layers)
+        :param seq_path
+        :param frame
+        :param channels_getter : function giving the channel names when the header can't be read
+        :return: light groups
+        """
+        entry = self.get_entry(seq_path, frame, channels_getter)
+        return entry["light_groups"] if entry is not None else []
+
+    def save(self):
+        """
+        Save the catalog atomically if it changed
+        :return:
+        """
+        with self.__lock:
+            if not self.__dirty:
+                return
+            sequences = self.__sequences
+            if len(sequences) > _MAX_ENTRIES:
+                kept = sorted(sequences.keys(), key=lambda x: sequences[x].get("last_used", 0))[-_MAX_ENTRIES:]
+                self.__sequences = sequences = {seq_path: sequences[seq_path] for seq_path in kept}
+            data = {"format": _CATALOG_FORMAT_VERSION, "sequences": dict(sequences)}
+            self.__dirty = False
+        catalog_dir = os.path.dirname(self.__catalog_path)
+        try:
+            if not os.path.isdir(catalog_dir):
+                os.makedirs(catalog_dir)
+            fd, tmp_path = tempfile.mkstemp(prefix=".tmp_", suffix=".json", dir=catalog_dir)
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump(data, f)
+                os.replace(tmp_path, self.__catalog_path)
+            except Exception:
+                os.remove(tmp_path)
+                raise
+        except (IOError, OSError) as e:
+            print("### Warning : Unable to save the channel catalog " + self.__catalog_path + " : " + str(e))
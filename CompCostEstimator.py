@@ -0,0 +1,490 @@
+import json
+import re
+
+from .BBox import BBox
+from .ChannelCatalog import ChannelCatalog
+from .ExrHeader import ExrHeader
+from .FrameSequence import FrameSequence
+from .ShotIndex import ShotIndex
+from .VersionPolicy import VersionPolicy
+
+# ######################################################################################################################
+
+# Nuke processes all the channels as 32 bit floats
+_NUKE_BYTES_PER_CHANNEL = 4
+_SIZE_UNITS = ["B", "KB", "MB", "GB", "TB"]
+
+
+# ######################################################################################################################
+
+
+class _Stream:
+    """
+    Output of a branch of the estimated graph (a variable of the Unpack Mode during the build)
+    """
+
+    def __init__(self, name, aliases, step, layer_formats, bbox, layers=None):
+        """
+        Constructor
+        :param name : name of the variable
+        :param aliases
+        :param step
+        :param layer_formats : {layer: [nb channels, bytes per pixel in the file]}
+        :param bbox : x min, y min, x max, y max or None if unknown
+        :param layers : render layers of the stream
+        """
+        self.name = name
+        self.aliases = aliases
+        self.step = step
+        self.layer_formats = layer_formats
+        self.bbox = bbox
+        self.layers = layers if layers is not None else []
+
+    @staticmethod
+    def merge(name, stream_a, stream_b, step, operation="over"):
+        """
+        Get the output of a Merge of two streams (union of the channels, bounding box of the operation)
+        :param name
+        :param stream_a
+        :param stream_b
+        :param step
+        :param operation
+        :return: stream
+        """
+        layer_formats = dict(stream_b.layer_formats)
+        for layer, layer_format in stream_a.layer_formats.items():
+            if layer not in layer_formats or layer_formats[layer][0] < layer_format[0]:
+                layer_formats[layer] = layer_format
+        # An unknown bounding box counts as empty
+        if stream_a.bbox is None or stream_b.bbox is None:
+            bbox = stream_a.bbox if stream_b.bbox is None else stream_b.bbox
+        else:
+            pass_through = BBox.has_pass_through(list(stream_b.layer_formats.keys())
+                                                 if len(stream_b.layer_formats) > 0 else None)
+            bbox = BBox.get_merge_bbox(operation, stream_a.bbox, stream_b.bbox, pass_through)[1]
+        return _Stream(name, [], step, layer_formats, bbox, stream_b.layers + stream_a.layers)
+
+    def get_nb_channels(self):
+        """
+        Getter of the number of channels carried
+        :return: nb channels
+        """
+        return sum(layer_format[0] for layer_format in self.layer_formats.values())
+
+    def get_file_bytes_per_pixel(self):
+        """
+        Getter of the bytes per pixel of the channels in the files (half or float)
+        :return: bytes per pixel
+        """
+        return sum(layer_format[1] for layer_format in self.layer_formats.values())
+
+    def get_frame_bytes(self):
+        """
+        Getter of the memory of a frame of the stream in Nuke (floats on the bounding box)
+        :return: bytes
+        """
+        if self.bbox is None:
+            return 0
+        return BBox.get_area(self.bbox) * self.get_nb_channels() * _NUKE_BYTES_PER_CHANNEL
+
+
+class CompCost:
+    """
+    Estimate of the cost of the graph of an Unpack Mode : nodes by class, channels and memory of a frame of each
+    branch (Read and utility Merge of a layer) and of each Merge. The backdrops are not counted.
+    """
+
+    @staticmethod
+    def format_bytes(size):
+        """
+        Format a number of bytes
+        :param size
+        :return: text
+        """
+        size = float(size)
+        for unit in _SIZE_UNITS[:-1]:
+            if size < 1024:
+                return "%.0f %s" % (size, unit) if unit == "B" else "%.1f %s" % (size, unit)
+            size /= 1024
+        return "%.1f %s" % (size, _SIZE_UNITS[-1])
+
+    def __init__(self):
+        """
+        Constructor
+        """
+        # {node class: count}
+        self.__node_counts = {}
+        # [(layer, nb channels, file bytes per pixel, bytes per pixel, bbox, frame bytes)]
+        self.__branches = []
+        # [(merge name, nb channels, bbox, frame bytes)]
+        self.__merges = []
+        self.__unknown_layers = []
+        self.__display_window = None
+
+    def add_nodes(self, node_class, count=1):
+        """
+        Count nodes of a class
+        :param node_class
+        :param count
+        :return:
+        """
+        if count > 0:
+            self.__node_counts[node_class] = self.__node_counts.get(node_class, 0) + count
+
+    def add_branch(self, layer, stream):
+        """
+        Add the branch of a layer
+        :param layer
+        :param stream
+        :return:
+        """
+        nb_channels = stream.get_nb_channels()
+        self.__branches.append((layer, nb_channels, stream.get_file_bytes_per_pixel(),
+                                nb_channels * _NUKE_BYTES_PER_CHANNEL, stream.bbox, stream.get_frame_bytes()))
+
+    def add_merge(self, name, stream):
+        """
+        Add a Merge and its output
+        :param name
+        :param stream : output of the merge
+        :return:
+        """
+        self.add_nodes("Merge2")
+        self.__merges.append((name, stream.get_nb_channels(), stream.bbox, stream.get_frame_bytes()))
+
+    def add_unknown_layer(self, layer):
+        """
+        Add a layer whose channels are unknown (frame not readable), counted without channels
+        :param layer
+        :return:
+        """
+        self.__unknown_layers.append(layer)
+
+    def set_display_window(self, display_window):
+        """
+        Setter of the format of the shot
+        :param display_window
+        :return:
+        """
+        self.__display_window = display_window
+
+    def get_node_counts(self):
+        """
+        Getter of the number of nodes by class
+        :return: {node class: count}
+        """
+        return self.__node_counts
+
+    def get_nb_nodes(self):
+        """
+        Getter of the number of nodes
+        :return: nb nodes
+        """
+        return sum(self.__node_counts.values())
+
+    def get_branches(self):
+        """
+        Getter of the branches of the layers
+        :return: [(layer, nb channels, file bytes per pixel, bytes per pixel, bbox, frame bytes)]
+        """
+        return self.__branches
+
+    def get_merges(self):
+        """
+        Getter of the Merges with the channels they carry
+        :return: [(merge name, nb channels, bbox, frame bytes)]
+        """
+        return self.__merges
+
+    def get_unknown_layers(self):
+        """
+        Getter of the layers whose channels are unknown
+        :return: layers
+        """
+        return self.__unknown_layers
+
+    def get_display_window(self):
+        """
+        Getter of the format of the shot
+        :return: x min, y min, x max, y max or None
+        """
+        return self.__display_window
+
+    def get_frame_bytes(self):
+        """
+        Getter of the memory of a frame of all the branches and Merges (all the node outputs in the cache)
+        :return: bytes
+        """
+        return sum(branch[5] for branch in self.__branches) + sum(merge[3] for merge in self.__merges)
+
+    def get_peak_frame_bytes(self):
+        """
+        Getter of the memory of a frame of the heaviest node output
+        :return: bytes
+        """
+        return max([branch[5] for branch in self.__branches] + [merge[3] for merge in self.__merges] + [0])
+
+    def get_summary(self):
+        """
+        Get a one line summary of the estimate
+        :return: summary
+        """
+        return "%d nodes, %d Merges, max %d channels, %s per frame (biggest node %s)" % (
+            self.get_nb_nodes(), len(self.__merges),
+            max([branch[1] for branch in self.__branches] + [merge[1] for merge in self.__merges] + [0]),
+            CompCost.format_bytes(self.get_frame_bytes()), CompCost.format_bytes(self.get_peak_frame_bytes()))
+
+    def get_report(self):
+        """
+        Get the detailed estimate
+        :return: lines
+        """
+        lines = [self.get_summary()]
+        if self.__display_window is not None:
+            lines.append("Format : %dx%d" % (self.__display_window[2] - self.__display_window[0] + 1,
+                                             self.__display_window[3] - self.__display_window[1] + 1))
+        lines.append("Nodes : " + ", ".join("%s %d" % (node_class, count)
+                                            for node_class, count in sorted(self.__node_counts.items())))
+        for layer, nb_channels, file_bytes, bytes_per_pixel, bbox, frame_bytes in self.__branches:
+            lines.append("Layer %s : %d channels, %d B/px in file, %d B/px in Nuke, bbox %s, %s per frame" %
+                         (layer, nb_channels, file_bytes, bytes_per_pixel,
+                          "%dx%d" % (bbox[2] - bbox[0] + 1, bbox[3] - bbox[1] + 1) if bbox is not None else "unknown",
+                          CompCost.format_bytes(frame_bytes)))
+        for name, nb_channels, _, frame_bytes in self.__merges:
+            lines.append("Merge %s : %d channels, %s per frame" % (name, nb_channels,
+                                                                    CompCost.format_bytes(frame_bytes)))
+        if len(self.__unknown_layers) > 0:
+            lines.append("Channels unknown : " + ", ".join(self.__unknown_layers))
+        return lines
+
+
+class CompCostEstimator:
+    """
+    Estimate the graph an Unpack Mode will build on a shot from the shot index, the rules of the mode and the EXR
+    headers of the channel catalog, without Nuke. It follows the steps of UnpackMode, ShuffleMode and MergeMode.
+    """
+
+    @staticmethod
+    def from_mode_file(path):
+        """
+        Create the estimator of an Unpack Mode config file
+        :param path
+        :return: estimator
+        :raise IOError, ValueError if the file can't be read
+        """
+        with open(path, "r") as f:
+            return CompCostEstimator(json.load(f))
+
+    def __init__(self, mode_data):
+        """
+        Constructor
+        :param mode_data : content of the Unpack Mode config file
+        """
+        # [(name, rule, aliases, order, group operation, crop to format, utility layers or None for all)]
+        # (AutoCompFactory ignores the layers without options)
+        self.__start_vars = []
+        for order, start_var_data in enumerate(mode_data.get("layers", [])):
+            if "name" not in start_var_data or "rule" not in start_var_data or "options" not in start_var_data:
+                continue
+            self.__start_vars.append((start_var_data["name"], start_var_data["rule"],
+                                      start_var_data.get("aliases", []), order,
+                                      start_var_data.get("group_operation"),
+                                      start_var_data["options"].get("crop_to_format") is True,
+                                      start_var_data["options"].get("utility_layers")))
+        self.__shuffle_layers = (mode_data.get("shuffle") or {}).get("shuffle_layer")
+        # [(name a, name b, operation, result name)]
+        self.__relations = [(rel_data["a"], rel_data["b"], rel_data["operation"], rel_data.get("result"))
+                            for rel_data in (mode_data.get("merge") or {}).get("rules", [])
+                            if "a" in rel_data and "b" in rel_data and "operation" in rel_data]
+
+    def __match_layers(self, shot_index):
+        """
+        Get the layers unpacked by the mode like UnpackMode.scan_layers
+        :param shot_index
+        :return: [(layer, start variable)] sorted by order
+        """
+        matched_layers = []
+        for render_layer in shot_index.get_layers():
+            for start_var in self.__start_vars:
+                if re.match(start_var[1], render_layer) is not None:
+                    matched_layers.append((render_layer, start_var))
+                    break
+        matched_layers.sort(key=lambda x: x[1][3])
+        return matched_layers
+
+    def estimate(self, shot_path, policy=None):
+        """
+        Estimate the cost of the graph of the mode on a shot
+        :param shot_path
+        :param policy : version policy, current one if None
+        :return: comp cost
+        """
+        if policy is None:
+            policy = VersionPolicy.get_current()
+        shot_index = ShotIndex.get_cached_index(shot_path, use_catalog=True)
+        if shot_index is None:
+            shot_index = ShotIndex.get_index(shot_path)
+        cost = CompCost()
+        if not shot_index.exists():
+            return cost
+
+        # Sequences of the layers (UnpackMode.get_last_seq_from_layer)
+        layer_seqs = []
+        for render_layer, start_var in self.__match_layers(shot_index):
+            version_data = policy.resolve(shot_index, render_layer)
+            if version_data is None:
+                continue
+            version, beauty_seq, utility_seq = version_data
+            version_path = shot_index.get_layer_path(render_layer) + "/" + version
+            seq_path = version_path + "/" + FrameSequence.get_seq_filename(version)
+            utility_path = None if utility_seq.is_empty() else \
+                version_path + "/" + FrameSequence.get_seq_filename(version, True)
+            layer_seqs.append((render_layer, start_var, seq_path, utility_path, beauty_seq.get_start(),
+                               utility_seq.get_start() if utility_path is not None else None))
+        seq_frames = [(seq_path, start_frame) for _, _, seq_path, _, start_frame, _ in layer_seqs] + \
+                     [(utility_path, utility_start_frame) for _, _, _, utility_path, _, utility_start_frame
+                      in layer_seqs if utility_path is not None]
+        entries = ChannelCatalog.get_current().prefetch(seq_frames)
+
+        # Reads (UnpackMode)
+        streams = []
+        for render_layer, start_var, seq_path, utility_path, start_frame, utility_start_frame in layer_seqs:
+            entry = entries.get((seq_path, start_frame))
+            stream = CompCostEstimator.__get_entry_stream(cost, start_var, render_layer, entry)
+            if entry is None or entry["layer_formats"] is None:
+                cost.add_unknown_layer(render_layer)
+            elif cost.get_display_window() is None:
+                cost.set_display_window(entry["display_window"])
+            cost.add_nodes("Read")
+            cost.add_nodes("PostageStamp")
+            layers = list(entry["layers"]) if entry is not None else []
+            utility_entry = entries.get((utility_path, utility_start_frame)) if utility_path is not None else None
+            utility_layers = None
+            if utility_path is not None and utility_entry is None and entry is not None and \
+                    start_var[6] is not None:
+                # Unknown utility channels : the layers listed by the mode and not in the beauty are still copied
+                utility_layers = [layer for layer in start_var[6] if layer not in layers]
+                if len(utility_layers) == 0:
+                    utility_path = None
+            elif utility_entry is not None and entry is not None:
+                utility_layers = [layer for layer in utility_entry["layers"] if layer not in layers]
+                if start_var[6] is not None:
+                    utility_layers = [layer for layer in utility_layers if layer in start_var[6]]
+                # The utility sequence isn't read when the beauty frames have its layers (multi part files)
+                if len(utility_layers) == 0:
+                    utility_path = None
+                layers.extend(utility_layers)
+            if utility_path is not None:
+                utility_stream = CompCostEstimator.__get_entry_stream(cost, start_var, render_layer, utility_entry)
+                cost.add_nodes("Read")
+                cost.add_nodes("PostageStamp")
+                if start_var[6] is None or utility_layers is None:
+                    stream = _Stream.merge(stream.name, utility_stream, stream, 0)
+                    stream.aliases = start_var[2]
+                    stream.layers = [render_layer]
+                    cost.add_merge("utility_merge_" + render_layer, stream)
+                else:
+                    # Chain of Copy nodes of the utility layers needed by the mode
+                    cost.add_nodes("Copy", len(utility_layers))
+                    utility_stream.layer_formats = dict((layer, layer_format) for layer, layer_format
+                                                        in utility_stream.layer_formats.items()
+                                                        if layer in utility_layers)
+                    stream = _Stream.merge(stream.name, utility_stream, stream, 0)
+                    stream.aliases = start_var[2]
+                    stream.layers = [render_layer]
+            cost.add_branch(render_layer, stream)
+            # The light groups of the utility sequence are shuffled too
+            streams.append((stream, ExrHeader.get_light_group_channels(layers)))
+
+        # Shuffles (ShuffleMode)
+        for stream, light_groups in streams:
+            if self.__shuffle_layers is not None and stream.name not in self.__shuffle_layers:
+                cost.add_nodes("Dot")
+                continue
+            cost.add_nodes("Dot", 2)
+            nb_light_groups = len(light_groups)
+            if nb_light_groups == 0:
+                continue
+            cost.add_nodes("Dot", nb_light_groups + 2)
+            cost.add_nodes("Shuffle2", nb_light_groups)
+            for _ in range(nb_light_groups - 1):
+                cost.add_merge("merge_shuffle_" + stream.layers[0], stream)
+
+        self.__estimate_merges(cost, [stream for stream, _ in streams])
+        return cost
+
+    @staticmethod
+    def __get_entry_stream(cost, start_var, render_layer, entry):
+        """
+        Get the stream of a Read node (and of its Crop if the layer is cropped to the format) from the catalog entry
+        of its sequence
+        :param cost
+        :param start_var
+        :param render_layer
+        :param entry : catalog entry or None if unknown
+        :return: stream
+        """
+        if entry is None or entry["layer_formats"] is None:
+            return _Stream(start_var[0], start_var[2], 0, {}, None, [render_layer])
+        data_window = tuple(entry["data_window"]) if entry["data_window"] is not None else None
+        display_window = entry["display_window"]
+        if start_var[5] and data_window is not None and display_window is not None and \
+                not BBox.contains(display_window, data_window):
+            cost.add_nodes("Crop")
+            data_window = BBox.intersection(data_window, tuple(display_window))
+        return _Stream(start_var[0], start_var[2], 0, dict(entry["layer_formats"]), data_window, [render_layer])
+
+    def __estimate_merges(self, cost, active_streams):
+        """
+        Estimate the groups and the relations of the merge (MergeMode)
+        :param cost
+        :param active_streams
+        :return:
+        """
+        active_streams = list(active_streams)
+        # Groups of the variables with the same name
+        streams_by_name = {}
+        for stream in active_streams:
+            streams_by_name.setdefault(stream.name, []).append(stream)
+        group_operations = dict((start_var[0], start_var[4]) for start_var in self.__start_vars)
+        for name, streams in streams_by_name.items():
+            if len(streams) <= 1 or group_operations.get(name) is None:
+                continue
+            streams.sort(key=lambda x: x.layers[0].lower())
+            if BBox.is_reorderable(group_operations[name]):
+                streams = streams[:1] + BBox.sort_by_area(streams[1:], lambda x: x.bbox)
+            cost.add_nodes("Dot")
+            result = streams[0]
+            active_streams.remove(streams[0])
+            for stream in streams[1:]:
+                active_streams.remove(stream)
+                result = _Stream.merge(name, stream, result, 0, group_operations[name])
+                cost.add_merge("merge_" + group_operations[name] + "_" + stream.layers[0], result)
+            result.step = streams[0].step + 1
+            active_streams.append(result)
+
+        # Relations
+        for name_a, name_b, operation, result_name in self.__relations:
+            stream_a = None
+            stream_b = None
+            for stream in active_streams:
+                if stream.name == name_a and stream_a is None and stream is not stream_b:
+                    stream_a = stream
+                elif stream.name == name_b and stream_b is None and stream is not stream_a:
+                    stream_b = stream
+            if stream_a is None or stream_b is None:
+                # Same lookup as MergeMode.run
+                for stream in active_streams:
+                    if name_a in stream.aliases and stream_a is None and stream is not stream_b:
+                        stream_b = stream
+                    elif name_b in stream.aliases and stream_b is None and stream is not stream_a:
+                        stream_b = stream
+            if stream_a is None or stream_b is None:
+                continue
+            cost.add_nodes("Dot")
+            result = _Stream.merge(result_name if result_name is not None else "", stream_a, stream_b,
+                                   max(stream_a.step, stream_b.step) + 1, operation)
+            cost.add_merge(name_a + "_" + operation + "_" + name_b, result)
+            active_streams.remove(stream_a)
+            active_streams.remove(stream_b)
+            active_streams.append(result)
@@ -0,0 +1,143 @@
+import json
+import os
+import tempfile
+import threading
+import time
+
+from .ShotIndex import RENDER_OUT_DIRNAME
+from .StorageBackend import StorageBackend
+
+# ######################################################################################################################
+
+_CACHE_PATH_ENV = "AUTO_COMP_BROWSER_CACHE"
+_DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".auto_comp", "browser_cache.json")
+_CACHE_FORMAT_VERSION = 1
+# A listing older than this is shown but listed again in the background
+STALE_DELAY = 60.0
+
+
+# ######################################################################################################################
+
+
+class DirectoryTreeCache:
+    """
+    Persistent cache of the sub folders of the folders opened in the shot browser, so that the project tree is shown
+    at once from one session to the next and only listed again in the background.
+    {"format": 1, "dirs": {"<path>": {"dirs": [sub folder names], "is_shot": bool, "time": float}}}
+    """
+    __current = None
+    __current_lock = threading.Lock()
+
+    @staticmethod
+    def get_current():
+        """
+        Getter of the cache in use (AUTO_COMP_BROWSER_CACHE or ~/.auto_comp/browser_cache.json)
+        :return: directory tree cache
+        """
+        with DirectoryTreeCache.__current_lock:
+            if DirectoryTreeCache.__current is None:
+                DirectoryTreeCache.__current = DirectoryTreeCache(
+                    os.environ.get(_CACHE_PATH_ENV, _DEFAULT_CACHE_PATH))
+            return DirectoryTreeCache.__current
+
+    @staticmethod
+    def normpath(path):
+        """
+        Normalize a folder path with forward slashes
+        :param path
+        :return: normalized path
+        """
+        return StorageBackend.get_backend(path).normpath(path)
+
+    def __init__(self, cache_path):
+        """
+        Constructor
+        :param cache_path
+        """
+        self.__cache_path = cache_path
+        # {path: {"dirs": [...], "is_shot": bool, "time": float}}
+        self.__dirs = None
+        self.__dirty = False
+        # The listings are stored by the threads of the browser
+        self.__lock = threading.Lock()
+
+    def __load(self):
+        """
+        Load the cache file once, a missing or corrupted file gives an empty cache (called with the lock)
+        :return:
+        """
+        if self.__dirs is not None:
+            return
+        self.__dirs = {}
+        try:
+            with open(self.__cache_path, "r") as f:
+                data = json.load(f)
+        except (IOError, OSError, ValueError):
+            return
+        if isinstance(data, dict) and data.get("format") == _CACHE_FORMAT_VERSION and \
+                isinstance(data.get("dirs"), dict):
+            self.__dirs = data["dirs"]
+
+    def get_listing(self, path):
+        """
+        Get the cached listing of a folder
+        :param path
+        :return: sub folders, is shot, is stale or None if the folder has never been listed
+        """
+        path = DirectoryTreeCache.normpath(path)
+        with self.__lock:
+            self.__load()
+            listing = self.__dirs.get(path)
+        if listing is None:
+            return None
+        return listing["dirs"], listing["is_shot"], time.time() - listing["time"] > STALE_DELAY
+
+    def list_dir(self, path):
+        """
+        List a folder and store its sub folders (the hidden folders and render_out are not kept)
+        :param path
+        :return: sub folders, is shot or None if the folder can't be listed
+        """
+        path = DirectoryTreeCache.normpath(path)
+        try:
+            entries = StorageBackend.get_backend(path).list_dir(path)
+        except OSError:
+            with self.__lock:
+                self.__load()
+                if self.__dirs.pop(path, None) is not None:
+                    self.__dirty = True
+            return None
+        names = [entry.get_name() for entry in entries if entry.is_dir()]
+        is_shot = RENDER_OUT_DIRNAME in names
+        dirs = sorted([name for name in names if not name.startswith(".") and name != RENDER_OUT_DIRNAME],
+                      key=lambda x: x.lower())
+        with self.__lock:
+            self.__load()
+            self.__dirs[path] = {"dirs": dirs, "is_shot": is_shot, "time": time.time()}
+            self.__dirty = True
+        return dirs, is_shot
+
+    def save(self):
+        """
+        Save the cache atomically if it changed
+        :return:
+        """
+        with self.__lock:
+            if not self.__dirty:
+                return
+            data = {"format": _CACHE_FORMAT_VERSION, "dirs": dict(self.__dirs)}
+            self.__dirty = False
+        cache_dir = os.path.dirname(self.__cache_path)
+        try:
+            if not os.path.isdir(cache_dir):
+                os.makedirs(cache_dir)
+            fd, tmp_path = tempfile.mkstemp(prefix=".tmp_", suffix=".json", dir=cache_dir)
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump(data, f)
+                os.replace(tmp_path, self.__cache_path)
+            except Exception:
+                os.remove(tmp_path)
+                raise
+        except (IOError, OSError) as e:
+            print("### Warning : Unable to save the browser cache " + self.__cache_path + " : " + str(e))
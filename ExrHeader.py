@@ -0,0 +1,443 @@
+import struct
+
+from .StorageBackend import StorageBackend
+
+# ######################################################################################################################
+
+_EXR_MAGIC = 20000630
+# Flags of the version field
+_FLAG_TILED = 0x200
+_FLAG_NON_IMAGE = 0x800
+_FLAG_MULTI_PART = 0x1000
+# The headers of the render frames fit in the first read, bigger headers (lots of metadata) are read again larger
+_HEADER_READ_SIZE = 64 * 1024
+_MAX_HEADER_SIZE = 16 * 1024 * 1024
+
+COMPRESSIONS = ["none", "rle", "zips", "zip", "piz", "pxr24", "b44", "b44a", "dwaa", "dwab"]
+PIXEL_TYPES = ["uint", "half", "float"]
+PIXEL_SIZES = {"uint": 4, "half": 2, "float": 4}
+_LEVEL_MODES = ["one_level", "mipmap_levels", "ripmap_levels"]
+
+LIGHT_GROUP_PREFIX = "RGBA_"
+EXTRA_CHANNELS = ["emission", "emission_indirect"]
+
+
+# ######################################################################################################################
+
+
+class _TruncatedHeader(Exception):
+    """
+    Raised when the bytes read end before the header
+    """
+    pass
+
+
+class _HeaderReader:
+    """
+    Cursor on the bytes of the beginning of an EXR file
+    """
+
+    def __init__(self, data):
+        """
+        Constructor
+        :param data
+        """
+        self.__data = data
+        self.__pos = 0
+
+    def get_pos(self):
+        """
+        Getter of the position of the cursor
+        :return: pos
+        """
+        return self.__pos
+
+    def read(self, size):
+        """
+        Read bytes
+        :param size
+        :return: bytes
+        """
+        if self.__pos + size > len(self.__data):
+            raise _TruncatedHeader()
+        data = self.__data[self.__pos:self.__pos + size]
+        self.__pos += size
+        return data
+
+    def read_struct(self, fmt):
+        """
+        Read little endian values
+        :param fmt : struct format without byte order
+        :return: values
+        """
+        return struct.unpack("<" + fmt, self.read(struct.calcsize("<" + fmt)))
+
+    def read_string(self):
+        """
+        Read a null terminated string
+        :return: string
+        """
+        end = self.__data.find(b"\0", self.__pos)
+        if end < 0:
+            raise _TruncatedHeader()
+        string = self.__data[self.__pos:end].decode("utf-8", "replace")
+        self.__pos = end + 1
+        return string
+
+
+class ExrPart:
+    """
+    Header of a part of an EXR file (a single part file has one part)
+    """
+
+    def __init__(self, attributes):
+        """
+        Constructor
+        :param attributes : {name: parsed value}
+        """
+        self.__attributes = attributes
+
+    def get_attribute(self, name):
+        """
+        Getter of an attribute of the header (channels, compression, dataWindow, displayWindow, tiles, name, type,
+        the metadata written by the renderer as raw bytes for the types not parsed)
+        :param name
+        :return: value or None
+        """
+        return self.__attributes.get(name)
+
+    def get_name(self):
+        """
+        Getter of the name of the part
+        :return: name or None for a single part file
+        """
+        return self.__attributes.get("name")
+
+    def get_type(self):
+        """
+        Getter of the type of the part (scanlineimage, tiledimage, deepscanline, deeptile)
+        :return: type or None for a single part file
+        """
+        return self.__attributes.get("type")
+
+    def get_channels(self):
+        """
+        Getter of the channel names of the part, in the order of the file (sorted by name)
+        :return: channel names
+        """
+        return [channel[0] for channel in self.__attributes.get("channels", [])]
+
+    def get_channel_infos(self):
+        """
+        Getter of the channels of the part
+        :return: [(name, pixel type, x sampling, y sampling)]
+        """
+        return list(self.__attributes.get("channels", []))
+
+    def get_compression(self):
+        """
+        Getter of the compression of the part
+        :return: compression name (see COMPRESSIONS) or None
+        """
+        return self.__attributes.get("compression")
+
+    def get_data_window(self):
+        """
+        Getter of the data window (bounding box of the pixels stored)
+        :return: x min, y min, x max, y max or None
+        """
+        return self.__attributes.get("dataWindow")
+
+    def get_display_window(self):
+        """
+        Getter of the display window (format of the image)
+        :return: x min, y min, x max, y max or None
+        """
+        return self.__attributes.get("displayWindow")
+
+    def is_tiled(self):
+        """
+        Getter of whether the part is stored in tiles
+        :return: is tiled
+        """
+        return "tiles" in self.__attributes
+
+    def get_tile_desc(self):
+        """
+        Getter of the tile description of a tiled part
+        :return: tile width, tile height, level mode or None if the part is stored in scanlines
+        """
+        return self.__attributes.get("tiles")
+
+
+class ExrHeader:
+    """
+    Header only reader of the OpenEXR files. It reads the first kilobytes of a frame through the storage backend of
+    its path to get its channels, windows, compression, tiling and parts, without Nuke and without Read node.
+    Spec : https://openexr.com/en/latest/OpenEXRFileLayout.html
+    """
+
+    @staticmethod
+    def read(path, backend=None):
+        """
+        Read the header of an EXR file
+        :param path
+        :param backend : storage backend of the file, found from the path if None
+        :return: exr header
+        :raise OSError if the file can't be read, ValueError if it is not an EXR file
+        """
+        if backend is None:
+            backend = StorageBackend.get_backend(path)
+        read_size = _HEADER_READ_SIZE
+        while True:
+            data = backend.open_range(path, 0, read_size)
+            try:
+                return ExrHeader.__parse(data)
+            except _TruncatedHeader:
+                if len(data) < read_size:
+                    raise ValueError("Truncated EXR header : " + path)
+                if read_size >= _MAX_HEADER_SIZE:
+                    raise ValueError("EXR header bigger than %d bytes : %s" % (_MAX_HEADER_SIZE, path))
+                read_size *= 4
+
+    @staticmethod
+    def parse(data):
+        """
+        Parse the header of an EXR file from its first bytes
+        :param data
+        :return: exr header
+        :raise ValueError if the bytes are not the beginning of an EXR file or end before its header
+        """
+        try:
+            return ExrHeader.__parse(data)
+        except _TruncatedHeader:
+            raise ValueError("Truncated EXR header")
+
+    @staticmethod
+    def __parse(data):
+        """
+        Parse the header of an EXR file from its first bytes
+        :param data
+        :return: exr header
+        :raise _TruncatedHeader if the bytes end before the header
+        """
+        reader = _HeaderReader(data)
+        try:
+            magic, version = reader.read_struct("ii")
+        except _TruncatedHeader:
+            raise ValueError("Not an EXR file")
+        if magic != _EXR_MAGIC:
+            raise ValueError("Not an EXR file")
+        if version & 0xff != 2:
+            raise ValueError("Unsupported EXR version %d" % (version & 0xff))
+        parts = []
+        if version & _FLAG_MULTI_PART:
+            # Headers one after the other, ended by an empty header
+            while True:
+                attributes = ExrHeader.__parse_attributes(reader)
+                if len(attributes) == 0:
+                    break
+                parts.append(ExrPart(attributes))
+        else:
+            parts.append(ExrPart(ExrHeader.__parse_attributes(reader)))
+        return ExrHeader(version, parts, reader.get_pos())
+
+    @staticmethod
+    def __parse_attributes(reader):
+        """
+        Parse the attributes of a header until its terminating null byte
+        :param reader
+        :return: {name: value}
+        """
+        attributes = {}
+        while True:
+            name = reader.read_string()
+            if not name:
+                return attributes
+            attr_type = reader.read_string()
+            size = reader.read_struct("i")[0]
+            if size < 0:
+                raise ValueError("Corrupted EXR header")
+            attributes[name] = ExrHeader.__parse_value(attr_type, reader.read(size))
+
+    @staticmethod
+    def __parse_value(attr_type, data):
+        """
+        Parse the value of an attribute, the types not used by AutoComp are kept as bytes
+        :param attr_type
+        :param data
+        :return: value
+        """
+        try:
+            if attr_type == "chlist":
+                return ExrHeader.__parse_channels(data)
+            if attr_type == "compression":
+                compression = data[0]
+                return COMPRESSIONS[compression] if compression < len(COMPRESSIONS) else str(compression)
+            if attr_type == "box2i":
+                return struct.unpack("<iiii", data[:16])
+            if attr_type == "box2f":
+                return struct.unpack("<ffff", data[:16])
+            if attr_type == "tiledesc":
+                width, height, mode = struct.unpack("<IIB", data[:9])
+                level_mode = mode & 0x0f
+                return width, height, _LEVEL_MODES[level_mode] if level_mode < len(_LEVEL_MODES) else str(level_mode)
+            if attr_type == "string":
+                return data.decode("utf-8", "replace")
+            if attr_type == "int":
+                return struct.unpack("<i", data[:4])[0]
+            if attr_type == "float":
+                return struct.unpack("<f", data[:4])[0]
+            if attr_type == "v2i":
+                return struct.unpack("<ii", data[:8])
+            if attr_type == "v2f":
+                return struct.unpack("<ff", data[:8])
+        except (IndexError, struct.error):
+            raise ValueError("Corrupted EXR attribute of type " + attr_type)
+        return data
+
+    @staticmethod
+    def __parse_channels(data):
+        """
+        Parse a channel list
+        :param data
+        :return: [(name, pixel type, x sampling, y sampling)]
+        """
+        reader = _HeaderReader(data)
+        channels = []
+        try:
+            while True:
+                name = reader.read_string()
+                if not name:
+                    return channels
+                pixel_type, _, x_sampling, y_sampling = reader.read_struct("iIii")
+                channels.append((name, PIXEL_TYPES[pixel_type] if 0 <= pixel_type < len(PIXEL_TYPES)
+                                 else str(pixel_type), x_sampling, y_sampling))
+        except _TruncatedHeader:
+            raise ValueError("Corrupted EXR channel list")
+
+    @staticmethod
+    def get_light_group_channels(channels):
+        """
+        Get the light group layers (RGBA_*) and the extra layers (emission) of channel names, in their order
+        :param channels : channel names (layer.channel)
+        :return: layer names
+        """
+        light_groups = []
+        for channel in channels:
+            layer = channel.split(".")[0]
+            if (layer.startswith(LIGHT_GROUP_PREFIX) or layer in EXTRA_CHANNELS) and layer not in light_groups:
+                light_groups.append(layer)
+        return light_groups
+
+    def __init__(self, version, parts, size):
+        """
+        Constructor
+        :param version : version field with its flags
+        :param parts
+        :param size : size of the header in bytes
+        """
+        self.__version = version
+        self.__parts = parts
+        self.__size = size
+
+    def get_size(self):
+        """
+        Getter of the size of the header in bytes
+        :return: size
+        """
+        return self.__size
+
+    def get_parts(self):
+        """
+        Getter of the parts of the file
+        :return: parts
+        """
+        return self.__parts
+
+    def is_multi_part(self):
+        """
+        Getter of whether the file has several parts
+        :return: is multi part
+        """
+        return bool(self.__version & _FLAG_MULTI_PART)
+
+    def is_deep(self):
+        """
+        Getter of whether the file stores deep data
+        :return: is deep
+        """
+        return bool(self.__version & _FLAG_NON_IMAGE) or \
+            any((part.get_type() or "").startswith("deep") for part in self.__parts)
+
+    def is_tiled(self):
+        """
+        Getter of whether the file is stored in tiles
+        :return: is tiled
+        """
+        return bool(self.__version & _FLAG_TILED) or any(part.is_tiled() for part in self.__parts)
+
+    def get_channel_infos(self):
+        """
+        Getter of the channels of all the parts, named like in Nuke : in a multi part file the channels without layer
+        of the parts after the first one are prefixed by the name of their part (utility.Z for instance)
+        :return: [(name, pixel type, x sampling, y sampling)]
+        """
+        channel_infos = []
+        names = set()
+        for index, part in enumerate(self.__parts):
+            part_name = part.get_name()
+            for name, pixel_type, x_sampling, y_sampling in part.get_channel_infos():
+                if index > 0 and part_name and "." not in name:
+                    name = part_name + "." + name
+                if name not in names:
+                    names.add(name)
+                    channel_infos.append((name, pixel_type, x_sampling, y_sampling))
+        return channel_infos
+
+    def get_channels(self):
+        """
+        Getter of the channel names of all the parts (see get_channel_infos)
+        :return: channel names
+        """
+        return [channel_info[0] for channel_info in self.get_channel_infos()]
+
+    def get_compression(self):
+        """
+        Getter of the compression of the first part
+        :return: compression name or None
+        """
+        return self.__parts[0].get_compression() if len(self.__parts) > 0 else None
+
+    def get_data_window(self):
+        """
+        Getter of the data window of the file (union of the data windows of the parts)
+        :return: x min, y min, x max, y max or None
+        """
+        windows = [part.get_data_window() for part in self.__parts if part.get_data_window() is not None]
+        if len(windows) == 0:
+            return None
+        return (min(window[0] for window in windows), min(window[1] for window in windows),
+                max(window[2] for window in windows), max(window[3] for window in windows))
+
+    def get_display_window(self):
+        """
+        Getter of the display window of the first part
+        :return: x min, y min, x max, y max or None
+        """
+        return self.__parts[0].get_display_window() if len(self.__parts) > 0 else None
+
+    def get_pixel_aspect(self):
+        """
+        Getter of the pixel aspect ratio of the first part
+        :return: pixel aspect ratio (1 if not written)
+        """
+        pixel_aspect = self.__parts[0].get_attribute("pixelAspectRatio") if len(self.__parts) > 0 else None
+        return pixel_aspect if isinstance(pixel_aspect, float) else 1.0
+
+    def get_light_groups(self):
+        """
+        Getter of the light group and extra layers of the file
+        :return: layer names
+        """
+        return ExrHeader.get_light_group_channels(self.get_channels())
@@ -0,0 +1,248 @@
+import struct
+import zlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from .ChannelCatalog import ChannelCatalog
+from .ExrHeader import ExrHeader, PIXEL_SIZES
+from .StorageBackend import StorageBackend
+
+# ######################################################################################################################
+
+# Scanlines stored in a chunk for the supported compressions
+_LINES_PER_CHUNK = {"none": 1, "rle": 1, "zips": 1, "zip": 16}
+_PIXEL_DTYPES = {"uint": "<u4", "half": "<f2", "float": "<f4"}
+_READ_WORKERS = 8
+
+# A light group whose channels stay under this value in all the samples is empty
+DEFAULT_EMPTY_THRESHOLD = 1e-4
+DEFAULT_NB_SAMPLES = 3
+
+
+# ######################################################################################################################
+
+
+def _read_frame_stats(frame_path):
+    """
+    Worker function computing the statistics of a frame (run in a process of the pool)
+    :param frame_path
+    :return: {channel: (max, mean)}
+    """
+    return ExrPixelStats.read(frame_path)
+
+
+# ######################################################################################################################
+
+
+class ExrPixelStats:
+    """
+    Decoder of the pixels of the single part scanline EXR files (uncompressed, RLE, ZIPS and ZIP) computing the
+    maximum absolute value and the mean of each channel, to find the light groups that are black in a shot.
+    It needs NumPy, without it is_available is False.
+    """
+
+    @staticmethod
+    def is_available():
+        """
+        Getter of whether the pixels can be decoded (NumPy available)
+        :return: is available
+        """
+        return numpy is not None
+
+    @staticmethod
+    def get_sample_frames(start_frame, end_frame, nb_samples=DEFAULT_NB_SAMPLES):
+        """
+        Get frames spread on a frame range
+        :param start_frame
+        :param end_frame
+        :param nb_samples
+        :return: frames
+        """
+        if nb_samples <= 1 or end_frame <= start_frame:
+            return [start_frame]
+        step = (end_frame - start_frame) / float(nb_samples - 1)
+        return sorted(set(int(round(start_frame + index * step)) for index in range(nb_samples)))
+
+    @staticmethod
+    def read(frame_path, backend=None):
+        """
+        Decode a frame and compute the statistics of its channels
+        :param frame_path
+        :param backend : storage backend of the file, found from the path if None
+        :return: {channel: (max of the absolute values, mean)}
+        :raise OSError if the file can't be read, ValueError if it is not supported or corrupted
+        """
+        if numpy is None:
+            raise ValueError("NumPy is not available")
+        if backend is None:
+            backend = StorageBackend.get_backend(frame_path)
+        data = backend.open_range(frame_path)
+        header = ExrHeader.parse(data)
+        if header.is_multi_part() or header.is_tiled() or header.is_deep():
+            raise ValueError("Only the single part scanline files are supported")
+        part = header.get_parts()[0]
+        compression = part.get_compression()
+        if compression not in _LINES_PER_CHUNK:
+            raise ValueError("Unsupported compression " + str(compression))
+        channel_infos = part.get_channel_infos()
+        if any(x_sampling != 1 or y_sampling != 1 for _, _, x_sampling, y_sampling in channel_infos):
+            raise ValueError("Sub sampled channels are not supported")
+        if any(pixel_type not in _PIXEL_DTYPES for _, pixel_type, _, _ in channel_infos):
+            raise ValueError("Unknown pixel type")
+        x_min, y_min, x_max, y_max = part.get_data_window()
+        width = x_max - x_min + 1
+        height = y_max - y_min + 1
+        lines_per_chunk = _LINES_PER_CHUNK[compression]
+        line_size = width * sum(PIXEL_SIZES[pixel_type] for _, pixel_type, _, _ in channel_infos)
+        nb_chunks = (height + lines_per_chunk - 1) // lines_per_chunk
+        if header.get_size() + nb_chunks * 8 > len(data):
+            raise ValueError("Truncated offset table")
+        offsets = struct.unpack_from("<%dQ" % nb_chunks, data, header.get_size())
+
+        maxs = dict((name, 0.0) for name, _, _, _ in channel_infos)
+        sums = dict((name, 0.0) for name, _, _, _ in channel_infos)
+        for offset in offsets:
+            try:
+                y, size = struct.unpack_from("<ii", data, offset)
+            except struct.error:
+                raise ValueError("Truncated chunk")
+            nb_lines = min(lines_per_chunk, y_max - y + 1)
+            if nb_lines <= 0 or size < 0 or offset + 8 + size > len(data):
+                raise ValueError("Corrupted chunk")
+            raw = ExrPixelStats.__decode_chunk(data[offset + 8:offset + 8 + size], compression, nb_lines * line_size)
+            pixels = numpy.frombuffer(raw, numpy.uint8).reshape(nb_lines, line_size)
+            # The channels of a scanline are stored one after the other (sorted by name)
+            pos = 0
+            for name, pixel_type, _, _ in channel_infos:
+                segment_size = width * PIXEL_SIZES[pixel_type]
+                values = numpy.ascontiguousarray(pixels[:, pos:pos + segment_size]).view(_PIXEL_DTYPES[pixel_type])
+                pos += segment_size
+                values = numpy.abs(values[numpy.isfinite(values)].astype(numpy.float64))
+                if values.size > 0:
+                    maxs[name] = max(maxs[name], float(values.max()))
+                    sums[name] += float(values.sum())
+        nb_pixels = float(width * height)
+        return dict((name, (maxs[name], sums[name] / nb_pixels)) for name in maxs)
+
+    @staticmethod
+    def __decode_chunk(chunk, compression, raw_size):
+        """
+        Decompress the pixels of a chunk
+        :param chunk
+        :param compression
+        :param raw_size : size of the decompressed chunk
+        :return: bytes
+        """
+        # A chunk that can't be compressed is stored as is
+        if len(chunk) == raw_size:
+            return chunk
+        if compression == "none":
+            raise ValueError("Corrupted chunk")
+        try:
+            if compression == "rle":
+                data = ExrPixelStats.__rle_decompress(chunk)
+            else:
+                data = zlib.decompress(chunk)
+        except (zlib.error, IndexError):
+            raise ValueError("Corrupted chunk")
+        if len(data) != raw_size:
+            raise ValueError("Corrupted chunk")
+        return ExrPixelStats.__reorder(data)
+
+    @staticmethod
+    def __rle_decompress(chunk):
+        """
+        Decompress a RLE chunk (negative count : bytes copied, positive count : next byte repeated count + 1 times)
+        :param chunk
+        :return: bytes
+        """
+        data = bytearray()
+        pos = 0
+        while pos < len(chunk):
+            count = chunk[pos] - 256 if chunk[pos] > 127 else chunk[pos]
+            if count < 0:
+                data += chunk[pos + 1:pos + 1 - count]
+                pos += 1 - count
+            else:
+                data += chunk[pos + 1:pos + 2] * (count + 1)
+                pos += 2
+        return bytes(data)
+
+    @staticmethod
+    def __reorder(data):
+        """
+        Undo the predictor and the interleaving of the bytes applied before the RLE and ZIP compressions
+        :param data
+        :return: bytes
+        """
+        deltas = numpy.frombuffer(data, numpy.uint8).astype(numpy.int64)
+        deltas[1:] -= 128
+        predicted = (numpy.cumsum(deltas) & 0xff).astype(numpy.uint8)
+        half = (len(predicted) + 1) // 2
+        reordered = numpy.empty(len(predicted), numpy.uint8)
+        reordered[0::2] = predicted[:half]
+        reordered[1::2] = predicted[half:]
+        return reordered.tobytes()
+
+    @staticmethod
+    def read_many(frame_paths):
+        """
+        Compute the statistics of many frames in a pool (of processes outside the Nuke GUI)
+        :param frame_paths
+        :return: {frame path: {channel: (max, mean)} or None if the frame can't be decoded}
+        """
+        frame_paths = list(dict.fromkeys(frame_paths))
+        if len(frame_paths) == 0:
+            return {}
+        executor_cls = ProcessPoolExecutor if ChannelCatalog.can_use_processes() else ThreadPoolExecutor
+        try:
+            return ExrPixelStats.__read_many(executor_cls, frame_paths)
+        except (OSError, BrokenProcessPool) as e:
+            print("### Warning : Pixel statistics processes failed, using threads : " + str(e))
+            return ExrPixelStats.__read_many(ThreadPoolExecutor, frame_paths)
+
+    @staticmethod
+    def __read_many(executor_cls, frame_paths):
+        """
+        Compute the statistics of frames in a pool
+        :param executor_cls : ProcessPoolExecutor or ThreadPoolExecutor
+        :param frame_paths
+        :return: {frame path: {channel: (max, mean)} or None}
+        """
+        stats_by_frame = {}
+        with executor_cls(max_workers=min(_READ_WORKERS, len(frame_paths))) as executor:
+            futures = {executor.submit(_read_frame_stats, frame_path): frame_path for frame_path in frame_paths}
+            for future in as_completed(futures):
+                frame_path = futures[future]
+                try:
+                    stats_by_frame[frame_path] = future.result()
+                except (IOError, OSError, ValueError) as e:
+                    print("### Warning : Unable to decode " + frame_path + " : " + str(e))
+                    stats_by_frame[frame_path] = None
+        return stats_by_frame
+
+    @staticmethod
+    def get_empty_light_groups(frame_stats, light_groups, threshold=DEFAULT_EMPTY_THRESHOLD):
+        """
+        Get the light groups whose channels are black in all the samples of a layer
+        :param frame_stats : statistics of the decoded samples [{channel: (max, mean)}]
+        :param light_groups
+        :param threshold : maximum absolute value of a black channel
+        :return: empty light groups (none if no sample has been decoded)
+        """
+        frame_stats = [stats for stats in frame_stats if stats is not None]
+        if len(frame_stats) == 0:
+            return []
+        empty_light_groups = []
+        for light_group in light_groups:
+            maxs = [channel_max for stats in frame_stats for channel, (channel_max, _) in stats.items()
+                    if channel.split(".")[0] == light_group]
+            # A light group not found in the samples is kept
+            if len(maxs) > 0 and max(maxs) <= threshold:
+                empty_light_groups.append(light_group)
+        return empty_light_groups
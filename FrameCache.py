@@ -0,0 +1,419 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .FrameSequence import SEQ_PADDING
+from .StorageBackend import PosixBackend, StorageBackend
+
+# ######################################################################################################################
+
+_CACHE_DIR_ENV = "AUTO_COMP_FRAME_CACHE_DIR"
+_DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".auto_comp", "frame_cache")
+_INDEX_FILENAME = "index.json"
+_INDEX_FORMAT_VERSION = 1
+DEFAULT_BUDGET = 50 * 1024 ** 3
+DEFAULT_COPY_THREADS = 4
+# Size of the chunks read from the storages that can't copy whole files
+_CHUNK_SIZE = 8 * 1024 ** 2
+
+
+# ######################################################################################################################
+
+
+class FrameCache:
+    """
+    Cache of render version folders copied to a local disk, so that the Reads don't pull the frames over the network
+    at each scrub. The frames of a sequence are copied by a pool of threads, the least recently used version folders
+    are evicted to stay within the disk budget.
+    The cache folder contains one folder per version folder and an index :
+    {"format": 1, "entries": {"<local dir name>": {"source": str, "size": int, "last_used": float,
+                                                   "sequences": [copied sequence filenames], "complete": bool}}}
+    """
+    __current = None
+    __current_lock = threading.Lock()
+
+    @staticmethod
+    def get_current():
+        """
+        Getter of the frame cache in use (created in AUTO_COMP_FRAME_CACHE_DIR or ~/.auto_comp/frame_cache)
+        :return: frame cache
+        """
+        with FrameCache.__current_lock:
+            if FrameCache.__current is None:
+                FrameCache.__current = FrameCache(os.environ.get(_CACHE_DIR_ENV, _DEFAULT_CACHE_DIR))
+            return FrameCache.__current
+
+    @staticmethod
+    def get_seq_regex(seq_filename):
+        """
+        Get the regex matching the frame files of a sequence filename (seq_name.####.exr or seq_name.%04d.exr)
+        :param seq_filename
+        :return: regex
+        """
+        pattern = re.escape(seq_filename)
+        for padding in (re.escape(SEQ_PADDING), re.escape("%04d")):
+            pattern = pattern.replace(padding, "[0-9]{4}")
+        return re.compile("^" + pattern + "$")
+
+    def __init__(self, cache_dir, budget=DEFAULT_BUDGET, copy_threads=DEFAULT_COPY_THREADS):
+        """
+        Constructor
+        :param cache_dir
+        :param budget : maximum size of the cache in bytes
+        :param copy_threads : number of frames copied concurrently
+        """
+        self.__cache_dir = cache_dir.replace("\\", "/")
+        self.__budget = budget
+        self.__copy_threads = copy_threads
+        self.__lock = threading.Lock()
+        # {local dir name: entry}
+        self.__entries = None
+        # Local dir names being copied or read by Read nodes, never evicted
+        self.__copying = set()
+        self.__pinned = set()
+
+    def get_cache_dir(self):
+        """
+        Getter of the cache folder
+        :return: cache dir
+        """
+        return self.__cache_dir
+
+    def get_budget(self):
+        """
+        Getter of the maximum size of the cache
+        :return: budget in bytes
+        """
+        return self.__budget
+
+    def set_budget(self, budget):
+        """
+        Setter of the maximum size of the cache, the cache is evicted down to it
+        :param budget : bytes
+        :return:
+        """
+        self.__budget = max(0, int(budget))
+        with self.__lock:
+            self.__evict(0)
+
+    def set_copy_threads(self, copy_threads):
+        """
+        Setter of the number of frames copied concurrently
+        :param copy_threads
+        :return:
+        """
+        self.__copy_threads = max(1, int(copy_threads))
+
+    def set_pinned(self, local_paths):
+        """
+        Set the local sequences read by the Read nodes, their folders are not evicted
+        :param local_paths : local paths of sequences or frames
+        :return:
+        """
+        with self.__lock:
+            self.__pinned = set([self.get_entry_name(local_path) for local_path in local_paths])
+            self.__pinned.discard(None)
+
+    def get_local_dir(self, version_dir):
+        """
+        Get the local folder of a version folder
+        :param version_dir : network version folder
+        :return: local dir
+        """
+        version_dir = version_dir.replace("\\", "/").rstrip("/")
+        digest = hashlib.sha1(version_dir.encode("utf-8")).hexdigest()[:16]
+        return self.__cache_dir + "/" + digest + "_" + version_dir.rpartition("/")[2]
+
+    def get_local_path(self, network_path):
+        """
+        Get the local path of a network sequence or frame path
+        :param network_path
+        :return: local path
+        """
+        version_dir, _, filename = network_path.replace("\\", "/").rpartition("/")
+        return self.get_local_dir(version_dir) + "/" + filename
+
+    def is_local_path(self, path):
+        """
+        Check if a path is in the cache folder
+        :param path
+        :return: is local path
+        """
+        return path.replace("\\", "/").startswith(self.__cache_dir + "/")
+
+    def get_entry_name(self, local_path):
+        """
+        Get the name of the cached version folder of a local path
+        :param local_path
+        :return: entry name or None if the path is not in the cache
+        """
+        if not self.is_local_path(local_path):
+            return None
+        return local_path.replace("\\", "/")[len(self.__cache_dir) + 1:].partition("/")[0]
+
+    def __get_index_path(self):
+        """
+        Getter of the path of the index file
+        :return: index path
+        """
+        return self.__cache_dir + "/" + _INDEX_FILENAME
+
+    def __load_entries(self):
+        """
+        Load the index once, a missing or corrupted index gives an empty cache (called with the lock)
+        :return:
+        """
+        if self.__entries is not None:
+            return
+        self.__entries = {}
+        try:
+            with open(self.__get_index_path(), "r") as f:
+                data = json.load(f)
+        except (IOError, OSError, ValueError):
+            return
+        if isinstance(data, dict) and data.get("format") == _INDEX_FORMAT_VERSION and \
+                isinstance(data.get("entries"), dict):
+            self.__entries = data["entries"]
+
+    def __save_entries(self):
+        """
+        Save the index atomically (called with the lock)
+        :return:
+        """
+        try:
+            if not os.path.isdir(self.__cache_dir):
+                os.makedirs(self.__cache_dir)
+            fd, tmp_path = tempfile.mkstemp(prefix=".tmp_", suffix=".json", dir=self.__cache_dir)
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump({"format": _INDEX_FORMAT_VERSION, "entries": self.__entries}, f)
+                os.replace(tmp_path, self.__get_index_path())
+            except Exception:
+                os.remove(tmp_path)
+                raise
+        except (IOError, OSError) as e:
+            print("### Warning : Unable to save the frame cache index " + self.__get_index_path() + " : " + str(e))
+
+    def get_entries(self):
+        """
+        Getter of the cached version folders, the most recently used first
+        :return: [(local dir name, source version folder, size, last used, complete, is copying)]
+        """
+        with self.__lock:
+            self.__load_entries()
+            entries = [(name, entry.get("source", ""), entry.get("size", 0), entry.get("last_used", 0),
+                        entry.get("complete", False), name in self.__copying)
+                       for name, entry in self.__entries.items()]
+        return sorted(entries, key=lambda x: x[3], reverse=True)
+
+    def get_size(self):
+        """
+        Getter of the size of the cache
+        :return: size in bytes
+        """
+        with self.__lock:
+            self.__load_entries()
+            return sum([entry.get("size", 0) for entry in self.__entries.values()])
+
+    def is_localized(self, network_path):
+        """
+        Check if all the frames of a sequence have been copied
+        :param network_path
+        :return: is localized
+        """
+        name = self.get_entry_name(self.get_local_path(network_path))
+        with self.__lock:
+            self.__load_entries()
+            entry = self.__entries.get(name)
+            return entry is not None and entry.get("complete", False) and \
+                network_path.replace("\\", "/").rpartition("/")[2] in entry.get("sequences", [])
+
+    def localize(self, network_path, on_progress=None, is_cancelled=None):
+        """
+        Copy the frames of a sequence in the cache (the frames already copied with the same size are kept)
+        :param network_path : sequence path (seq_name.####.exr)
+        :param on_progress : function(copied bytes, total bytes) called from the copy threads
+        :param is_cancelled : function telling if the copy is not needed anymore
+        :return: local sequence path or None if the copy failed, has been cancelled or doesn't fit in the budget
+        """
+        network_path = network_path.replace("\\", "/")
+        version_dir, _, seq_filename = network_path.rpartition("/")
+        local_dir = self.get_local_dir(version_dir)
+        name = self.get_entry_name(local_dir + "/")
+        backend = StorageBackend.get_backend(version_dir)
+        seq_regex = FrameCache.get_seq_regex(seq_filename)
+        try:
+            frames = [(entry.get_name(), entry.get_stat().st_size) for entry in backend.list_dir(version_dir)
+                      if not entry.is_dir() and seq_regex.match(entry.get_name())]
+        except OSError as e:
+            print("### Warning : Unable to list " + version_dir + " : " + str(e))
+            return None
+        if len(frames) == 0:
+            return None
+        total_size = sum([size for _, size in frames])
+        missing_size = sum([size for filename, size in frames
+                            if FrameCache.__get_file_size(local_dir + "/" + filename) != size])
+        with self.__lock:
+            self.__load_entries()
+            if name in self.__copying:
+                return None
+            entry = self.__entries.get(name, {"source": version_dir, "size": 0, "sequences": []})
+            # Make room for the frames not copied yet
+            if not self.__evict(missing_size, name):
+                print("### Warning : " + seq_filename + " doesn't fit in the frame cache budget")
+                return None
+            entry["complete"] = False
+            entry["last_used"] = time.time()
+            self.__entries[name] = entry
+            self.__copying.add(name)
+            self.__save_entries()
+        copied = [0]
+        progress_lock = threading.Lock()
+
+        def __copy_frame_if_needed(frame):
+            if is_cancelled is not None and is_cancelled():
+                return False
+            filename, size = frame
+            local_path = local_dir + "/" + filename
+            if FrameCache.__get_file_size(local_path) != size:
+                FrameCache.__copy_file(backend, version_dir + "/" + filename, local_path)
+            with progress_lock:
+                copied[0] += size
+                if on_progress is not None:
+                    on_progress(copied[0], total_size)
+            return True
+
+        success = False
+        try:
+            if not os.path.isdir(local_dir):
+                os.makedirs(local_dir)
+            with ThreadPoolExecutor(max_workers=self.__copy_threads) as executor:
+                success = all(list(executor.map(__copy_frame_if_needed, frames)))
+        except (IOError, OSError) as e:
+            print("### Warning : Unable to copy " + network_path + " in the frame cache : " + str(e))
+        finally:
+            with self.__lock:
+                self.__copying.discard(name)
+                entry["size"] = FrameCache.__get_dir_size(local_dir)
+                if seq_filename in entry["sequences"]:
+                    entry["sequences"].remove(seq_filename)
+                if success:
+                    entry["sequences"].append(seq_filename)
+                entry["complete"] = len(entry["sequences"]) > 0
+                self.__entries[name] = entry
+                self.__save_entries()
+        return local_dir + "/" + seq_filename if success else None
+
+    @staticmethod
+    def __copy_file(backend, source_path, local_path):
+        """
+        Copy a file of a storage into a temporary file then replace the local file
+        :param backend : storage backend of the source
+        :param source_path
+        :param local_path
+        :return:
+        """
+        fd, tmp_path = tempfile.mkstemp(prefix=".tmp_", dir=os.path.dirname(local_path))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                if isinstance(backend, PosixBackend):
+                    with open(source_path, "rb") as source:
+                        shutil.copyfileobj(source, f, _CHUNK_SIZE)
+                else:
+                    offset = 0
+                    while True:
+                        chunk = backend.open_range(source_path, offset, _CHUNK_SIZE)
+                        f.write(chunk)
+                        offset += len(chunk)
+                        if len(chunk) < _CHUNK_SIZE:
+                            break
+            os.replace(tmp_path, local_path)
+        except Exception:
+            os.remove(tmp_path)
+            raise
+
+    @staticmethod
+    def __get_file_size(file_path):
+        """
+        Get the size of a local file
+        :param file_path
+        :return: size in bytes or None if the file doesn't exist
+        """
+        try:
+            return os.path.getsize(file_path)
+        except OSError:
+            return None
+
+    @staticmethod
+    def __get_dir_size(dir_path):
+        """
+        Get the size of the files of a folder
+        :param dir_path
+        :return: size in bytes
+        """
+        try:
+            with os.scandir(dir_path) as it:
+                return sum([entry.stat().st_size for entry in it if entry.is_file()])
+        except OSError:
+            return 0
+
+    def touch(self, local_path):
+        """
+        Mark a local sequence as used now (it becomes the last evicted)
+        :param local_path
+        :return:
+        """
+        name = self.get_entry_name(local_path)
+        with self.__lock:
+            self.__load_entries()
+            if name in self.__entries:
+                self.__entries[name]["last_used"] = time.time()
+                self.__save_entries()
+
+    def __evict(self, needed_size, keep_name=None):
+        """
+        Remove the least recently used folders until the needed size fits in the budget (called with the lock).
+        The folders being copied or pinned are never removed
+        :param needed_size : bytes to add
+        :param keep_name : entry not to evict (the one being filled)
+        :return: does the needed size fit in the budget
+        """
+        self.__load_entries()
+        size = sum([entry.get("size", 0) for entry in self.__entries.values()])
+        keep_size = self.__entries[keep_name].get("size", 0) if keep_name in self.__entries else 0
+        if keep_size + needed_size > self.__budget:
+            return False
+        evicted = False
+        for name, entry in sorted(self.__entries.items(), key=lambda x: x[1].get("last_used", 0)):
+            if size + needed_size <= self.__budget:
+                break
+            if name == keep_name or name in self.__copying or name in self.__pinned:
+                continue
+            shutil.rmtree(self.__cache_dir + "/" + name, ignore_errors=True)
+            size -= entry.get("size", 0)
+            del self.__entries[name]
+            evicted = True
+        if evicted:
+            self.__save_entries()
+        return size + needed_size <= self.__budget
+
+    def evict(self, name):
+        """
+        Remove a cached version folder (unless it is being copied)
+        :param name : local dir name given by get_entries
+        :return: is evicted
+        """
+        with self.__lock:
+            self.__load_entries()
+            if name not in self.__entries or name in self.__copying:
+                return False
+            shutil.rmtree(self.__cache_dir + "/" + name, ignore_errors=True)
+            del self.__entries[name]
+            self.__save_entries()
+            return True
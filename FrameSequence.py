@@ -0,0 +1,211 @@
+import re
+from array import array
+
+# ######################################################################################################################
+
+UTILITY_SUFFIX = "_utility"
+SEQ_PADDING = "####"
+_SEQ_EXTENSION = "exr"
+
+
+# ######################################################################################################################
+
+
+class FrameSequence:
+    """
+    Set of frame numbers of a sequence stored as a bitmap starting at the first frame
+    """
+
+    @staticmethod
+    def parse_version(seq_name, filenames):
+        """
+        Parse the files of a version folder into the beauty and utility sequences
+        (seq_name.####.exr and seq_name_utility.####.exr)
+        :param seq_name : name of the version folder
+        :param filenames
+        :return: beauty sequence, utility sequence
+        """
+        pattern = re.compile(r"^" + re.escape(seq_name) + r"(" + UTILITY_SUFFIX + r")?\.([0-9]{4})\." +
+                             _SEQ_EXTENSION + r"$")
+        beauty_frames = array("l")
+        utility_frames = array("l")
+        for filename in filenames:
+            match = pattern.match(filename)
+            if match is None:
+                continue
+            if match.group(1) is None:
+                beauty_frames.append(int(match.group(2)))
+            else:
+                utility_frames.append(int(match.group(2)))
+        return FrameSequence(beauty_frames), FrameSequence(utility_frames)
+
+    @staticmethod
+    def get_seq_filename(seq_name, utility=False):
+        """
+        Get the filename of a sequence with the frame padding
+        :param seq_name
+        :param utility
+        :return: filename
+        """
+        return seq_name + (UTILITY_SUFFIX if utility else "") + "." + SEQ_PADDING + "." + _SEQ_EXTENSION
+
+    @staticmethod
+    def get_frame_filename(seq_name, frame, utility=False):
+        """
+        Get the filename of a frame of a sequence
+        :param seq_name
+        :param frame
+        :param utility
+        :return: filename
+        """
+        return seq_name + (UTILITY_SUFFIX if utility else "") + "." + ("%04d" % frame) + "." + _SEQ_EXTENSION
+
+    def __init__(self, frames=None):
+        """
+        Constructor
+        :param frames : frame numbers (any order, duplicates allowed)
+        """
+        self.__start = None
+        self.__end = None
+        self.__count = 0
+        self.__bitmap = bytearray()
+        if frames is not None and len(frames) > 0:
+            self.__start = min(frames)
+            self.__end = max(frames)
+            self.__bitmap = bytearray(((self.__end - self.__start) >> 3) + 1)
+            for frame in frames:
+                offset = frame - self.__start
+                mask = 1 << (offset & 7)
+                if not self.__bitmap[offset >> 3] & mask:
+                    self.__bitmap[offset >> 3] |= mask
+                    self.__count += 1
+
+    def __str__(self):
+        """
+        To String method
+        :return: string
+        """
+        if self.is_empty():
+            return "empty"
+        string = str(self.__start) + "-" + str(self.__end)
+        nb_missing = self.get_missing_count()
+        if nb_missing > 0:
+            string += " (" + str(nb_missing) + " missing)"
+        return string
+
+    def is_empty(self):
+        """
+        Getter of whether the sequence has no frame
+        :return: is empty
+        """
+        return self.__count == 0
+
+    def get_start(self):
+        """
+        Getter of the first frame
+        :return: start frame
+        """
+        return self.__start
+
+    def get_end(self):
+        """
+        Getter of the last frame
+        :return: end frame
+        """
+        return self.__end
+
+    def get_count(self):
+        """
+        Getter of the number of frames
+        :return: count
+        """
+        return self.__count
+
+    def contains(self, frame):
+        """
+        Check if a frame is in the sequence
+        :param frame
+        :return: contains frame
+        """
+        if self.is_empty() or frame < self.__start or frame > self.__end:
+            return False
+        offset = frame - self.__start
+        return bool(self.__bitmap[offset >> 3] & (1 << (offset & 7)))
+
+    def get_frames(self):
+        """
+        Getter of the frames in order
+        :return: frames
+        """
+        if self.is_empty():
+            return []
+        return [frame for frame in range(self.__start, self.__end + 1) if self.contains(frame)]
+
+    def get_missing_count(self):
+        """
+        Getter of the number of missing frames between the start and the end
+        :return: missing count
+        """
+        if self.is_empty():
+            return 0
+        return self.__end - self.__start + 1 - self.__count
+
+    def get_gaps(self):
+        """
+        Getter of the ranges of missing frames between the start and the end
+        :return: gaps [(first missing frame, last missing frame), ...]
+        """
+        gaps = []
+        if self.get_missing_count() == 0:
+            return gaps
+        gap_start = None
+        for i_byte, byte in enumerate(self.__bitmap):
+            # Skip quickly the full bytes when not in a gap
+            if byte == 0xFF and gap_start is None:
+                continue
+            for bit in range(8):
+                frame = self.__start + (i_byte << 3) + bit
+                if frame > self.__end:
+                    break
+                if byte & (1 << bit):
+                    if gap_start is not None:
+                        gaps.append((gap_start, frame - 1))
+                        gap_start = None
+                elif gap_start is None:
+                    gap_start = frame
+        return gaps
+
+    def get_ranges(self):
+        """
+        Getter of the ranges of consecutive frames
+        :return: ranges [(first frame, last frame), ...]
+        """
+        if self.is_empty():
+            return []
+        ranges = []
+        range_start = self.__start
+        for gap_start, gap_end in self.get_gaps():
+            ranges.append((range_start, gap_start - 1))
+            range_start = gap_end + 1
+        ranges.append((range_start, self.__end))
+        return ranges
+
+    def is_complete(self, first_frame=None, last_frame=None):
+        """
+        Check if the sequence has all the frames of a range (its own range by default)
+        :param first_frame
+        :param last_frame
+        :return: is complete
+        """
+        if self.is_empty():
+            return False
+        first_frame = self.__start if first_frame is None else first_frame
+        last_frame = self.__end if last_frame is None else last_frame
+        if first_frame < self.__start or last_frame > self.__end:
+            return False
+        if self.get_missing_count() == 0:
+            return True
+        for gap_start, gap_end in self.get_gaps():
+            if gap_start <= last_frame and gap_end >= first_frame:
+                return False
+        return True
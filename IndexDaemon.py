@@ -0,0 +1,234 @@
+"""
+Index daemon shared by all the Nuke sessions of a workstation : it owns the shot indexes, their watchers and the caches,
+so each shot is scanned once for all the sessions. The sessions use it through IndexDaemonClient and scan by themselves
+when it is not running.
+
+Usage : python -m auto_comp.IndexDaemon [--socket <path>] [--max-watched-shots 16]
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+import socket
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from .IndexDaemonClient import IndexDaemonClient
+from .ShotIndex import ShotIndex
+from .ShotWatcher import ShotWatcher
+
+# ######################################################################################################################
+
+# The indexes of the shots requested recently are watched and served from memory, the others are forgotten
+_MAX_WATCHED_SHOTS = 16
+_SCAN_WORKERS = 4
+# Maximum size of a request line
+_REQUEST_LIMIT = 1 << 20
+
+
+# ######################################################################################################################
+
+
+class IndexDaemon:
+    """
+    asyncio server answering the requests of the IndexDaemonClient on a Unix socket.
+    The scans run in a thread pool and the concurrent requests of the same shot share the same scan
+    """
+
+    def __init__(self, socket_path, max_watched_shots=_MAX_WATCHED_SHOTS):
+        """
+        Constructor
+        :param socket_path
+        :param max_watched_shots
+        """
+        self.__socket_path = socket_path
+        self.__max_watched_shots = max_watched_shots
+        self.__executor = ThreadPoolExecutor(max_workers=_SCAN_WORKERS)
+        # The indexes are encoded in their own thread so that the answers don't wait behind the scans
+        self.__encode_executor = ThreadPoolExecutor(max_workers=1)
+        # {render path: future of the running scan}
+        self.__scans = {}
+        # {render path: watcher} ordered from the least recently requested
+        self.__watchers = OrderedDict()
+
+    def run(self):
+        """
+        Serve until SIGINT or SIGTERM
+        :return:
+        """
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            loop.run_until_complete(self.__serve(loop))
+        finally:
+            for watcher in self.__watchers.values():
+                watcher.stop()
+            self.__executor.shutdown(wait=False)
+            self.__encode_executor.shutdown(wait=False)
+            loop.close()
+
+    def __remove_stale_socket(self):
+        """
+        Remove the socket file left by a daemon that has not stopped properly
+        :return:
+        """
+        if not os.path.exists(self.__socket_path):
+            return
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(self.__socket_path)
+        except (socket.error, OSError):
+            os.remove(self.__socket_path)
+            return
+        finally:
+            sock.close()
+        raise RuntimeError("An index daemon is already running on " + self.__socket_path)
+
+    async def __serve(self, loop):
+        """
+        Create the server and wait for a stop signal
+        :param loop
+        :return:
+        """
+        socket_dir = os.path.dirname(self.__socket_path)
+        if socket_dir and not os.path.isdir(socket_dir):
+            os.makedirs(socket_dir)
+        self.__remove_stale_socket()
+        stop_event = asyncio.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop_event.set)
+        server = await asyncio.start_unix_server(self.__handle_client, path=self.__socket_path,
+                                                 limit=_REQUEST_LIMIT)
+        # Only the user of the daemon can query it
+        os.chmod(self.__socket_path, 0o600)
+        print("Index daemon listening on " + self.__socket_path)
+        try:
+            await stop_event.wait()
+        finally:
+            server.close()
+            await server.wait_closed()
+            if os.path.exists(self.__socket_path):
+                os.remove(self.__socket_path)
+
+    async def __handle_client(self, reader, writer):
+        """
+        Answer the requests of a connection, one JSON per line
+        :param reader
+        :param writer
+        :return:
+        """
+        loop = asyncio.get_event_loop()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    answer = await self.__process(json.loads(line.decode("utf-8")))
+                except Exception as e:
+                    answer = {"ok": False, "error": str(e)}
+                if "index" in answer:
+                    # The big indexes are encoded out of the loop to not block the other connections
+                    data = await loop.run_in_executor(self.__encode_executor, IndexDaemon.__encode, answer)
+                else:
+                    data = IndexDaemon.__encode(answer)
+                writer.write(data)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    def __encode(answer):
+        """
+        Encode an answer into a line
+        :param answer
+        :return: data
+        """
+        if "index" in answer:
+            answer = dict(answer)
+            answer["index"] = answer["index"].to_data()
+        return json.dumps(answer).encode("utf-8") + b"\n"
+
+    async def __process(self, request):
+        """
+        Process a request
+        :param request
+        :return: answer
+        """
+        op = request.get("op")
+        if op == "ping":
+            return {"ok": True}
+        if op == "get_index":
+            shot_index = await self.__get_index(request["render_path"], bool(request.get("refresh")))
+            return {"ok": True, "index": shot_index}
+        if op == "invalidate":
+            self.__invalidate(request.get("render_path"))
+            return {"ok": True}
+        return {"ok": False, "error": "Unknown operation " + str(op)}
+
+    async def __get_index(self, render_path, refresh):
+        """
+        Get the index of a shot : from memory if it is watched, otherwise from a scan shared by the requests
+        :param render_path
+        :param refresh : force a new scan
+        :return: shot index
+        """
+        render_path = ShotIndex.get_shot_render_path(render_path)
+        if not refresh:
+            shot_index = ShotIndex.get_cached_index(render_path)
+            if shot_index is not None:
+                self.__watch(render_path)
+                return shot_index
+        scan = self.__scans.get(render_path)
+        if scan is None:
+            scan = asyncio.get_event_loop().run_in_executor(self.__executor, ShotIndex.get_index, render_path, True)
+            self.__scans[render_path] = scan
+            scan.add_done_callback(lambda _: self.__scans.pop(render_path, None))
+        shot_index = await scan
+        if shot_index.exists():
+            self.__watch(render_path)
+        return shot_index
+
+    def __watch(self, render_path):
+        """
+        Watch a shot and forget the least recently requested shot if too many are watched
+        :param render_path
+        :return:
+        """
+        if render_path in self.__watchers:
+            self.__watchers.move_to_end(render_path)
+            return
+        watcher = ShotWatcher()
+        watcher.watch(render_path)
+        self.__watchers[render_path] = watcher
+        while len(self.__watchers) > self.__max_watched_shots:
+            old_render_path, old_watcher = self.__watchers.popitem(last=False)
+            old_watcher.stop()
+            # Not watched anymore : the index would become stale
+            ShotIndex.invalidate(old_render_path)
+
+    def __invalidate(self, render_path):
+        """
+        Forget the index of a shot or all the indexes
+        :param render_path : None for all the shots
+        :return:
+        """
+        ShotIndex.invalidate(render_path)
+
+
+# ######################################################################################################################
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index daemon shared by the Nuke sessions of the workstation")
+    parser.add_argument("--socket", default=IndexDaemonClient.get_socket_path(), help="path of the Unix socket")
+    parser.add_argument("--max-watched-shots", type=int, default=_MAX_WATCHED_SHOTS)
+    args = parser.parse_args()
+    IndexDaemon(args.socket, args.max_watched_shots).run()
+
+
+if __name__ == "__main__":
+    main()
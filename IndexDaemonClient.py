@@ -0,0 +1,143 @@
+import json
+import os
+import socket
+import threading
+import time
+
+from .ShotIndex import ShotIndex
+
+# ######################################################################################################################
+
+_SOCKET_ENV = "AUTO_COMP_DAEMON_SOCKET"
+_DEFAULT_SOCKET_PATH = os.path.join(os.path.expanduser("~"), ".auto_comp", "index_daemon.sock")
+_CONNECT_TIMEOUT = 0.5
+# Interval of the checks of the cancellation while waiting for the answer
+_POLL_TIMEOUT = 0.1
+# Maximum time waiting for an answer, after which the daemon is considered stuck and the session scans by itself
+_REQUEST_TIMEOUT = 30.0
+# Maximum time waiting for the answer of a request that doesn't scan
+_SHORT_REQUEST_TIMEOUT = 2.0
+# After a failed connection the daemon is not tried again during this delay
+_RETRY_DELAY = 30.0
+
+
+# ######################################################################################################################
+
+
+class IndexDaemonClient:
+    """
+    Client of the index daemon shared by the Nuke sessions of the workstation.
+    Protocol : one JSON request per line, one JSON answer per line ({"ok": bool, ...})
+    """
+    __unavailable_until = 0
+    __lock = threading.Lock()
+
+    @staticmethod
+    def get_socket_path():
+        """
+        Getter of the path of the Unix socket of the daemon
+        :return: socket path
+        """
+        return os.environ.get(_SOCKET_ENV, _DEFAULT_SOCKET_PATH)
+
+    @staticmethod
+    def is_available():
+        """
+        Check if the daemon may be running (without connecting to it)
+        :return: is available
+        """
+        with IndexDaemonClient.__lock:
+            if time.time() < IndexDaemonClient.__unavailable_until:
+                return False
+        return hasattr(socket, "AF_UNIX") and os.path.exists(IndexDaemonClient.get_socket_path())
+
+    @staticmethod
+    def __set_unavailable():
+        """
+        Don't try to connect to the daemon for a while
+        :return:
+        """
+        with IndexDaemonClient.__lock:
+            IndexDaemonClient.__unavailable_until = time.time() + _RETRY_DELAY
+
+    @staticmethod
+    def request(message, is_cancelled=None, timeout=_REQUEST_TIMEOUT):
+        """
+        Send a request to the daemon and wait for its answer
+        :param message : request data
+        :param is_cancelled : function telling if the answer is not needed anymore
+        :param timeout : maximum time waiting for the answer
+        :return: answer data or None if the daemon is not running, failed, timed out or the request has been cancelled
+        """
+        if not IndexDaemonClient.is_available():
+            return None
+        deadline = time.time() + timeout
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.settimeout(_CONNECT_TIMEOUT)
+            try:
+                sock.connect(IndexDaemonClient.get_socket_path())
+            except (socket.error, OSError):
+                IndexDaemonClient.__set_unavailable()
+                return None
+            sock.sendall(json.dumps(message).encode("utf-8") + b"\n")
+            sock.settimeout(_POLL_TIMEOUT)
+            chunks = []
+            while True:
+                if is_cancelled is not None and is_cancelled():
+                    return None
+                try:
+                    chunk = sock.recv(1 << 20)
+                except socket.timeout:
+                    if time.time() > deadline:
+                        # The daemon is busy or stuck : the session scans by itself for a while
+                        print("### Warning : Index daemon did not answer in %.0f s" % timeout)
+                        IndexDaemonClient.__set_unavailable()
+                        return None
+                    continue
+                if not chunk:
+                    # The daemon has stopped during the request
+                    IndexDaemonClient.__set_unavailable()
+                    return None
+                chunks.append(chunk)
+                if chunk.endswith(b"\n"):
+                    break
+            answer = json.loads(b"".join(chunks).decode("utf-8"))
+        except (socket.error, OSError, ValueError) as e:
+            print("### Warning : Index daemon request failed : " + str(e))
+            return None
+        finally:
+            sock.close()
+        if not isinstance(answer, dict) or not answer.get("ok"):
+            if isinstance(answer, dict):
+                print("### Warning : Index daemon error : " + str(answer.get("error")))
+            return None
+        return answer
+
+    @staticmethod
+    def get_index(render_path, refresh=False, is_cancelled=None):
+        """
+        Get the index of a shot from the daemon (index provider of ShotIndex)
+        :param render_path
+        :param refresh : force a new scan
+        :param is_cancelled : function telling if the index is not needed anymore
+        :return: shot index or None if the daemon is not running
+        """
+        answer = IndexDaemonClient.request({"op": "get_index", "render_path": render_path, "refresh": refresh},
+                                           is_cancelled)
+        if answer is None:
+            return None
+        try:
+            return ShotIndex.from_data(answer["index"])
+        except (KeyError, TypeError, ValueError) as e:
+            print("### Warning : Invalid index from the index daemon : " + str(e))
+            return None
+
+    @staticmethod
+    def invalidate(render_path=None):
+        """
+        Make the daemon forget the index of a shot or all the indexes
+        :param render_path : None for all the shots
+        :return:
+        """
+        IndexDaemonClient.request({"op": "invalidate", "render_path": render_path}, timeout=_SHORT_REQUEST_TIMEOUT)
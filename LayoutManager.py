@@ -1,5 +1,6 @@
 import nuke
 from common.utils import *
+from .NodeGraph import NodeGraph
 
 # ######################################################################################################################
 
@@ -58,6 +59,34 @@ class LayoutManager:
         self.__backdrops_layout_data = {}
         self.__current_workspace_y = None
         self.__bbox_graph = 0, 0, 0, 0
+        # Nodes built in memory and created in Nuke at once by paste_graph
+        self.__graph = NodeGraph()
+
+    #
+    def create_node(self, node_class, **knobs):
+        """
+        Create a node in the graph in memory (like nuke.nodes.<node_class>(**knobs))
+        :param node_class
+        :param knobs
+        :return: graph node
+        """
+        return self.__graph.create_node(node_class, **knobs)
+
+    #
+    def get_graph(self):
+        """
+        Getter of the graph in memory
+        :return: node graph
+        """
+        return self.__graph
+
+    #
+    def paste_graph(self):
+        """
+        Create in Nuke the nodes of the graph laid out by build_layout_node_graph and build_layout_backdrops
+        :return: created nodes
+        """
+        return self.__graph.paste()
 
     #
     def compute_current_bbox_graph(self):
@@ -417,13 +446,13 @@ class LayoutManager:
                 return
             font_size = options["font_size"] if "font_size" in options else _DEFAULT_FONT_SIZE_BACKDROP
             color = options["color"]
-            return nuke.nodes.BackdropNode(name=backdrop_name,
-                                           xpos=int(layout_data["xpos"]), ypos=int(layout_data["ypos"]),
-                                           bdwidth=layout_data["width"], bdheight=layout_data["height"],
-                                           z_order=z_order,
-                                           label=backdrop_name,
-                                           note_font_size=font_size,
-                                           tile_color=(color[0] << 24) | (color[1] << 16) | (color[2] << 8) | 255)
+            return self.__graph.create_node("BackdropNode", name=backdrop_name,
+                                            xpos=int(layout_data["xpos"]), ypos=int(layout_data["ypos"]),
+                                            bdwidth=layout_data["width"], bdheight=layout_data["height"],
+                                            z_order=z_order,
+                                            label=backdrop_name,
+                                            note_font_size=font_size,
+                                            tile_color=(color[0] << 24) | (color[1] << 16) | (color[2] << 8) | 255)
 
         # Compute the backdrops layout
         self.__compute_build_layout_backdrops()
@@ -1,7 +1,7 @@
-import nuke
 from common.utils import *
 from .LayoutManager import LayoutManager
 from .RuleSet import Variable
+from .BBox import BBox
 from .UnpackMode import BACKDROP_MERGE
 
 # ######################################################################################################################
@@ -60,13 +60,20 @@ class MergeMode:
             vars.sort(key=lambda x: x.get_layer().lower())
             operation = vars[0].get_group_operation()
             if operation is None: continue
+            # The order of the A inputs doesn't change the merged layers : merge the smallest layers first to keep
+            # the bboxes small. The first layer stays the B pipe whose other layers are passed through
+            if BBox.is_reorderable(operation):
+                vars = vars[:1] + BBox.sort_by_area(vars[1:], lambda x: x.get_bbox())
 
             start_node = vars[0].get_node()
             name = vars[0].get_name()
             previous_layer = vars[0].get_layer()
+            previous_bbox = vars[0].get_bbox()
+            pass_through = vars[0].has_pass_through()
             step = vars[0].get_step() + 1
 
-            previous_node = nuke.nodes.Dot(name=_PREFIX_DOT+previous_layer, inputs=[start_node])
+            previous_node = self.__layout_manager.create_node("Dot", name=_PREFIX_DOT+previous_layer,
+                                                              inputs=[start_node])
             self.__layout_manager.add_nodes_to_backdrop(BACKDROP_MERGE, [previous_node])
             self.__layout_manager.add_node_layout_relation(start_node, previous_node,
                                                            LayoutManager.POS_RIGHT, _DISTANCE_STEP_MERGE)
@@ -76,8 +83,9 @@ class MergeMode:
                 current_layer = var.get_layer()
                 current_node = var.get_node()
 
-                merge_node = nuke.nodes.Merge(operation=str(operation),
-                                              inputs=[previous_node,current_node])
+                bbox_mode, previous_bbox = BBox.get_merge_bbox(operation, var.get_bbox(), previous_bbox, pass_through)
+                merge_node = self.__layout_manager.create_node("Merge2", operation=str(operation), bbox=bbox_mode,
+                                                               inputs=[previous_node,current_node])
                 merge_node.setName("merge_" + operation + "_" + current_layer)
 
                 self.__layout_manager.add_nodes_to_backdrop(BACKDROP_MERGE, [merge_node])
@@ -86,7 +94,7 @@ class MergeMode:
                                                                LayoutManager.POS_RIGHT, _DISTANCE_STEP_MERGE)
                 previous_node = merge_node
 
-            result_var = Variable(name, previous_node, [], step)
+            result_var = Variable(name, previous_node, [], step, previous_bbox, pass_through)
             self.__var_set.active_var(result_var, True)
 
     def run(self):
@@ -124,11 +132,11 @@ class MergeMode:
             node_a = var_a.get_node()
             node_b = var_b.get_node()
             # Create the graph layout
-            dot_node = nuke.nodes.Dot(name=_PREFIX_DOT + var_a.get_name() + rel.get_operation() + var_b.get_name(),
-                                      inputs=[node_b])
+            dot_node = self.__layout_manager.create_node(
+                "Dot", name=_PREFIX_DOT + var_a.get_name() + rel.get_operation() + var_b.get_name(), inputs=[node_b])
             self.__layout_manager.add_nodes_to_backdrop(BACKDROP_MERGE, [dot_node])
             var_b.set_node(dot_node)
-            result_var = rel.process(var_a, var_b)
+            result_var = rel.process(var_a, var_b, self.__layout_manager.get_graph())
 
             result_var_step = result_var.get_step()
 
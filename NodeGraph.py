@@ -0,0 +1,398 @@
+import os
+import re
+import tempfile
+
+try:
+    import nuke
+except ImportError:
+    nuke = None
+
+# ######################################################################################################################
+
+# Size of the nodes in the node graph (width, height) used by the layout before the nodes exist
+_SCREEN_SIZE_DEFAULT = (80, 18)
+_SCREEN_SIZE_POSTAGE = (80, 66)
+_SCREEN_SIZES = {"Dot": (12, 12)}
+_POSTAGE_CLASSES = ["Read", "PostageStamp"]
+# Knobs set through the Nuke API after the paste because setting them updates other knobs
+# (the mappings of a Shuffle2 follow its in1 layer)
+_LIVE_KNOBS = {"Shuffle2": ["in1"]}
+# Words written without quotes in the .nk text
+_BARE_WORD_REGEX = re.compile(r"^[A-Za-z0-9_.:/+\-]+$")
+_STACK_VAR_PREFIX = "N_auto_comp_"
+
+
+# ######################################################################################################################
+
+
+class _GraphKnob:
+    """
+    Knob of a graph node (subset of nuke.Knob)
+    """
+
+    def __init__(self, node, name):
+        """
+        Constructor
+        :param node
+        :param name
+        """
+        self.__node = node
+        self.__name = name
+
+    def name(self):
+        """
+        Getter of the name of the knob
+        :return: name
+        """
+        return self.__name
+
+    def value(self):
+        """
+        Getter of the value of the knob
+        :return: value or None if not set
+        """
+        return self.__node.get_knobs().get(self.__name)
+
+    def setValue(self, value):
+        """
+        Setter of the value of the knob
+        :param value
+        :return:
+        """
+        self.__node.get_knobs()[self.__name] = value
+
+
+class GraphNode:
+    """
+    Node of a node graph built in memory. It has the methods of nuke.Node used to build and lay out the comps (knobs,
+    inputs, name, position and size) so the modes and the layout manager handle it like a Nuke node
+    """
+
+    def __init__(self, graph, node_class, knobs):
+        """
+        Constructor
+        :param graph
+        :param node_class
+        :param knobs : {knob name: value}, name, inputs, xpos and ypos are taken out of them
+        """
+        knobs = dict(knobs)
+        self.__graph = graph
+        self.__class = node_class
+        self.__name = knobs.pop("name", re.sub(r"[0-9]+$", "", node_class) + "1")
+        self.__inputs = list(knobs.pop("inputs", []))
+        self.__xpos = int(knobs.pop("xpos", 0))
+        self.__ypos = int(knobs.pop("ypos", 0))
+        self.__knobs = knobs
+
+    def Class(self):
+        """
+        Getter of the class of the node
+        :return: class
+        """
+        return self.__class
+
+    def name(self):
+        """
+        Getter of the name of the node (made unique when the graph is pasted)
+        :return: name
+        """
+        return self.__name
+
+    def setName(self, name):
+        """
+        Setter of the name of the node
+        :param name
+        :return:
+        """
+        self.__name = name
+
+    def get_knobs(self):
+        """
+        Getter of the knobs set on the node
+        :return: {knob name: value}
+        """
+        return self.__knobs
+
+    def knob(self, name):
+        """
+        Getter of a knob of the node
+        :param name
+        :return: knob
+        """
+        return _GraphKnob(self, name)
+
+    def __getitem__(self, name):
+        """
+        Getter of a knob of the node
+        :param name
+        :return: knob
+        """
+        return _GraphKnob(self, name)
+
+    def inputs(self):
+        """
+        Getter of the number of inputs of the node
+        :return: number of inputs
+        """
+        return len(self.__inputs)
+
+    def input(self, index):
+        """
+        Getter of an input of the node
+        :param index
+        :return: graph node, Nuke node or None
+        """
+        return self.__inputs[index] if index < len(self.__inputs) else None
+
+    def get_inputs(self):
+        """
+        Getter of the inputs of the node
+        :return: [graph node, Nuke node or None]
+        """
+        return self.__inputs
+
+    def setInput(self, index, node):
+        """
+        Setter of an input of the node
+        :param index
+        :param node : graph node, Nuke node (connected after the paste) or None
+        :return:
+        """
+        while len(self.__inputs) <= index:
+            self.__inputs.append(None)
+        self.__inputs[index] = node
+
+    def xpos(self):
+        """
+        Getter of the x position
+        :return: x
+        """
+        return self.__xpos
+
+    def ypos(self):
+        """
+        Getter of the y position
+        :return: y
+        """
+        return self.__ypos
+
+    def setXpos(self, xpos):
+        """
+        Setter of the x position
+        :param xpos
+        :return:
+        """
+        self.__xpos = int(xpos)
+
+    def setYpos(self, ypos):
+        """
+        Setter of the y position
+        :param ypos
+        :return:
+        """
+        self.__ypos = int(ypos)
+
+    def screenWidth(self):
+        """
+        Getter of the width of the node in the node graph
+        :return: width
+        """
+        return self.__get_screen_size()[0]
+
+    def screenHeight(self):
+        """
+        Getter of the height of the node in the node graph
+        :return: height
+        """
+        return self.__get_screen_size()[1]
+
+    def __get_screen_size(self):
+        """
+        Getter of the size of the node in the node graph
+        :return: width, height
+        """
+        if self.__class == "BackdropNode":
+            return int(self.__knobs.get("bdwidth", 0)), int(self.__knobs.get("bdheight", 0))
+        if self.__class in _SCREEN_SIZES:
+            return _SCREEN_SIZES[self.__class]
+        if self.__class in _POSTAGE_CLASSES or self.__knobs.get("postage_stamp") is True:
+            return _SCREEN_SIZE_POSTAGE
+        return _SCREEN_SIZE_DEFAULT
+
+
+class NodeGraph:
+    """
+    Nodes, knobs, inputs and positions of a comp built in memory then written as .nk text and read by Nuke at once,
+    instead of creating, connecting and moving the nodes one Nuke API call at a time
+    """
+
+    @staticmethod
+    def format_value(value):
+        """
+        Format a knob value in the .nk syntax
+        :param value
+        :return: text
+        """
+        if isinstance(value, bool):
+            return "true" if value else "false"
+        if isinstance(value, (int, float)):
+            return repr(value)
+        if isinstance(value, (list, tuple)):
+            return "{" + " ".join(NodeGraph.format_value(item) for item in value) + "}"
+        value = str(value)
+        if _BARE_WORD_REGEX.match(value):
+            return value
+        # Quoted string : the Tcl substitutions are escaped
+        for char in ["\\", "\"", "[", "]", "$", "{", "}"]:
+            value = value.replace(char, "\\" + char)
+        return "\"" + value.replace("\n", "\\n") + "\""
+
+    def __init__(self):
+        """
+        Constructor
+        """
+        self.__nodes = []
+
+    def create_node(self, node_class, **knobs):
+        """
+        Create a node in the graph (like nuke.nodes.<node_class>(**knobs))
+        :param node_class
+        :param knobs : knob values, name, inputs, xpos and ypos
+        :return: graph node
+        """
+        node = GraphNode(self, node_class, knobs)
+        self.__nodes.append(node)
+        return node
+
+    def get_nodes(self):
+        """
+        Getter of the nodes of the graph
+        :return: graph nodes
+        """
+        return self.__nodes
+
+    def __get_sorted_nodes(self):
+        """
+        Get the nodes sorted so that the inputs of a node are before it, in the order of creation otherwise
+        :return: graph nodes
+        """
+        sorted_nodes = []
+        visited = set()
+        for root_node in self.__nodes:
+            # Iterative depth first search (the chains of nodes can be longer than the recursion limit)
+            stack = [(root_node, False)]
+            while len(stack) > 0:
+                node, inputs_done = stack.pop()
+                if id(node) in visited:
+                    continue
+                if inputs_done:
+                    visited.add(id(node))
+                    sorted_nodes.append(node)
+                    continue
+                stack.append((node, True))
+                for input_node in reversed(node.get_inputs()):
+                    if isinstance(input_node, GraphNode) and id(input_node) not in visited:
+                        stack.append((input_node, False))
+        return sorted_nodes
+
+    def make_names_unique(self, used_names=None):
+        """
+        Rename the nodes whose name is already used (in the graph or in the script) like Nuke does
+        :param used_names : names of the nodes of the script
+        :return:
+        """
+        used_names = set(used_names) if used_names is not None else set()
+        # Next index to try by base name (many nodes share the same name)
+        next_indices = {}
+        for node in self.__nodes:
+            name = node.name()
+            if name in used_names:
+                base_name = re.sub(r"[0-9]+$", "", name)
+                index = next_indices.get(base_name, 1)
+                while base_name + str(index) in used_names:
+                    index += 1
+                next_indices[base_name] = index + 1
+                name = base_name + str(index)
+                node.setName(name)
+            used_names.add(name)
+
+    def to_nk(self):
+        """
+        Write the graph in the .nk syntax : each node takes its inputs from the stack (input 0 on top), the nodes used
+        by several nodes are stored in stack variables
+        :return: text
+        """
+        sorted_nodes = self.__get_sorted_nodes()
+        # Nodes referenced by a stack variable
+        var_ids = {}
+        for node in sorted_nodes:
+            for input_node in node.get_inputs():
+                if isinstance(input_node, GraphNode) and id(input_node) not in var_ids:
+                    var_ids[id(input_node)] = _STACK_VAR_PREFIX + str(len(var_ids))
+        lines = []
+        previous_node = None
+        for node in sorted_nodes:
+            inputs = node.get_inputs()
+            # A node with a single input right after it takes it from the top of the stack
+            if not (len(inputs) == 1 and inputs[0] is previous_node and previous_node is not None):
+                for input_node in reversed(inputs):
+                    if isinstance(input_node, GraphNode):
+                        lines.append("push $" + var_ids[id(input_node)])
+                    else:
+                        # Nuke nodes of the script are connected after the paste
+                        lines.append("push 0")
+            lines.append(node.Class() + " {")
+            lines.append(" inputs " + str(len(inputs)))
+            for knob_name, value in node.get_knobs().items():
+                if knob_name in _LIVE_KNOBS.get(node.Class(), []):
+                    continue
+                lines.append(" " + knob_name + " " + NodeGraph.format_value(value))
+            lines.append(" name " + NodeGraph.format_value(node.name()))
+            lines.append(" xpos " + str(node.xpos()))
+            lines.append(" ypos " + str(node.ypos()))
+            lines.append("}")
+            if id(node) in var_ids:
+                lines.append("set " + var_ids[id(node)] + " [stack 0]")
+            previous_node = node
+        return "\n".join(lines) + "\n"
+
+    def paste(self):
+        """
+        Create the nodes of the graph in the current script with one read of their .nk text, then set the knobs that
+        need the Nuke API and connect the nodes of the script used as inputs. The graph is emptied
+        :return: created Nuke nodes
+        """
+        if nuke is None:
+            raise RuntimeError("Nuke is not available")
+        if len(self.__nodes) == 0:
+            return []
+        self.make_names_unique([node.name() for node in nuke.allNodes()])
+        # Unselect all to prevent nuke auto linking
+        for node in nuke.selectedNodes():
+            node.setSelected(False)
+        text = self.to_nk()
+        if hasattr(nuke, "scriptReadText"):
+            nuke.scriptReadText(text)
+        else:
+            fd, nk_path = tempfile.mkstemp(suffix=".nk")
+            try:
+                with os.fdopen(fd, "w") as f:
+                    f.write(text)
+                nuke.nodePaste(nk_path)
+            finally:
+                os.remove(nk_path)
+        created_nodes = []
+        for node in self.__nodes:
+            nuke_node = nuke.toNode(node.name())
+            if nuke_node is None:
+                print("### Warning : Node " + node.name() + " not created")
+                continue
+            created_nodes.append(nuke_node)
+            for knob_name in _LIVE_KNOBS.get(node.Class(), []):
+                if knob_name in node.get_knobs():
+                    nuke_node[knob_name].setValue(node.get_knobs()[knob_name])
+            for index, input_node in enumerate(node.get_inputs()):
+                if input_node is not None and not isinstance(input_node, GraphNode):
+                    nuke_node.setInput(index, input_node)
+        self.__nodes = []
+        return created_nodes
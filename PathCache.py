@@ -0,0 +1,59 @@
+import threading
+import time
+
+from .StorageBackend import StorageBackend
+
+# ######################################################################################################################
+
+_DEFAULT_TTL = 10.0
+
+
+# ######################################################################################################################
+
+
+class PathCache:
+    """
+    Cache of the existence checks of directories during a short time (to not query the network at each refresh)
+    """
+    __is_dir_results = {}
+    __lock = threading.Lock()
+    __ttl = _DEFAULT_TTL
+
+    @staticmethod
+    def set_ttl(ttl):
+        """
+        Setter of the time during which a result is kept
+        :param ttl : seconds
+        :return:
+        """
+        PathCache.__ttl = ttl
+
+    @staticmethod
+    def is_dir(path):
+        """
+        Check if a path is a directory, the result is kept during the ttl
+        :param path
+        :return: is dir
+        """
+        now = time.time()
+        with PathCache.__lock:
+            result = PathCache.__is_dir_results.get(path)
+        if result is not None and now - result[0] < PathCache.__ttl:
+            return result[1]
+        is_dir = StorageBackend.get_backend(path).is_dir(path)
+        with PathCache.__lock:
+            PathCache.__is_dir_results[path] = (now, is_dir)
+        return is_dir
+
+    @staticmethod
+    def invalidate(path=None):
+        """
+        Forget the result of a path or all the results if no path is given
+        :param path
+        :return:
+        """
+        with PathCache.__lock:
+            if path is None:
+                PathCache.__is_dir_results.clear()
+            else:
+                PathCache.__is_dir_results.pop(path, None)
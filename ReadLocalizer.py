@@ -0,0 +1,187 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import nuke
+from PySide2.QtCore import QObject, Signal
+
+from .FrameCache import FrameCache
+
+# ######################################################################################################################
+
+# Hidden knobs added to the localized Read nodes to restore them
+_NETWORK_FILE_KNOB = "auto_comp_network_file"
+_PREVIOUS_POLICY_KNOB = "auto_comp_localization_policy"
+# Localization of Nuke (Nuke 11+)
+_LOCALIZATION_POLICY_KNOB = "localizationPolicy"
+_LOCALIZATION_POLICY_ON = "on"
+
+LOCALIZE_MODE_COPY = "copy"
+LOCALIZE_MODE_NUKE = "nuke"
+LOCALIZE_MODES = [LOCALIZE_MODE_COPY, LOCALIZE_MODE_NUKE]
+LOCALIZE_MODE_LABELS = {
+    LOCALIZE_MODE_COPY: "Copy to the frame cache",
+    LOCALIZE_MODE_NUKE: "Nuke localization",
+}
+
+
+# ######################################################################################################################
+
+
+class ReadLocalizer(QObject):
+    """
+    Copy the sequences of Read nodes in the frame cache in a worker thread and send the local paths to the panel,
+    which repoints the Read nodes (the Nuke API is only used from the thread of the panel)
+    """
+    # network path, copied bytes, total bytes
+    progress = Signal(str, object, object)
+    # network path, local path or "" if the copy failed
+    localized = Signal(str, str)
+
+    @staticmethod
+    def get_network_path(read_node):
+        """
+        Get the network path of a Read node, localized or not
+        :param read_node
+        :return: network path
+        """
+        network_knob = read_node.knob(_NETWORK_FILE_KNOB)
+        if network_knob is not None and network_knob.value():
+            return network_knob.value()
+        return read_node.knob("file").value()
+
+    @staticmethod
+    def is_localized(read_node):
+        """
+        Getter of whether a Read node has been localized
+        :param read_node
+        :return: is localized
+        """
+        return read_node.knob(_NETWORK_FILE_KNOB) is not None or read_node.knob(_PREVIOUS_POLICY_KNOB) is not None
+
+    @staticmethod
+    def get_localized_reads():
+        """
+        Getter of the localized Read nodes of the script
+        :return: read nodes
+        """
+        return [read_node for read_node in nuke.allNodes("Read") if ReadLocalizer.is_localized(read_node)]
+
+    @staticmethod
+    def set_local_path(read_node, local_path):
+        """
+        Point a Read node to its local sequence, its network path is kept in a hidden knob
+        :param read_node
+        :param local_path
+        :return:
+        """
+        if read_node.knob(_NETWORK_FILE_KNOB) is None:
+            network_knob = nuke.String_Knob(_NETWORK_FILE_KNOB, "network file")
+            network_knob.setVisible(False)
+            read_node.addKnob(network_knob)
+            network_knob.setValue(read_node.knob("file").value())
+        read_node.knob("file").setValue(local_path)
+
+    @staticmethod
+    def set_nuke_localization(read_node):
+        """
+        Turn on the localization of Nuke on a Read node, its previous policy is kept in a hidden knob
+        :param read_node
+        :return: is applied (False if the Nuke version has no localization)
+        """
+        policy_knob = read_node.knob(_LOCALIZATION_POLICY_KNOB)
+        if policy_knob is None:
+            return False
+        if read_node.knob(_PREVIOUS_POLICY_KNOB) is None:
+            previous_knob = nuke.String_Knob(_PREVIOUS_POLICY_KNOB, "previous localization policy")
+            previous_knob.setVisible(False)
+            read_node.addKnob(previous_knob)
+            previous_knob.setValue(str(policy_knob.value()))
+        policy_knob.setValue(_LOCALIZATION_POLICY_ON)
+        return True
+
+    @staticmethod
+    def restore(read_node):
+        """
+        Point a localized Read node back to its network path and restore its localization policy
+        :param read_node
+        :return:
+        """
+        network_knob = read_node.knob(_NETWORK_FILE_KNOB)
+        if network_knob is not None:
+            if network_knob.value():
+                read_node.knob("file").setValue(network_knob.value())
+            read_node.removeKnob(network_knob)
+        previous_knob = read_node.knob(_PREVIOUS_POLICY_KNOB)
+        if previous_knob is not None:
+            policy_knob = read_node.knob(_LOCALIZATION_POLICY_KNOB)
+            if policy_knob is not None and previous_knob.value():
+                policy_knob.setValue(previous_knob.value())
+            read_node.removeKnob(previous_knob)
+
+    def __init__(self, parent=None):
+        """
+        Constructor
+        :param parent
+        """
+        super(ReadLocalizer, self).__init__(parent)
+        # The sequences are localized one at a time, the frames of a sequence are copied by the pool of the cache
+        self.__executor = ThreadPoolExecutor(max_workers=1)
+        self.__generation = 0
+        self.__lock = threading.Lock()
+
+    def request(self, network_paths):
+        """
+        Localize sequences
+        :param network_paths
+        :return:
+        """
+        with self.__lock:
+            generation = self.__generation
+        for network_path in network_paths:
+            self.__executor.submit(self.__run, generation, network_path)
+
+    def cancel(self):
+        """
+        Cancel the localizations requested (the sequence being copied stops after its current frames)
+        :return:
+        """
+        with self.__lock:
+            self.__generation += 1
+
+    def shutdown(self):
+        """
+        Cancel the localizations and stop the worker
+        :return:
+        """
+        self.cancel()
+        self.__executor.shutdown(wait=False)
+
+    def __is_cancelled(self, generation):
+        """
+        Getter of whether a localization has been cancelled
+        :param generation
+        :return: is cancelled
+        """
+        with self.__lock:
+            return generation != self.__generation
+
+    def __run(self, generation, network_path):
+        """
+        Worker function of a sequence
+        :param generation
+        :param network_path
+        :return:
+        """
+        if self.__is_cancelled(generation):
+            return
+        try:
+            local_path = FrameCache.get_current().localize(
+                network_path, lambda copied, total: self.progress.emit(network_path, copied, total),
+                lambda: self.__is_cancelled(generation))
+            if not self.__is_cancelled(generation):
+                self.localized.emit(network_path, local_path if local_path is not None else "")
+        except RuntimeError:
+            # The panel has been deleted
+            self.cancel()
+        except Exception as e:
+            print("### Warning : ReadLocalizer failed : " + str(e))
@@ -0,0 +1,104 @@
+import os
+import re
+
+from .FrameSequence import FrameSequence
+from .ShotIndex import ShotIndex
+from .VersionPolicy import VersionPolicy
+
+# ######################################################################################################################
+
+# .../render_out/<layer>/<name>.<version>/<file>
+_READ_PATH_REGEX = re.compile(r"^([\w\/\:\.]+\/render_out\/(\w+))\/\w+\.([0-9]+)\/[\w\.%#]+\.[a-z]+$")
+
+
+# ######################################################################################################################
+
+
+class ReadVersionResolver:
+    """
+    Resolve the last version of the layers read by a batch of Read nodes, each layer folder is resolved once
+    whatever the number of Read nodes pointing to it
+    """
+
+    @staticmethod
+    def parse_read_path(path):
+        """
+        Get the layer folder, the layer and the current version of a Read file path
+        :param path
+        :return: layer folder, layer, current version or None
+        """
+        match = _READ_PATH_REGEX.match(path.replace("\\", "/"))
+        if match is None:
+            return None
+        return match.group(1), match.group(2), match.group(3)
+
+    def __init__(self, policy=None, catalog_only=False):
+        """
+        Constructor
+        :param policy : current version policy if None
+        :param catalog_only : resolve only the layer folders of the shots not scanned in the session but stored in the
+        render catalog (no access to disk)
+        """
+        self.__policy = VersionPolicy.get_current() if policy is None else policy
+        self.__catalog_only = catalog_only
+        # {layer folder: (last version, last version path) or None}
+        self.__last_versions = {}
+
+    def get_last_version(self, layer_folder):
+        """
+        Get the last version of a layer folder (memoized)
+        :param layer_folder
+        :return: last version, last version path or None
+        """
+        if layer_folder not in self.__last_versions:
+            shot_path = os.path.dirname(layer_folder)
+            if not self.__catalog_only:
+                shot_index = ShotIndex.get_index(shot_path)
+            elif ShotIndex.get_cached_index(shot_path) is None:
+                shot_index = ShotIndex.get_cached_index(shot_path, use_catalog=True)
+            else:
+                shot_index = None
+            version_data = self.__policy.resolve(shot_index, os.path.basename(layer_folder)) \
+                if shot_index is not None else None
+            if version_data is None:
+                self.__last_versions[layer_folder] = None
+            else:
+                version_dirname = version_data[0]
+                self.__last_versions[layer_folder] = (
+                    version_dirname.split(".")[-1],
+                    os.path.join(layer_folder, version_dirname,
+                                 FrameSequence.get_seq_filename(version_dirname)).replace("\\", "/"))
+        return self.__last_versions[layer_folder]
+
+    def iter_resolve(self, read_paths):
+        """
+        Resolve the last versions of Read nodes grouped by layer folder, one layer folder at a time
+        :param read_paths : [(read node, file path), ...]
+        :return: generator of [(layer, current version, last version, last version path, read node), ...]
+        """
+        reads_by_folder = {}
+        for read_node, path in read_paths:
+            read_data = ReadVersionResolver.parse_read_path(path)
+            if read_data is None:
+                continue
+            layer_folder, layer, current_version = read_data
+            reads_by_folder.setdefault(layer_folder, []).append((layer, current_version, read_node))
+
+        for layer_folder, reads in reads_by_folder.items():
+            last_version_data = self.get_last_version(layer_folder)
+            if last_version_data is None:
+                continue
+            last_version, last_version_path = last_version_data
+            yield [(layer, current_version, last_version, last_version_path, read_node)
+                   for layer, current_version, read_node in reads]
+
+    def resolve(self, read_paths):
+        """
+        Resolve the last versions of Read nodes grouped by layer folder
+        :param read_paths : [(read node, file path), ...]
+        :return: [(layer, current version, last version, last version path, read node), ...]
+        """
+        resolved = []
+        for folder_resolved in self.iter_resolve(read_paths):
+            resolved.extend(folder_resolved)
+        return resolved
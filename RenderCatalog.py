@@ -0,0 +1,241 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# ######################################################################################################################
+
+_CATALOG_ENV = "AUTO_COMP_CATALOG"
+_CATALOG_FORMAT_VERSION = 1
+# Wait for the writer of another process instead of failing
+_BUSY_TIMEOUT = 10.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS shots (
+    id INTEGER PRIMARY KEY,
+    render_path TEXT NOT NULL UNIQUE,
+    scan_time REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS layers (
+    shot_id INTEGER NOT NULL REFERENCES shots(id) ON DELETE CASCADE,
+    layer TEXT NOT NULL,
+    PRIMARY KEY (shot_id, layer)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS versions (
+    shot_id INTEGER NOT NULL,
+    layer TEXT NOT NULL,
+    version TEXT NOT NULL,
+    mtime REAL,
+    files TEXT NOT NULL,
+    frame_start INTEGER,
+    frame_end INTEGER,
+    frame_count INTEGER NOT NULL,
+    utility_start INTEGER,
+    utility_end INTEGER,
+    utility_count INTEGER NOT NULL,
+    channels TEXT,
+    complete INTEGER,
+    PRIMARY KEY (shot_id, layer, version),
+    FOREIGN KEY (shot_id, layer) REFERENCES layers(shot_id, layer) ON DELETE CASCADE
+) WITHOUT ROWID;
+"""
+
+
+# ######################################################################################################################
+
+
+class RenderCatalog:
+    """
+    Optional project-wide SQLite catalog of the layers, versions, frame ranges and channels of the scanned shots.
+    It is filled by the scans of the shot indexes and queried to show a shot before it is scanned in the session.
+    The database is in WAL mode : many readers and one writer at a time (it must be on a local disk, WAL doesn't work
+    on network shares)
+    """
+    __current = None
+    __current_lock = threading.Lock()
+
+    @staticmethod
+    def get_current():
+        """
+        Getter of the catalog in use (the path of the environment variable AUTO_COMP_CATALOG has priority)
+        :return: catalog or None if disabled
+        """
+        with RenderCatalog.__current_lock:
+            if RenderCatalog.__current is None and os.environ.get(_CATALOG_ENV):
+                RenderCatalog.__current = RenderCatalog(os.environ[_CATALOG_ENV])
+            return RenderCatalog.__current
+
+    @staticmethod
+    def set_path(db_path):
+        """
+        Enable the catalog with a database file or disable it
+        :param db_path : None or empty to disable
+        :return:
+        """
+        with RenderCatalog.__current_lock:
+            if os.environ.get(_CATALOG_ENV):
+                return
+            if not db_path:
+                RenderCatalog.__current = None
+            elif RenderCatalog.__current is None or RenderCatalog.__current.get_path() != db_path:
+                RenderCatalog.__current = RenderCatalog(db_path)
+
+    def __init__(self, db_path):
+        """
+        Constructor
+        :param db_path
+        """
+        self.__db_path = db_path
+        # sqlite connections can't be shared between threads
+        self.__local = threading.local()
+        # One writer at a time in the process (the other processes are waited with the busy timeout)
+        self.__write_lock = threading.Lock()
+        self.__is_broken = False
+
+    def get_path(self):
+        """
+        Getter of the database path
+        :return: db path
+        """
+        return self.__db_path
+
+    def __get_connection(self):
+        """
+        Get the connection of the current thread, the database is created if needed
+        :return: connection or None if the database can't be opened
+        """
+        if self.__is_broken:
+            return None
+        connection = getattr(self.__local, "connection", None)
+        if connection is not None:
+            return connection
+        try:
+            db_dir = os.path.dirname(self.__db_path)
+            if db_dir and not os.path.isdir(db_dir):
+                os.makedirs(db_dir)
+            connection = sqlite3.connect(self.__db_path, timeout=_BUSY_TIMEOUT)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("PRAGMA foreign_keys=ON")
+            user_version = connection.execute("PRAGMA user_version").fetchone()[0]
+            if user_version != _CATALOG_FORMAT_VERSION:
+                with self.__write_lock, connection:
+                    connection.executescript(_SCHEMA)
+                    connection.execute("PRAGMA user_version=" + str(_CATALOG_FORMAT_VERSION))
+        except (sqlite3.Error, OSError) as e:
+            print("### Warning : Unable to open the render catalog " + self.__db_path + " : " + str(e))
+            self.__is_broken = True
+            return None
+        self.__local.connection = connection
+        return connection
+
+    @staticmethod
+    def __get_version_row(shot_id, layer, version, shot_index):
+        """
+        Get the row of a version of a shot index
+        :param shot_id
+        :param layer
+        :param version
+        :param shot_index
+        :return: row
+        """
+        beauty_seq, utility_seq = shot_index.get_frame_sequences(layer, version)
+        manifest_entry = shot_index.get_manifest_entry(layer, version)
+        channels = None
+        complete = None
+        if manifest_entry is not None:
+            if isinstance(manifest_entry.get("channels"), list):
+                channels = json.dumps(manifest_entry["channels"])
+            if isinstance(manifest_entry.get("complete"), bool):
+                complete = int(manifest_entry["complete"])
+        return (shot_id, layer, version, shot_index.get_version_mtime(layer, version),
+                json.dumps(shot_index.get_frames(layer, version)),
+                beauty_seq.get_start(), beauty_seq.get_end(), beauty_seq.get_count(),
+                utility_seq.get_start(), utility_seq.get_end(), utility_seq.get_count(),
+                channels, complete)
+
+    def store_layers(self, shot_index, layers=None):
+        """
+        Store the layers of a shot index in one transaction (the previous rows of these layers are replaced)
+        :param shot_index
+        :param layers : layers to store or None for the whole shot
+        :return:
+        """
+        connection = self.__get_connection()
+        if connection is None:
+            return
+        render_path = shot_index.get_render_path()
+        try:
+            with self.__write_lock, connection:
+                connection.execute("INSERT OR IGNORE INTO shots (render_path, scan_time) VALUES (?, ?)",
+                                   (render_path, time.time()))
+                connection.execute("UPDATE shots SET scan_time = ? WHERE render_path = ?", (time.time(), render_path))
+                shot_id = connection.execute("SELECT id FROM shots WHERE render_path = ?",
+                                             (render_path,)).fetchone()[0]
+                if layers is None:
+                    connection.execute("DELETE FROM layers WHERE shot_id = ?", (shot_id,))
+                    layers = shot_index.get_layers()
+                else:
+                    connection.executemany("DELETE FROM layers WHERE shot_id = ? AND layer = ?",
+                                           [(shot_id, layer) for layer in layers])
+                    layers = [layer for layer in layers if shot_index.has_layer(layer)]
+                connection.executemany("INSERT INTO layers (shot_id, layer) VALUES (?, ?)",
+                                       [(shot_id, layer) for layer in layers])
+                connection.executemany("INSERT INTO versions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                       [RenderCatalog.__get_version_row(shot_id, layer, version, shot_index)
+                                        for layer in layers for version in shot_index.get_versions(layer)])
+        except sqlite3.Error as e:
+            print("### Warning : Unable to store " + render_path + " in the render catalog : " + str(e))
+
+    def remove_shot(self, render_path):
+        """
+        Remove a shot from the catalog
+        :param render_path
+        :return:
+        """
+        connection = self.__get_connection()
+        if connection is None:
+            return
+        try:
+            with self.__write_lock, connection:
+                connection.execute("DELETE FROM shots WHERE render_path = ?", (render_path,))
+        except sqlite3.Error as e:
+            print("### Warning : Unable to remove " + render_path + " from the render catalog : " + str(e))
+
+    def load_shot(self, render_path):
+        """
+        Get the content of a shot stored in the catalog
+        :param render_path
+        :return: scan time, {layer: {version: files}}, {(layer, version): mtime},
+                 {(layer, version): {"channels": [...], "complete": bool}} or None if the shot is not in the catalog
+        """
+        connection = self.__get_connection()
+        if connection is None:
+            return None
+        try:
+            shot_row = connection.execute("SELECT id, scan_time FROM shots WHERE render_path = ?",
+                                          (render_path,)).fetchone()
+            if shot_row is None:
+                return None
+            shot_id, scan_time = shot_row
+            layers = {}
+            for (layer,) in connection.execute("SELECT layer FROM layers WHERE shot_id = ?", (shot_id,)):
+                layers[layer] = {}
+            version_mtimes = {}
+            version_infos = {}
+            for layer, version, mtime, files, channels, complete in connection.execute(
+                    "SELECT layer, version, mtime, files, channels, complete FROM versions WHERE shot_id = ?",
+                    (shot_id,)):
+                layers.setdefault(layer, {})[version] = json.loads(files)
+                version_mtimes[(layer, version)] = mtime
+                if channels is not None or complete is not None:
+                    version_infos[(layer, version)] = {}
+                    if channels is not None:
+                        version_infos[(layer, version)]["channels"] = json.loads(channels)
+                    if complete is not None:
+                        version_infos[(layer, version)]["complete"] = bool(complete)
+        except (sqlite3.Error, ValueError) as e:
+            print("### Warning : Unable to read " + render_path + " from the render catalog : " + str(e))
+            return None
+        return scan_time, layers, version_mtimes, version_infos
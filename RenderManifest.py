@@ -0,0 +1,137 @@
+import json
+import os
+import tempfile
+import time
+
+from .FrameSequence import FrameSequence
+from .StorageBackend import StorageBackend
+
+# ######################################################################################################################
+
+MANIFEST_FILENAME = "manifest.json"
+_MANIFEST_FORMAT_VERSION = 1
+# A version folder modified less than this delay before the manifest is written can still change within the same mtime
+# tick, its entry is written without mtime so that the readers always list it
+_RACY_DELAY = 2.0
+
+
+# ######################################################################################################################
+
+
+class RenderManifest:
+    """
+    Manifest of a layer folder (render_out/<layer>/manifest.json) written by the farm or by tools/generate_manifests.py.
+    It describes each version : frame ranges, channels and completion state. The entry of a version is trusted only
+    while the mtime of its folder is the one recorded, otherwise the folder is listed.
+
+    {"format": 1, "versions": {"<version>": {"mtime_ns": int, "frames": [[first, last], ...],
+                                             "utility_frames": [[first, last], ...],
+                                             "channels": ["rgba.red", ...], "complete": bool}}}
+    """
+
+    @staticmethod
+    def get_manifest_path(layer_path):
+        """
+        Get the path of the manifest of a layer folder
+        :param layer_path
+        :return: manifest path
+        """
+        return layer_path + "/" + MANIFEST_FILENAME
+
+    @staticmethod
+    def load(layer_path, backend=None):
+        """
+        Load the manifest of a layer folder
+        :param layer_path
+        :param backend : storage backend of the layer folder, found from the path if None
+        :return: manifest or None if it is missing or corrupted
+        """
+        manifest_path = RenderManifest.get_manifest_path(layer_path)
+        if backend is None:
+            backend = StorageBackend.get_backend(manifest_path)
+        try:
+            data = json.loads(backend.open_range(manifest_path).decode("utf-8"))
+        except (IOError, OSError, ValueError):
+            return None
+        if not isinstance(data, dict) or data.get("format") != _MANIFEST_FORMAT_VERSION or \
+                not isinstance(data.get("versions"), dict):
+            return None
+        return RenderManifest(data["versions"])
+
+    @staticmethod
+    def build_version_entry(version, filenames, stat_result, channels=None, complete=None):
+        """
+        Build the entry of a version folder from its listing
+        :param version : name of the version folder
+        :param filenames
+        :param stat_result : stat of the version folder taken before listing it
+        :param channels : channel names or None if unknown
+        :param complete : completion state or None if unknown
+        :return: entry
+        """
+        beauty_seq, utility_seq = FrameSequence.parse_version(version, filenames)
+        entry = {
+            "mtime_ns": None if time.time() - stat_result.st_mtime < _RACY_DELAY else stat_result.st_mtime_ns,
+            "frames": [list(frame_range) for frame_range in beauty_seq.get_ranges()],
+            "utility_frames": [list(frame_range) for frame_range in utility_seq.get_ranges()],
+        }
+        if channels is not None:
+            entry["channels"] = channels
+        if complete is not None:
+            entry["complete"] = complete
+        return entry
+
+    @staticmethod
+    def write(layer_path, entries):
+        """
+        Write the manifest of a layer folder atomically
+        :param layer_path
+        :param entries : {version: entry}
+        :return:
+        """
+        fd, tmp_path = tempfile.mkstemp(prefix=".tmp_", suffix=".json", dir=layer_path)
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump({"format": _MANIFEST_FORMAT_VERSION, "versions": entries}, f, sort_keys=True)
+            os.replace(tmp_path, RenderManifest.get_manifest_path(layer_path))
+        except Exception:
+            os.remove(tmp_path)
+            raise
+
+    def __init__(self, entries):
+        """
+        Constructor
+        :param entries : {version: entry}
+        """
+        self.__entries = entries
+
+    def get_entry(self, version, stat_result):
+        """
+        Get the entry of a version if it is up to date with its folder
+        :param version
+        :param stat_result : current stat of the version folder
+        :return: entry or None if missing or stale
+        """
+        entry = self.__entries.get(version)
+        if not isinstance(entry, dict) or entry.get("mtime_ns") is None or \
+                entry["mtime_ns"] != stat_result.st_mtime_ns:
+            return None
+        return entry
+
+    @staticmethod
+    def get_filenames(version, entry):
+        """
+        Get the frame filenames described by the entry of a version
+        :param version
+        :param entry
+        :return: filenames or None if the entry is malformed
+        """
+        filenames = []
+        try:
+            for key, utility in (("frames", False), ("utility_frames", True)):
+                for first_frame, last_frame in entry.get(key, []):
+                    filenames.extend([FrameSequence.get_frame_filename(version, frame, utility)
+                                      for frame in range(int(first_frame), int(last_frame) + 1)])
+        except (TypeError, ValueError):
+            return None
+        return filenames
@@ -0,0 +1,53 @@
+from PySide2.QtCore import QObject, Signal
+
+from .ShotWatcher import ShotWatcher
+
+
+# ######################################################################################################################
+
+
+class RenderWatcher(QObject):
+    """
+    Watch the render_out folder of a shot and send the layers that changed to the panel
+    """
+    # shot path, changed layers
+    layers_changed = Signal(str, object)
+
+    def __init__(self, parent=None):
+        """
+        Constructor
+        :param parent
+        """
+        super(RenderWatcher, self).__init__(parent)
+        self.__shot_watcher = ShotWatcher(self.__on_layers_changed)
+
+    def get_shot_path(self):
+        """
+        Getter of the watched shot path
+        :return: shot path
+        """
+        return self.__shot_watcher.get_shot_path()
+
+    def watch(self, shot_path):
+        """
+        Watch a shot (and stop watching the previous one)
+        :param shot_path
+        :return:
+        """
+        self.__shot_watcher.watch(shot_path)
+
+    def stop(self):
+        """
+        Stop watching
+        :return:
+        """
+        self.__shot_watcher.stop()
+
+    def __on_layers_changed(self, shot_path, changed_layers):
+        """
+        Send the changed layers from the watcher thread (raise a RuntimeError if the panel has been deleted)
+        :param shot_path
+        :param changed_layers
+        :return:
+        """
+        self.layers_changed.emit(shot_path, changed_layers)
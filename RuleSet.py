@@ -1,6 +1,6 @@
 import re
-import nuke
 from common.utils import *
+from .BBox import BBox
 
 
 class VariablesSet:
@@ -51,18 +51,22 @@ class VariablesSet:
 
 
 class Variable:
-    def __init__(self, name, node, aliases=None, step=0):
+    def __init__(self, name, node, aliases=None, step=0, bbox=None, pass_through=True):
         """
         Constructor
         :param name
         :param node
         :param aliases
         :param step
+        :param bbox : bounding box of the pixels of the node (EXR window) or None if unknown
+        :param pass_through : the node carries layers that the Merges pass through from B (True if unknown)
         """
         self.__name = name
         self._node = node
         self.__aliases = [] if aliases is None else aliases
         self.__step = step
+        self.__bbox = bbox
+        self.__pass_through = pass_through
 
     def get_name(self):
         """
@@ -92,6 +96,36 @@ class Variable:
         """
         return self.__step
 
+    def get_bbox(self):
+        """
+        Getter of the bounding box of the pixels of the variable
+        :return: x min, y min, x max, y max or None if unknown
+        """
+        return self.__bbox
+
+    def set_bbox(self, bbox):
+        """
+        Setter of the bounding box of the pixels of the variable
+        :param bbox
+        :return:
+        """
+        self.__bbox = bbox
+
+    def has_pass_through(self):
+        """
+        Getter of whether the node carries layers that the Merges pass through from B
+        :return: has pass through layers
+        """
+        return self.__pass_through
+
+    def set_pass_through(self, pass_through):
+        """
+        Setter of whether the node carries layers that the Merges pass through from B
+        :param pass_through
+        :return:
+        """
+        self.__pass_through = pass_through
+
     def set_node(self, node):
         """
         Setter of the node of the variable
@@ -256,16 +290,20 @@ class Relation:
         """
         return self.__operation
 
-    def process(self, var_a, var_b):
+    def process(self, var_a, var_b, graph):
         """
         Process the relation by creating a merge node with the correct operation
         :param var_a
         :param var_b
+        :param graph : node graph in which the merge is created
         :return: result varaible
         """
-        merge_node = nuke.nodes.Merge(operation=str(self.__operation), inputs=[var_b.get_node(), var_a.get_node()])
+        bbox_mode, bbox = BBox.get_merge_bbox(self.__operation, var_a.get_bbox(), var_b.get_bbox(),
+                                              var_b.has_pass_through())
+        merge_node = graph.create_node("Merge2", operation=str(self.__operation), bbox=bbox_mode,
+                                       inputs=[var_b.get_node(), var_a.get_node()])
         merge_node.setName(self.__name_a + "_" + self.__operation + "_" + self.__name_b)
         step = max(var_a.get_step(), var_b.get_step()) + 1
         if self.__result_name is None:
-            return Variable("", merge_node, [], step)
-        return Variable(self.__result_name, merge_node, [], step)
+            return Variable("", merge_node, [], step, bbox, var_b.has_pass_through())
+        return Variable(self.__result_name, merge_node, [], step, bbox, var_b.has_pass_through())
@@ -0,0 +1,141 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+# ######################################################################################################################
+
+_CACHE_DIR_ENV = "AUTO_COMP_CACHE_DIR"
+_DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".auto_comp", "scan_cache")
+_CACHE_FORMAT_VERSION = 1
+# A directory modified less than this delay before its listing can still change within the same mtime tick
+_RACY_DELAY = 2.0
+
+
+# ######################################################################################################################
+
+
+class ScanCache:
+    """
+    Persistent per shot cache of directory listings, each listing is trusted while the mtime and inode
+    of its directory are unchanged
+    """
+
+    @staticmethod
+    def get_cache_dir():
+        """
+        Getter of the folder containing the cache files
+        :return: cache dir
+        """
+        return os.environ.get(_CACHE_DIR_ENV, _DEFAULT_CACHE_DIR)
+
+    @staticmethod
+    def __get_identity(stat_result):
+        """
+        Get the identity of a directory from its stat
+        :param stat_result
+        :return: identity
+        """
+        return [stat_result.st_mtime_ns, stat_result.st_ino]
+
+    def __init__(self, render_path):
+        """
+        Constructor
+        :param render_path
+        """
+        self.__render_path = render_path
+        self.__cache_path = os.path.join(ScanCache.get_cache_dir(),
+                                         hashlib.sha1(render_path.encode("utf-8")).hexdigest() + ".json")
+        self.__listings = {}
+        self.__visited = set()
+        self.__dirty = False
+        # The listings can be read and written by several scan threads
+        self.__lock = threading.Lock()
+
+    def load(self):
+        """
+        Load the cache file, a missing or corrupted file gives an empty cache
+        :return:
+        """
+        self.__listings = {}
+        try:
+            with open(self.__cache_path, "r") as f:
+                data = json.load(f)
+        except (IOError, OSError, ValueError):
+            return
+        if not isinstance(data, dict) or data.get("format") != _CACHE_FORMAT_VERSION or \
+                data.get("render_path") != self.__render_path:
+            return
+        listings = data.get("listings")
+        if isinstance(listings, dict):
+            self.__listings = listings
+
+    def get_listing(self, rel_path, stat_result):
+        """
+        Get the cached listing of a directory if the directory is unchanged
+        :param rel_path : path relative to render_out
+        :param stat_result : current stat of the directory
+        :return: dirs, files or None
+        """
+        with self.__lock:
+            self.__visited.add(rel_path)
+            listing = self.__listings.get(rel_path)
+        if listing is None or listing.get("identity") != ScanCache.__get_identity(stat_result):
+            return None
+        return listing["dirs"], listing["files"]
+
+    def set_listing(self, rel_path, stat_result, dirs, files):
+        """
+        Store the listing of a directory
+        :param rel_path : path relative to render_out
+        :param stat_result : stat of the directory taken before listing it
+        :param dirs
+        :param files
+        :return:
+        """
+        with self.__lock:
+            self.__visited.add(rel_path)
+            # Don't trust a directory that may still change within the same mtime tick
+            if time.time() - stat_result.st_mtime < _RACY_DELAY:
+                if self.__listings.pop(rel_path, None) is not None:
+                    self.__dirty = True
+                return
+            self.__listings[rel_path] = {
+                "identity": ScanCache.__get_identity(stat_result),
+                "dirs": dirs,
+                "files": files,
+            }
+            self.__dirty = True
+
+    def save(self):
+        """
+        Save the cache atomically (only the directories visited during the scan are kept)
+        :return:
+        """
+        for rel_path in list(self.__listings.keys()):
+            if rel_path not in self.__visited:
+                del self.__listings[rel_path]
+                self.__dirty = True
+        if not self.__dirty:
+            return
+        cache_dir = os.path.dirname(self.__cache_path)
+        try:
+            if not os.path.isdir(cache_dir):
+                os.makedirs(cache_dir)
+            # Write in a temporary file then replace so that concurrent readers never see a partial file
+            fd, tmp_path = tempfile.mkstemp(prefix=".tmp_", suffix=".json", dir=cache_dir)
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump({"format": _CACHE_FORMAT_VERSION,
+                               "render_path": self.__render_path,
+                               "listings": self.__listings}, f)
+                os.replace(tmp_path, self.__cache_path)
+            except Exception:
+                os.remove(tmp_path)
+                raise
+        except (IOError, OSError) as e:
+            print("### Warning : Unable to save the scan cache " + self.__cache_path + " : " + str(e))
+            return
+        self.__dirty = False
@@ -0,0 +1,240 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from PySide2.QtCore import Qt, Signal
+from PySide2.QtGui import QColor, QFont
+from PySide2.QtWidgets import QAbstractItemView, QTreeWidget, QTreeWidgetItem
+
+from .DirectoryTreeCache import DirectoryTreeCache
+
+# ######################################################################################################################
+
+_LIST_THREADS = 4
+_COLOR_SHOT = (170, 220, 170)
+
+
+# ######################################################################################################################
+
+
+class ShotBrowser(QTreeWidget):
+    """
+    Tree of the project folders filled from the directory tree cache. The folders are listed in worker threads when
+    they are opened, their sub folders are listed one level ahead so that the shots are known before being opened.
+    Only the shot folders (containing render_out) and the folders that can lead to shots are shown
+    """
+    # shot path
+    shot_selected = Signal(str)
+    # folder path, sub folders, is shot (internal : sent from the worker threads to the thread of the browser)
+    dir_listed = Signal(str, object, bool)
+
+    def __init__(self, root_path, parent=None):
+        """
+        Constructor
+        :param root_path : folder at the top of the tree
+        :param parent
+        """
+        super(ShotBrowser, self).__init__(parent)
+        self.__cache = DirectoryTreeCache.get_current()
+        self.__executor = ThreadPoolExecutor(max_workers=_LIST_THREADS)
+        # Folders being listed
+        self.__listing = set()
+        self.__listing_lock = threading.Lock()
+        # {path: item}
+        self.__items = {}
+        # Folders to open one after the other to reveal a path
+        self.__reveal_paths = []
+        self.__root_path = DirectoryTreeCache.normpath(root_path)
+
+        self.setHeaderHidden(True)
+        self.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.itemExpanded.connect(self.__on_item_expanded)
+        self.itemClicked.connect(self.__on_item_clicked)
+        self.dir_listed.connect(self.__on_dir_listed)
+
+        root_item = self.__create_item(self.__root_path, self.__root_path)
+        self.addTopLevelItem(root_item)
+
+    def shutdown(self):
+        """
+        Stop the workers and save the cache
+        :return:
+        """
+        self.__executor.shutdown(wait=False)
+        self.__cache.save()
+
+    def reveal(self, path):
+        """
+        Open the folders down to a path (the current shot for instance) so that its siblings are one click away
+        :param path
+        :return:
+        """
+        path = DirectoryTreeCache.normpath(path) if path else ""
+        if path != self.__root_path and not path.startswith(self.__root_path.rstrip("/") + "/"):
+            self.__reveal_paths = [self.__root_path]
+        else:
+            parts = path[len(self.__root_path):].strip("/").split("/")
+            self.__reveal_paths = [self.__root_path]
+            for part in parts:
+                if part:
+                    self.__reveal_paths.append(self.__reveal_paths[-1].rstrip("/") + "/" + part)
+        self.__continue_reveal()
+
+    def __continue_reveal(self):
+        """
+        Open the next folder of the path to reveal if its item exists
+        :return:
+        """
+        while len(self.__reveal_paths) > 0 and self.__reveal_paths[0] in self.__items:
+            item = self.__items[self.__reveal_paths.pop(0)]
+            if len(self.__reveal_paths) == 0:
+                self.setCurrentItem(item)
+                self.scrollToItem(item)
+            elif not item.isExpanded():
+                item.setExpanded(True)
+
+    def __create_item(self, path, name):
+        """
+        Create the item of a folder, styled with its cached listing if it is known
+        :param path
+        :param name
+        :return: item
+        """
+        item = QTreeWidgetItem([name])
+        item.setData(0, Qt.UserRole, path)
+        item.setChildIndicatorPolicy(QTreeWidgetItem.ShowIndicator)
+        self.__items[path] = item
+        listing = self.__cache.get_listing(path)
+        if listing is not None:
+            self.__style_item(item, listing[1])
+        return item
+
+    def __style_item(self, item, is_shot):
+        """
+        Show a shot folder as a selectable leaf
+        :param item
+        :param is_shot
+        :return:
+        """
+        if not is_shot:
+            return
+        item.setChildIndicatorPolicy(QTreeWidgetItem.DontShowIndicator)
+        font = QFont(item.font(0))
+        font.setBold(True)
+        item.setFont(0, font)
+        item.setForeground(0, QColor(*_COLOR_SHOT))
+
+    def __is_shown(self, path):
+        """
+        Getter of whether a folder is shown : a shot, a folder with sub folders or a folder not listed yet
+        :param path
+        :return: is shown
+        """
+        listing = self.__cache.get_listing(path)
+        return listing is None or listing[1] or len(listing[0]) > 0
+
+    def __request_listing(self, path):
+        """
+        List a folder in a worker thread (unless it is already being listed)
+        :param path
+        :return:
+        """
+        with self.__listing_lock:
+            if path in self.__listing:
+                return
+            self.__listing.add(path)
+        self.__executor.submit(self.__list_dir, path)
+
+    def __list_dir(self, path):
+        """
+        Worker function listing a folder
+        :param path
+        :return:
+        """
+        try:
+            listing = self.__cache.list_dir(path)
+            self.dir_listed.emit(path, listing[0] if listing is not None else [],
+                             listing[1] if listing is not None else False)
+        except RuntimeError:
+            # The browser has been deleted
+            pass
+        finally:
+            with self.__listing_lock:
+                self.__listing.discard(path)
+
+    def __fill_item(self, item, dirs):
+        """
+        Set the children of a folder item, the existing children are kept
+        :param item
+        :param dirs : sub folder names
+        :return:
+        """
+        path = item.data(0, Qt.UserRole)
+        children = {}
+        for index in range(item.childCount()):
+            child = item.child(index)
+            children[child.data(0, Qt.UserRole)] = child
+        item.takeChildren()
+        for name in dirs:
+            child_path = path.rstrip("/") + "/" + name
+            if not self.__is_shown(child_path):
+                self.__items.pop(child_path, None)
+                continue
+            child = children.get(child_path)
+            if child is None:
+                child = self.__create_item(child_path, name)
+            item.addChild(child)
+            # Prefetch one level ahead to know the shots before the folder is opened
+            listing = self.__cache.get_listing(child_path)
+            if listing is None or listing[2]:
+                self.__request_listing(child_path)
+        if item.childCount() == 0:
+            item.setChildIndicatorPolicy(QTreeWidgetItem.DontShowIndicator)
+
+    def __on_item_expanded(self, item):
+        """
+        On Folder opened fill it from the cache and list it again if it is unknown or stale
+        :param item
+        :return:
+        """
+        path = item.data(0, Qt.UserRole)
+        listing = self.__cache.get_listing(path)
+        if listing is not None:
+            self.__fill_item(item, listing[0])
+        if listing is None or listing[2]:
+            self.__request_listing(path)
+        self.__continue_reveal()
+
+    def __on_dir_listed(self, path, dirs, is_shot):
+        """
+        On Folder listed by a worker update its item
+        :param path
+        :param dirs
+        :param is_shot
+        :return:
+        """
+        item = self.__items.get(path)
+        if item is None:
+            return
+        parent = item.parent()
+        if parent is not None and not self.__is_shown(path):
+            parent.removeChild(item)
+            self.__items.pop(path, None)
+            return
+        self.__style_item(item, is_shot)
+        if item.isExpanded() or self.__reveal_paths[:1] == [path]:
+            self.__fill_item(item, dirs)
+        self.__continue_reveal()
+
+    def __on_item_clicked(self, item, column):
+        """
+        On Shot folder clicked send its path, on other folders open them
+        :param item
+        :param column
+        :return:
+        """
+        path = item.data(0, Qt.UserRole)
+        listing = self.__cache.get_listing(path)
+        if listing is not None and listing[1]:
+            self.shot_selected.emit(path)
+        else:
+            item.setExpanded(not item.isExpanded())
@@ -0,0 +1,744 @@
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .FrameSequence import FrameSequence
+from .RenderCatalog import RenderCatalog
+from .RenderManifest import MANIFEST_FILENAME, RenderManifest
+from .ScanCache import ScanCache
+from .StorageBackend import StorageBackend
+
+# ######################################################################################################################
+
+RENDER_OUT_DIRNAME = "render_out"
+DEFAULT_SCAN_THREADS = 8
+# Background scans (prefetch) must not saturate the file server
+_BACKGROUND_SCAN_THREADS = 2
+_NATURAL_SPLIT_REGEX = re.compile(r"([0-9]+)")
+
+
+# ######################################################################################################################
+
+
+class ShotIndex:
+    """
+    Index of the render_out folder of a shot (layers -> versions -> frames) built with a single walk
+    """
+    __indexes = {}
+    # Indexes loaded from the render catalog, shown until the shot is scanned in the session
+    __catalog_indexes = {}
+    # The indexes can be requested from the panel and from the worker threads
+    __indexes_lock = threading.Lock()
+    __scan_threads = DEFAULT_SCAN_THREADS
+    # function(render path, refresh, is_cancelled) giving the index scanned by another process or None to scan here
+    __index_provider = None
+    # Number of scans requested by the panel currently running (the background scans yield to them)
+    __foreground_scans = 0
+
+    @staticmethod
+    def natural_version_key(version):
+        """
+        Get the key to sort versions naturally (v9 before v10)
+        :param version
+        :return: key
+        """
+        return [(0, int(part), "") if part.isdigit() else (1, 0, part.lower())
+                for part in _NATURAL_SPLIT_REGEX.split(version) if part != ""]
+
+    @staticmethod
+    def set_scan_threads(scan_threads):
+        """
+        Setter of the number of threads listing the folders concurrently (1 to scan serially)
+        :param scan_threads
+        :return:
+        """
+        ShotIndex.__scan_threads = max(1, int(scan_threads))
+
+    @staticmethod
+    def get_scan_threads():
+        """
+        Getter of the number of threads listing the folders concurrently
+        :return: scan threads
+        """
+        return ShotIndex.__scan_threads
+
+    @staticmethod
+    def set_index_provider(index_provider):
+        """
+        Setter of the function giving the indexes scanned by another process (index daemon)
+        :param index_provider : function(render path, refresh, is_cancelled) returning an index or None to scan here
+        :return:
+        """
+        ShotIndex.__index_provider = index_provider
+
+    @staticmethod
+    def is_foreground_scanning():
+        """
+        Getter of whether a scan requested by the panel is running
+        :return: is foreground scanning
+        """
+        with ShotIndex.__indexes_lock:
+            return ShotIndex.__foreground_scans > 0
+
+    @staticmethod
+    def get_shot_render_path(shot_path):
+        """
+        Get the render_out path of a shot path (the shot path can already be the render_out folder)
+        :param shot_path
+        :return: render path
+        """
+        if shot_path.rstrip("/\\").endswith(RENDER_OUT_DIRNAME):
+            render_path = shot_path
+        else:
+            render_path = os.path.join(shot_path, RENDER_OUT_DIRNAME)
+        return StorageBackend.get_backend(render_path).normpath(render_path)
+
+    @staticmethod
+    def get_index(shot_path, refresh=False, is_cancelled=None, background=False):
+        """
+        Get the index of a shot, scan it only if it is not already known
+        :param shot_path
+        :param refresh : force a new scan
+        :param is_cancelled : function telling if the scan is not needed anymore
+        :param background : prefetch scan, run with fewer threads and yielding to the scans of the panel
+        :return: shot index or None if the scan has been cancelled
+        """
+        render_path = ShotIndex.get_shot_render_path(shot_path)
+        with ShotIndex.__indexes_lock:
+            if not refresh and render_path in ShotIndex.__indexes:
+                return ShotIndex.__indexes[render_path]
+            if not background:
+                ShotIndex.__foreground_scans += 1
+        try:
+            shot_index = None
+            if ShotIndex.__index_provider is not None:
+                shot_index = ShotIndex.__index_provider(render_path, refresh, is_cancelled)
+            is_scanned_here = shot_index is None
+            if is_scanned_here:
+                shot_index = ShotIndex(render_path)
+                if not shot_index.scan(is_cancelled, _BACKGROUND_SCAN_THREADS if background else None):
+                    return None
+        finally:
+            if not background:
+                with ShotIndex.__indexes_lock:
+                    ShotIndex.__foreground_scans -= 1
+        with ShotIndex.__indexes_lock:
+            # Don't keep the index of an unexisting folder (path being typed for instance)
+            if shot_index.exists():
+                ShotIndex.__indexes[render_path] = shot_index
+            else:
+                ShotIndex.__indexes.pop(render_path, None)
+            ShotIndex.__catalog_indexes.pop(render_path, None)
+        catalog = RenderCatalog.get_current()
+        if catalog is not None and shot_index.exists() and is_scanned_here:
+            catalog.store_layers(shot_index)
+        return shot_index
+
+    @staticmethod
+    def get_cached_index(shot_path, use_catalog=False):
+        """
+        Get the index of a shot only if it is already known (never scan)
+        :param shot_path
+        :param use_catalog : get the index stored in the render catalog if the shot is not scanned in the session
+        :return: shot index or None
+        """
+        render_path = ShotIndex.get_shot_render_path(shot_path)
+        with ShotIndex.__indexes_lock:
+            if render_path in ShotIndex.__indexes:
+                return ShotIndex.__indexes[render_path]
+            if not use_catalog:
+                return None
+            if render_path in ShotIndex.__catalog_indexes:
+                return ShotIndex.__catalog_indexes[render_path]
+        catalog = RenderCatalog.get_current()
+        catalog_data = catalog.load_shot(render_path) if catalog is not None else None
+        shot_index = None
+        if catalog_data is not None:
+            shot_index = ShotIndex(render_path)
+            shot_index.__set_data(True, *catalog_data)
+        with ShotIndex.__indexes_lock:
+            ShotIndex.__catalog_indexes[render_path] = shot_index
+        return shot_index
+
+    @staticmethod
+    def invalidate(shot_path=None):
+        """
+        Forget the index of a shot or all the indexes if no shot is given
+        :param shot_path
+        :return:
+        """
+        with ShotIndex.__indexes_lock:
+            if shot_path is None:
+                ShotIndex.__indexes.clear()
+                ShotIndex.__catalog_indexes.clear()
+            else:
+                ShotIndex.__indexes.pop(ShotIndex.get_shot_render_path(shot_path), None)
+                ShotIndex.__catalog_indexes.pop(ShotIndex.get_shot_render_path(shot_path), None)
+
+    def __init__(self, render_path):
+        """
+        Constructor
+        :param render_path
+        """
+        self.__render_path = render_path
+        self.__backend = StorageBackend.get_backend(render_path)
+        self.__exists = False
+        # {layer: {version: [frame filenames]}}
+        self.__layers = {}
+        # {layer: [versions sorted naturally]} sorted on demand
+        self.__sorted_versions = {}
+        # {(layer, version): mtime of the version folder} (changes each time a frame is written in it)
+        self.__version_mtimes = {}
+        # {(layer, version): manifest entry} for the versions read from an up to date manifest
+        self.__manifest_entries = {}
+        # {(layer, version): (beauty sequence, utility sequence)} parsed on demand
+        self.__sequences = {}
+        # {rel path: (mtime ns, inode)} of the directories when they were listed, unknown for a loaded index
+        self.__dir_stamps = {}
+        self.__scan_time = None
+        # Guards the swap of the dictionaries patched by refresh_dirs and the storage of the values parsed on demand
+        self.__lock = threading.Lock()
+
+    def __set_data(self, exists, scan_time, layers, version_mtimes, version_infos):
+        """
+        Fill the index with the content of a shot scanned elsewhere (render catalog, index daemon)
+        :param exists
+        :param scan_time
+        :param layers : {layer: {version: files}}
+        :param version_mtimes : {(layer, version): mtime}
+        :param version_infos : {(layer, version): manifest entry}
+        :return:
+        """
+        with self.__lock:
+            self.__exists = exists
+            self.__scan_time = scan_time
+            self.__layers = layers
+            self.__sorted_versions = {}
+            self.__version_mtimes = version_mtimes
+            self.__manifest_entries = version_infos
+            self.__sequences = {}
+            self.__dir_stamps = {}
+
+    @staticmethod
+    def from_data(data):
+        """
+        Create an index from its serialized data
+        :param data : data given by to_data
+        :return: shot index
+        """
+        shot_index = ShotIndex(data["render_path"])
+        version_mtimes = {}
+        version_infos = {}
+        for layer, version, mtime, manifest_entry in data["versions"]:
+            version_mtimes[(layer, version)] = mtime
+            if manifest_entry is not None:
+                version_infos[(layer, version)] = manifest_entry
+        shot_index.__set_data(data["exists"], data["scan_time"], data["layers"], version_mtimes, version_infos)
+        return shot_index
+
+    def to_data(self):
+        """
+        Serialize the index into JSON compatible data
+        :return: data
+        """
+        layers = self.__layers
+        return {
+            "render_path": self.__render_path,
+            "exists": self.__exists,
+            "scan_time": self.__scan_time,
+            "layers": layers,
+            "versions": [[layer, version, self.__version_mtimes.get((layer, version)),
+                          self.__manifest_entries.get((layer, version))]
+                         for layer, versions in layers.items() for version in versions.keys()],
+        }
+
+    def scan(self, is_cancelled=None, scan_threads=None):
+        """
+        Walk the render_out folder once : layers -> versions -> frames.
+        The versions described by an up to date layer manifest and the unchanged directories (persistent scan cache)
+        are not listed
+        :param is_cancelled : function telling if the scan is not needed anymore
+        :param scan_threads : number of threads listing the folders, the global setting if None
+        :return: is scan complete (not cancelled)
+        """
+        self.__scan_time = time.time()
+        self.__layers = {}
+        self.__sorted_versions = {}
+        self.__version_mtimes = {}
+        self.__manifest_entries = {}
+        self.__sequences = {}
+        self.__dir_stamps = {}
+        if scan_threads is None:
+            scan_threads = ShotIndex.__scan_threads
+        if self.__backend.is_batched():
+            return self.__scan_batched(is_cancelled, scan_threads)
+        scan_cache = ScanCache(self.__render_path)
+        scan_cache.load()
+        backend = self.__backend
+
+        def __list_dir_if_needed(path, rel_path, manifest=None):
+            if is_cancelled is not None and is_cancelled():
+                return None
+            return ShotIndex.__list_dir(backend, scan_cache, path, rel_path, manifest)
+
+        def __load_layer_manifest(layer_path, layer_listing):
+            return ShotIndex.__load_manifest(backend, layer_path, layer_listing)
+
+        listing = __list_dir_if_needed(self.__render_path, "")
+        self.__exists = listing is not None
+        if not self.__exists:
+            return is_cancelled is None or not is_cancelled()
+        self.__dir_stamps[""] = listing[4]
+        layers = listing[0]
+        layer_paths = [self.get_layer_path(layer) for layer in layers]
+        # The layer folders then all the version folders are listed concurrently,
+        # the results keep the order of the inputs so the index is deterministic
+        with ThreadPoolExecutor(max_workers=scan_threads) as executor:
+            layer_listings = list(executor.map(__list_dir_if_needed, layer_paths, layers))
+            manifests = list(executor.map(__load_layer_manifest, layer_paths, layer_listings))
+            version_paths = []
+            version_rel_paths = []
+            version_manifests = []
+            for layer, layer_path, layer_listing, manifest in zip(layers, layer_paths, layer_listings, manifests):
+                if layer_listing is None:
+                    continue
+                self.__layers[layer] = {}
+                self.__dir_stamps[layer] = layer_listing[4]
+                for version in layer_listing[0]:
+                    version_paths.append(layer_path + "/" + version)
+                    version_rel_paths.append(layer + "/" + version)
+                    version_manifests.append(manifest)
+            version_listings = list(executor.map(__list_dir_if_needed, version_paths, version_rel_paths,
+                                                 version_manifests))
+        for version_rel_path, version_listing in zip(version_rel_paths, version_listings):
+            if version_listing is None:
+                continue
+            layer, version = version_rel_path.split("/")
+            self.__layers[layer][version] = version_listing[1]
+            self.__dir_stamps[version_rel_path] = version_listing[4]
+            ShotIndex.__set_version(self.__version_mtimes, self.__manifest_entries, layer, version, version_listing)
+        # A cancelled scan is partial : it is neither kept nor saved (the cache would lose the skipped folders)
+        if is_cancelled is not None and is_cancelled():
+            return False
+        scan_cache.save()
+        return True
+
+    def __scan_batched(self, is_cancelled, scan_threads):
+        """
+        Scan the render_out folder on a storage listing whole trees at once (object store) : the layers are listed,
+        then the versions and frames of each layer are got with one paginated listing of the layer
+        :param is_cancelled : function telling if the scan is not needed anymore
+        :param scan_threads : number of layers listed concurrently
+        :return: is scan complete (not cancelled)
+        """
+        # The mtime of render_out is not needed, it would cost a listing of the whole tree
+        try:
+            layers = [entry.get_name() for entry in self.__backend.list_dir(self.__render_path) if entry.is_dir()]
+        except OSError:
+            layers = None
+        self.__exists = layers is not None
+        if not self.__exists:
+            return is_cancelled is None or not is_cancelled()
+
+        def __list_layer_if_needed(layer):
+            if is_cancelled is not None and is_cancelled():
+                return None
+            return self.__list_layer_tree(layer)
+
+        with ThreadPoolExecutor(max_workers=scan_threads) as executor:
+            layer_trees = list(executor.map(__list_layer_if_needed, layers))
+        for layer, version_listings in zip(layers, layer_trees):
+            if version_listings is None:
+                continue
+            self.__layers[layer] = {}
+            for version, version_listing in version_listings.items():
+                self.__layers[layer][version] = version_listing[1]
+                self.__dir_stamps[layer + "/" + version] = version_listing[4]
+                ShotIndex.__set_version(self.__version_mtimes, self.__manifest_entries, layer, version, version_listing)
+        return is_cancelled is None or not is_cancelled()
+
+    def __list_layer_tree(self, layer):
+        """
+        Get the listings of all the version folders of a layer with one listing of the layer tree
+        :param layer
+        :return: {version: (dirs, files, mtime, manifest entry, stamp)} or None if the layer folder doesn't exist
+        """
+        layer_path = self.get_layer_path(layer)
+        try:
+            tree = self.__backend.list_tree(layer_path, 1)
+        except OSError:
+            return None
+        versions, layer_files = tree[""][1:]
+        manifest = RenderManifest.load(layer_path, self.__backend) if MANIFEST_FILENAME in layer_files else None
+        version_listings = {}
+        for version in versions:
+            if version not in tree:
+                continue
+            version_stat, dirs, files = tree[version]
+            entry = manifest.get_entry(version, version_stat) if manifest is not None else None
+            version_listings[version] = (dirs, files, version_stat.st_mtime, entry,
+                                         ShotIndex.__get_stamp(version_stat))
+        return version_listings
+
+    @staticmethod
+    def __load_manifest(backend, layer_path, layer_listing):
+        """
+        Load the manifest of a layer folder if the listing of the folder contains one
+        :param backend : storage backend of the layer folder
+        :param layer_path
+        :param layer_listing : dirs, files, mtime or None
+        :return: manifest or None
+        """
+        if layer_listing is None or MANIFEST_FILENAME not in layer_listing[1]:
+            return None
+        return RenderManifest.load(layer_path, backend)
+
+    @staticmethod
+    def __get_stamp(stat_result):
+        """
+        Get what identifies the state of a directory (changes when an entry is added or removed, or when it is replaced)
+        :param stat_result
+        :return: mtime ns, inode
+        """
+        return stat_result.st_mtime_ns, stat_result.st_ino
+
+    @staticmethod
+    def __list_dir(backend, scan_cache, path, rel_path, manifest=None):
+        """
+        Get the sub directories and files of a directory, from the manifest of its layer if it describes the
+        directory as it is now, or from the scan cache if the directory is unchanged
+        :param backend : storage backend of the directory
+        :param scan_cache : None to always list the directory
+        :param path
+        :param rel_path : path relative to render_out
+        :param manifest : manifest of the layer of a version directory or None
+        :return: dirs, files, mtime, manifest entry, stamp or None if the directory doesn't exist
+        """
+        try:
+            stat_result = backend.stat(path)
+        except OSError:
+            return None
+        if not stat_result.is_dir():
+            return None
+        if manifest is not None:
+            version = os.path.basename(path)
+            entry = manifest.get_entry(version, stat_result)
+            if entry is not None:
+                filenames = RenderManifest.get_filenames(version, entry)
+                if filenames is not None:
+                    return [], filenames, stat_result.st_mtime, entry, ShotIndex.__get_stamp(stat_result)
+        if scan_cache is not None:
+            listing = scan_cache.get_listing(rel_path, stat_result)
+            if listing is not None:
+                return listing[0], listing[1], stat_result.st_mtime, None, ShotIndex.__get_stamp(stat_result)
+        # The directory can have been removed or be unreadable since its stat
+        try:
+            entries = backend.list_dir(path)
+        except OSError:
+            return None
+        dirs = []
+        files = []
+        for entry in entries:
+            if entry.is_dir():
+                dirs.append(entry.get_name())
+            else:
+                files.append(entry.get_name())
+        if scan_cache is not None:
+            scan_cache.set_listing(rel_path, stat_result, dirs, files)
+        return dirs, files, stat_result.st_mtime, None, ShotIndex.__get_stamp(stat_result)
+
+    @staticmethod
+    def __set_version(version_mtimes, manifest_entries, layer, version, version_listing):
+        """
+        Store the mtime and the manifest entry of a listed version folder
+        :param version_mtimes : copy of the mtimes being patched
+        :param manifest_entries : copy of the manifest entries being patched
+        :param layer
+        :param version
+        :param version_listing : dirs, files, mtime, manifest entry (None to remove the version)
+        :return:
+        """
+        if version_listing is None:
+            version_mtimes.pop((layer, version), None)
+            manifest_entries.pop((layer, version), None)
+            return
+        version_mtimes[(layer, version)] = version_listing[2]
+        if version_listing[3] is None:
+            manifest_entries.pop((layer, version), None)
+        else:
+            manifest_entries[(layer, version)] = version_listing[3]
+
+    def __set_dir_stamp(self, rel_path, stamp):
+        """
+        Store the state of a directory when it was listed
+        :param rel_path
+        :param stamp : mtime ns, inode or None if the directory doesn't exist anymore
+        :return:
+        """
+        with self.__lock:
+            if stamp is None:
+                self.__dir_stamps.pop(rel_path, None)
+            else:
+                self.__dir_stamps[rel_path] = stamp
+
+    def __swap_layer(self, layer, versions, version_mtimes=None, manifest_entries=None):
+        """
+        Replace the versions of a layer and drop the values parsed from its old versions
+        :param layer
+        :param versions : {version: [frame filenames]} or None to remove the layer
+        :param version_mtimes : patched copy of the mtimes or None if unchanged
+        :param manifest_entries : patched copy of the manifest entries or None if unchanged
+        :return:
+        """
+        with self.__lock:
+            old_versions = self.__layers.get(layer, {})
+            layers = dict(self.__layers)
+            if versions is None:
+                layers.pop(layer, None)
+            else:
+                layers[layer] = versions
+            self.__layers = layers
+            if version_mtimes is not None:
+                self.__version_mtimes = version_mtimes
+            if manifest_entries is not None:
+                self.__manifest_entries = manifest_entries
+            self.__sorted_versions.pop(layer, None)
+            for version in set(old_versions.keys()) | set(versions.keys() if versions is not None else []):
+                if versions is None or old_versions.get(version) is not versions.get(version):
+                    self.__sequences.pop((layer, version), None)
+
+    def refresh_dirs(self, rel_paths):
+        """
+        Patch the index by listing again only the directories that changed.
+        The dictionaries are replaced instead of being modified so that the readers in other threads stay valid
+        :param rel_paths : paths relative to render_out of the changed directories ("" for render_out)
+        :return: changed layers
+        """
+        changed_layers = set()
+        # Parents first so that a new layer is fully listed before its versions are patched
+        for rel_path in sorted(set(rel_paths), key=lambda x: (x.count("/") if x else -1, x)):
+            parts = rel_path.split("/") if rel_path else []
+            if len(parts) == 0:
+                listing = ShotIndex.__list_dir(self.__backend, None, self.__render_path, "")
+                if listing is None:
+                    continue
+                self.__set_dir_stamp("", listing[4])
+                old_layers = set(self.__layers.keys())
+                new_layers = set(listing[0])
+                for layer in old_layers - new_layers:
+                    self.__remove_layer(layer)
+                for layer in new_layers - old_layers:
+                    self.__refresh_layer(layer)
+                changed_layers.update(old_layers.symmetric_difference(new_layers))
+            elif len(parts) == 1:
+                self.__refresh_layer(parts[0])
+                changed_layers.add(parts[0])
+            elif len(parts) == 2 and parts[0] in self.__layers:
+                self.__refresh_version(parts[0], parts[1])
+                changed_layers.add(parts[0])
+        catalog = RenderCatalog.get_current()
+        if catalog is not None and len(changed_layers) > 0:
+            catalog.store_layers(self, changed_layers)
+        return changed_layers
+
+    def __remove_layer(self, layer):
+        """
+        Remove a layer from the index
+        :param layer
+        :return:
+        """
+        self.__swap_layer(layer, None)
+
+    def __refresh_layer(self, layer):
+        """
+        List again a layer folder, the unchanged versions are kept and the new ones are listed
+        :param layer
+        :return:
+        """
+        layer_path = self.get_layer_path(layer)
+        versions = {}
+        version_mtimes = dict(self.__version_mtimes)
+        manifest_entries = dict(self.__manifest_entries)
+        if self.__backend.is_batched():
+            # One listing of the layer tree costs less than a request per new version
+            version_listings = self.__list_layer_tree(layer)
+            if version_listings is None:
+                self.__remove_layer(layer)
+                return
+            for version, version_listing in version_listings.items():
+                versions[version] = version_listing[1]
+                self.__set_dir_stamp(layer + "/" + version, version_listing[4])
+                ShotIndex.__set_version(version_mtimes, manifest_entries, layer, version, version_listing)
+        else:
+            layer_listing = ShotIndex.__list_dir(self.__backend, None, layer_path, layer)
+            if layer_listing is None:
+                self.__remove_layer(layer)
+                return
+            self.__set_dir_stamp(layer, layer_listing[4])
+            manifest = ShotIndex.__load_manifest(self.__backend, layer_path, layer_listing)
+            old_versions = self.__layers.get(layer, {})
+            for version in layer_listing[0]:
+                if version in old_versions:
+                    versions[version] = old_versions[version]
+                    continue
+                version_listing = ShotIndex.__list_dir(self.__backend, None, layer_path + "/" + version,
+                                                       layer + "/" + version, manifest)
+                if version_listing is None:
+                    continue
+                versions[version] = version_listing[1]
+                self.__set_dir_stamp(layer + "/" + version, version_listing[4])
+                ShotIndex.__set_version(version_mtimes, manifest_entries, layer, version, version_listing)
+        self.__swap_layer(layer, versions, version_mtimes, manifest_entries)
+
+    def __refresh_version(self, layer, version):
+        """
+        List again a version folder
+        :param layer
+        :param version
+        :return:
+        """
+        layer_path = self.get_layer_path(layer)
+        version_listing = ShotIndex.__list_dir(self.__backend, None, layer_path + "/" + version,
+                                               layer + "/" + version, RenderManifest.load(layer_path, self.__backend))
+        versions = dict(self.__layers[layer])
+        if version_listing is None:
+            versions.pop(version, None)
+            self.__set_dir_stamp(layer + "/" + version, None)
+        else:
+            versions[version] = version_listing[1]
+            self.__set_dir_stamp(layer + "/" + version, version_listing[4])
+        version_mtimes = dict(self.__version_mtimes)
+        manifest_entries = dict(self.__manifest_entries)
+        ShotIndex.__set_version(version_mtimes, manifest_entries, layer, version, version_listing)
+        self.__swap_layer(layer, versions, version_mtimes, manifest_entries)
+
+    def get_render_path(self):
+        """
+        Getter of the render_out path
+        :return: render path
+        """
+        return self.__render_path
+
+    def get_scan_time(self):
+        """
+        Getter of the time of the scan
+        :return: scan time
+        """
+        return self.__scan_time
+
+    def exists(self):
+        """
+        Getter of whether the render_out folder exists
+        :return: exists
+        """
+        return self.__exists
+
+    def get_layers(self):
+        """
+        Getter of the layer names sorted alphabetically
+        :return: layers
+        """
+        return sorted(self.__layers.keys())
+
+    def has_layer(self, layer):
+        """
+        Getter of whether a layer folder exists
+        :param layer
+        :return: has layer
+        """
+        return layer in self.__layers
+
+    def get_layer_path(self, layer):
+        """
+        Getter of the path of a layer folder
+        :param layer
+        :return: layer path
+        """
+        return self.__render_path + "/" + layer
+
+    def get_versions(self, layer):
+        """
+        Getter of the version folder names of a layer sorted naturally (sorted once)
+        :param layer
+        :return: versions
+        """
+        layers = self.__layers
+        if layer not in layers:
+            return []
+        sorted_versions = self.__sorted_versions.get(layer)
+        if sorted_versions is None:
+            sorted_versions = sorted(layers[layer].keys(), key=ShotIndex.natural_version_key)
+            with self.__lock:
+                # Not stored if the layers were patched meanwhile
+                if self.__layers is layers:
+                    self.__sorted_versions[layer] = sorted_versions
+        return sorted_versions
+
+    def get_frames(self, layer, version):
+        """
+        Getter of the file names in a version folder of a layer
+        :param layer
+        :param version
+        :return: frame filenames
+        """
+        if layer not in self.__layers or version not in self.__layers[layer]:
+            return []
+        return self.__layers[layer][version]
+
+    def get_dirs(self):
+        """
+        Getter of all the directories of the index relative to render_out ("" for render_out)
+        :return: dirs
+        """
+        dirs = [""]
+        for layer, versions in self.__layers.items():
+            dirs.append(layer)
+            dirs.extend([layer + "/" + version for version in versions.keys()])
+        return dirs
+
+    def get_dir_stamps(self):
+        """
+        Getter of the state of the directories when they were listed, so that a watcher started after the scan finds
+        the directories changed since
+        :return: {rel path: (mtime ns, inode)}, the directories not listed by this process are missing
+        """
+        with self.__lock:
+            return dict(self.__dir_stamps)
+
+    def get_version_mtime(self, layer, version):
+        """
+        Getter of the modification time of a version folder (time of the last frame written in it)
+        :param layer
+        :param version
+        :return: mtime or None
+        """
+        return self.__version_mtimes.get((layer, version))
+
+    def get_manifest_entry(self, layer, version):
+        """
+        Getter of the manifest entry of a version folder (channels, completion state)
+        :param layer
+        :param version
+        :return: manifest entry or None if the version has not been read from an up to date manifest
+        """
+        return self.__manifest_entries.get((layer, version))
+
+    def get_frame_sequences(self, layer, version):
+        """
+        Getter of the beauty and utility frame sequences of a version folder of a layer (parsed once)
+        :param layer
+        :param version
+        :return: beauty sequence, utility sequence
+        """
+        key = (layer, version)
+        layers = self.__layers
+        sequences = self.__sequences.get(key)
+        if sequences is None:
+            sequences = FrameSequence.parse_version(version, layers.get(layer, {}).get(version, []))
+            with self.__lock:
+                # Not stored if the layers were patched meanwhile
+                if self.__layers is layers:
+                    self.__sequences[key] = sequences
+        return sequences
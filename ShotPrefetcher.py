@@ -0,0 +1,135 @@
+import os
+import threading
+import time
+
+from .PathCache import PathCache
+from .ShotIndex import ShotIndex
+from .StorageBackend import StorageBackend
+
+# ######################################################################################################################
+
+# Maximum number of sibling shots scanned after a shot is loaded
+_MAX_SHOTS = 4
+# Maximum duration of the prefetch of the siblings of a shot
+_TIME_BUDGET = 60.0
+# Delay without foreground scan before prefetching
+_IDLE_DELAY = 2.0
+# A prefetched index older than this is scanned again when its shot is loaded
+PREFETCH_MAX_AGE = 300.0
+
+
+# ######################################################################################################################
+
+
+class ShotPrefetcher:
+    """
+    Warm the indexes of the sibling shots of the loaded shot in a background thread, so that going to the next shot
+    of the sequence is served from memory. The prefetch yields to the scans of the panel
+    """
+
+    @staticmethod
+    def get_sibling_shots(shot_path, max_shots=_MAX_SHOTS):
+        """
+        Get the sibling shot folders of a shot, the nearest first (next shot, previous shot, ...)
+        :param shot_path
+        :param max_shots
+        :return: sibling shot paths
+        """
+        shot_dir = os.path.dirname(ShotIndex.get_shot_render_path(shot_path))
+        parent_dir = os.path.dirname(shot_dir)
+        shot_name = os.path.basename(shot_dir)
+        try:
+            names = [entry.get_name() for entry in StorageBackend.get_backend(parent_dir).list_dir(parent_dir)
+                     if entry.is_dir() and not entry.get_name().startswith(".")]
+        except OSError:
+            return []
+        names.sort(key=ShotIndex.natural_version_key)
+        if shot_name not in names:
+            return []
+        shot_position = names.index(shot_name)
+        siblings = []
+        for distance in range(1, len(names)):
+            for position in (shot_position + distance, shot_position - distance):
+                if 0 <= position < len(names):
+                    siblings.append(parent_dir + "/" + names[position])
+            if len(siblings) >= max_shots:
+                break
+        return siblings[:max_shots]
+
+    @staticmethod
+    def is_prefetched_index_fresh(shot_path):
+        """
+        Check if the index of a shot is known and recent enough to be used as it is
+        :param shot_path
+        :return: is fresh
+        """
+        shot_index = ShotIndex.get_cached_index(shot_path)
+        return shot_index is not None and time.time() - shot_index.get_scan_time() < PREFETCH_MAX_AGE
+
+    def __init__(self, max_shots=_MAX_SHOTS, time_budget=_TIME_BUDGET):
+        """
+        Constructor
+        :param max_shots
+        :param time_budget : seconds
+        """
+        self.__max_shots = max_shots
+        self.__time_budget = time_budget
+        self.__stop_event = threading.Event()
+
+    def prefetch_siblings(self, shot_path):
+        """
+        Prefetch the siblings of a shot (and cancel the previous prefetch)
+        :param shot_path
+        :return:
+        """
+        self.cancel()
+        self.__stop_event = threading.Event()
+        thread = threading.Thread(target=self.__run, args=(shot_path, self.__stop_event),
+                                  name="AutoCompShotPrefetcher")
+        thread.daemon = True
+        thread.start()
+
+    def cancel(self):
+        """
+        Stop the running prefetch
+        :return:
+        """
+        self.__stop_event.set()
+
+    def __wait_idle(self, stop_event):
+        """
+        Wait until no scan of the panel is running
+        :param stop_event
+        :return: is idle (False if the prefetch has been cancelled)
+        """
+        while True:
+            if stop_event.wait(_IDLE_DELAY):
+                return False
+            if not ShotIndex.is_foreground_scanning():
+                return True
+
+    def __run(self, shot_path, stop_event):
+        """
+        Prefetch thread
+        :param shot_path
+        :param stop_event
+        :return:
+        """
+        try:
+            if not self.__wait_idle(stop_event):
+                return
+            deadline = time.time() + self.__time_budget
+
+            def __is_cancelled():
+                return stop_event.is_set() or time.time() > deadline or ShotIndex.is_foreground_scanning()
+
+            for sibling in ShotPrefetcher.get_sibling_shots(shot_path, self.__max_shots):
+                if ShotIndex.get_cached_index(sibling) is not None or \
+                        not PathCache.is_dir(ShotIndex.get_shot_render_path(sibling)):
+                    continue
+                # A scan interrupted by a scan of the panel is started again once the panel is idle
+                while ShotIndex.get_index(sibling, is_cancelled=__is_cancelled, background=True) is None:
+                    if time.time() > deadline or not self.__wait_idle(stop_event):
+                        return
+        except Exception as e:
+            print("### Warning : ShotPrefetcher stopped : " + str(e))
@@ -0,0 +1,362 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+
+from .ShotIndex import ShotIndex
+from .StorageBackend import PosixBackend, StorageBackend
+
+# ######################################################################################################################
+
+_POLL_INTERVAL = 5.0
+# Frames are written in bursts, the changes are gathered during this delay before patching the index
+_BATCH_DELAY = 1.0
+
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ONLYDIR = 0x01000000
+_IN_NONBLOCK = os.O_NONBLOCK
+_IN_CLOEXEC = 0o2000000
+_IN_WATCH_MASK = _IN_CREATE | _IN_DELETE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_DELETE_SELF | _IN_ONLYDIR
+_INOTIFY_EVENT_FORMAT = "iIII"
+_INOTIFY_EVENT_SIZE = struct.calcsize(_INOTIFY_EVENT_FORMAT)
+
+
+# ######################################################################################################################
+
+
+class _PollingBackend:
+    """
+    Detect the changed directories by comparing their mtime at each interval.
+    On a storage listing whole trees at once (object store) the mtimes of all the directories are got with one listing
+    """
+
+    def __init__(self, render_path):
+        """
+        Constructor
+        :param render_path
+        """
+        self.__render_path = render_path
+        self.__backend = StorageBackend.get_backend(render_path)
+        self.__mtimes = {}
+
+    def sync(self, rel_paths, dir_stamps):
+        """
+        Set the directories to watch
+        :param rel_paths : paths relative to render_out
+        :param dir_stamps : {rel path: (mtime ns, inode)} of the directories when they were listed
+        :return: new watched directories changed since they were listed
+        """
+        mtimes = {}
+        changed = set()
+        tree_mtimes = None
+        for rel_path in rel_paths:
+            if rel_path in self.__mtimes:
+                mtimes[rel_path] = self.__mtimes[rel_path]
+                continue
+            if self.__backend.is_batched():
+                if tree_mtimes is None:
+                    tree_mtimes = self.__get_tree_mtimes()
+                mtimes[rel_path] = tree_mtimes.get(rel_path)
+            else:
+                mtimes[rel_path] = self.__get_mtime(rel_path)
+            if rel_path in dir_stamps and dir_stamps[rel_path][0] != mtimes[rel_path]:
+                changed.add(rel_path)
+        self.__mtimes = mtimes
+        return changed
+
+    def __get_mtime(self, rel_path):
+        """
+        Get the mtime of a watched directory
+        :param rel_path
+        :return: mtime or None if it doesn't exist
+        """
+        path = self.__render_path + "/" + rel_path if rel_path else self.__render_path
+        try:
+            return self.__backend.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+    def __get_tree_mtimes(self):
+        """
+        Get the mtimes of all the directories of render_out with one listing of the tree
+        :return: {rel path: mtime}
+        """
+        try:
+            tree = self.__backend.list_tree(self.__render_path, 2)
+        except OSError:
+            return {}
+        return {rel_path: dir_data[0].st_mtime_ns for rel_path, dir_data in tree.items()}
+
+    def wait_changes(self, stop_event, timeout):
+        """
+        Wait the interval and get the changed directories
+        :param stop_event
+        :param timeout
+        :return: changed directories
+        """
+        if stop_event.wait(timeout):
+            return set()
+        changed = set()
+        tree_mtimes = self.__get_tree_mtimes() if self.__backend.is_batched() else None
+        for rel_path, mtime in self.__mtimes.items():
+            new_mtime = self.__get_mtime(rel_path) if tree_mtimes is None else tree_mtimes.get(rel_path)
+            if new_mtime != mtime:
+                self.__mtimes[rel_path] = new_mtime
+                changed.add(rel_path)
+        return changed
+
+    def close(self):
+        """
+        Release the backend
+        :return:
+        """
+        self.__mtimes = {}
+
+
+class _InotifyBackend:
+    """
+    Detect the changed directories with inotify (Linux only, local file systems)
+    """
+
+    @staticmethod
+    def is_available():
+        """
+        Getter of whether inotify can be used
+        :return: is available
+        """
+        return sys.platform.startswith("linux") and ctypes.util.find_library("c") is not None
+
+    def __init__(self, render_path):
+        """
+        Constructor
+        :param render_path
+        """
+        self.__render_path = render_path
+        self.__libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.__fd = self.__libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self.__fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.__wd_by_rel_path = {}
+        self.__rel_path_by_wd = {}
+
+    def sync(self, rel_paths, dir_stamps):
+        """
+        Set the directories to watch
+        :param rel_paths : paths relative to render_out
+        :param dir_stamps : {rel path: (mtime ns, inode)} of the directories when they were listed
+        :return: new watched directories changed since they were listed (the events before the watch are lost)
+        """
+        changed = set()
+        rel_paths = set(rel_paths)
+        for rel_path in list(self.__wd_by_rel_path.keys()):
+            if rel_path not in rel_paths:
+                wd = self.__wd_by_rel_path.pop(rel_path)
+                self.__rel_path_by_wd.pop(wd, None)
+                self.__libc.inotify_rm_watch(self.__fd, wd)
+        for rel_path in rel_paths:
+            if rel_path in self.__wd_by_rel_path:
+                continue
+            path = self.__render_path + "/" + rel_path if rel_path else self.__render_path
+            wd = self.__libc.inotify_add_watch(self.__fd, path.encode("utf-8"), _IN_WATCH_MASK)
+            if wd >= 0:
+                self.__wd_by_rel_path[rel_path] = wd
+                self.__rel_path_by_wd[wd] = rel_path
+            if rel_path not in dir_stamps:
+                continue
+            # Stat after the watch is added : a change made later is seen as an event
+            try:
+                stat_result = os.stat(path)
+                stamp = stat_result.st_mtime_ns, stat_result.st_ino
+            except OSError:
+                stamp = None
+            if stamp is None:
+                # The directory has been removed, its parent has changed
+                changed.add(rel_path.rpartition("/")[0])
+            elif stamp != tuple(dir_stamps[rel_path]):
+                changed.add(rel_path)
+        return changed
+
+    def wait_changes(self, stop_event, timeout):
+        """
+        Wait for events and get the changed directories
+        :param stop_event
+        :param timeout
+        :return: changed directories
+        """
+        changed = set()
+        readable, _, _ = select.select([self.__fd], [], [], timeout)
+        if stop_event.is_set() or len(readable) == 0:
+            return changed
+        try:
+            data = os.read(self.__fd, 65536)
+        except OSError:
+            return changed
+        offset = 0
+        while offset + _INOTIFY_EVENT_SIZE <= len(data):
+            wd, mask, cookie, length = struct.unpack_from(_INOTIFY_EVENT_FORMAT, data, offset)
+            offset += _INOTIFY_EVENT_SIZE + length
+            if mask & _IN_Q_OVERFLOW:
+                # Events lost : everything may have changed
+                changed.update(self.__wd_by_rel_path.keys())
+                continue
+            rel_path = self.__rel_path_by_wd.get(wd)
+            if rel_path is None:
+                continue
+            if mask & (_IN_DELETE_SELF | _IN_IGNORED):
+                # The directory itself is removed, its parent has changed
+                changed.add(rel_path.rpartition("/")[0])
+            else:
+                changed.add(rel_path)
+        return changed
+
+    def close(self):
+        """
+        Release the inotify file descriptor
+        :return:
+        """
+        if self.__fd >= 0:
+            os.close(self.__fd)
+            self.__fd = -1
+
+
+class ShotWatcher:
+    """
+    Watch the render_out folder of a shot in a thread and patch its index with only the directories that changed
+    """
+
+    def __init__(self, on_layers_changed=None, poll_interval=_POLL_INTERVAL):
+        """
+        Constructor
+        :param on_layers_changed : function(shot path, changed layers) called in the watcher thread, the watcher
+        stops if it raises a RuntimeError
+        :param poll_interval : interval of the mtime polling when inotify is not available
+        """
+        self.__on_layers_changed = on_layers_changed
+        self.__poll_interval = poll_interval
+        self.__shot_path = None
+        self.__thread = None
+        self.__stop_event = threading.Event()
+
+    def get_shot_path(self):
+        """
+        Getter of the watched shot path
+        :return: shot path
+        """
+        return self.__shot_path
+
+    def watch(self, shot_path):
+        """
+        Watch a shot (and stop watching the previous one)
+        :param shot_path
+        :return:
+        """
+        self.stop()
+        self.__shot_path = shot_path
+        self.__stop_event = threading.Event()
+        self.__thread = threading.Thread(target=self.__run, args=(shot_path, self.__stop_event),
+                                         name="AutoCompShotWatcher")
+        self.__thread.daemon = True
+        self.__thread.start()
+
+    def stop(self):
+        """
+        Stop watching
+        :return:
+        """
+        self.__stop_event.set()
+        self.__thread = None
+        self.__shot_path = None
+
+    @staticmethod
+    def __create_backend(render_path):
+        """
+        Create the inotify backend on Linux and the polling backend otherwise.
+        inotify doesn't see the changes made by other machines on network shares and object stores, so the polling
+        is used there too
+        :param render_path
+        :return: backend, timeout
+        """
+        if _InotifyBackend.is_available() and isinstance(StorageBackend.get_backend(render_path), PosixBackend) and \
+                not ShotWatcher.__is_network_path(render_path):
+            try:
+                return _InotifyBackend(render_path), _BATCH_DELAY
+            except (OSError, AttributeError):
+                pass
+        return _PollingBackend(render_path), None
+
+    @staticmethod
+    def __is_network_path(path):
+        """
+        Check if a path is on a network file system (Linux only)
+        :param path
+        :return: is network path
+        """
+        try:
+            with open("/proc/mounts", "r") as f:
+                mounts = [line.split()[1:3] for line in f if len(line.split()) >= 3]
+        except (IOError, OSError):
+            return False
+        mount_fs = None
+        mount_len = -1
+        real_path = os.path.realpath(path)
+        for mount_point, fs_type in mounts:
+            if (real_path == mount_point or real_path.startswith(mount_point.rstrip("/") + "/")) \
+                    and len(mount_point) > mount_len:
+                mount_fs, mount_len = fs_type, len(mount_point)
+        return mount_fs is not None and (mount_fs.startswith("nfs") or mount_fs in ("cifs", "smb3", "smbfs"))
+
+    def __run(self, shot_path, stop_event):
+        """
+        Watcher thread
+        :param shot_path
+        :param stop_event
+        :return:
+        """
+        render_path = ShotIndex.get_shot_render_path(shot_path)
+        backend, timeout = ShotWatcher.__create_backend(render_path)
+        if timeout is None:
+            timeout = self.__poll_interval
+        shot_index = None
+        # Directories changed between their listing and their watch
+        missed_dirs = set()
+        try:
+            while not stop_event.is_set():
+                # Follow the index of the shot (it is replaced when the shot is scanned again)
+                current_index = ShotIndex.get_cached_index(shot_path)
+                if current_index is not shot_index:
+                    shot_index = current_index
+                    missed_dirs = backend.sync(shot_index.get_dirs(), shot_index.get_dir_stamps()) \
+                        if shot_index is not None else backend.sync([], {})
+                if shot_index is None:
+                    if stop_event.wait(timeout): break
+                    continue
+                if len(missed_dirs) > 0:
+                    changed_dirs = missed_dirs
+                else:
+                    changed_dirs = backend.wait_changes(stop_event, timeout)
+                    if len(changed_dirs) == 0:
+                        continue
+                    # Gather the burst of changes
+                    if stop_event.wait(_BATCH_DELAY): break
+                    changed_dirs.update(backend.wait_changes(stop_event, 0))
+                changed_layers = shot_index.refresh_dirs(changed_dirs)
+                missed_dirs = backend.sync(shot_index.get_dirs(), shot_index.get_dir_stamps())
+                if len(changed_layers) > 0 and not stop_event.is_set() and self.__on_layers_changed is not None:
+                    try:
+                        self.__on_layers_changed(shot_path, changed_layers)
+                    except RuntimeError:
+                        # The receiver has been deleted
+                        break
+        except Exception as e:
+            print("### Warning : ShotWatcher stopped : " + str(e))
+        finally:
+            backend.close()
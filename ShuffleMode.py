@@ -1,7 +1,10 @@
 import nuke
 from common.utils import *
 from .RuleSet import Variable
+from .ExrHeader import ExrHeader
+from .ChannelCatalog import ChannelCatalog
 from .LayoutManager import LayoutManager
+from .NodeGraph import GraphNode
 from .UnpackMode import BACKDROP_LAYER, BACKDROP_MERGE, BACKDROP_LAYER_SHUFFLE
 
 # ######################################################################################################################
@@ -16,13 +19,62 @@ _DISTANCE_READ_TO_SHUFFLE = 1.7
 _HEIGHT_COLUMN_SHUFFLE = 3
 _DISTANCE_OUTPUT_SHUFFLE = 1.7
 _PERCENT_HEIGHT_SHUFFLE = 1/4.0
-_EXTRA_CHANNELS = ["emission", "emission_indirect"]
 
 
 # ######################################################################################################################
 
 
 class ShuffleMode:
+    @staticmethod
+    def get_channel_entry(node):
+        """
+        Get the layers and light groups of a node, from the channel catalog for a Read node (its channels are read
+        only if its first frame changed since they were cataloged). A graph node not created yet has the channels of
+        the EXR headers of the Reads it comes from
+        :param node
+        :return: {"layers": [...], "light_groups": [...]}
+        """
+        if isinstance(node, GraphNode):
+            layers = []
+            for read_node in ShuffleMode.__get_source_reads(node):
+                seq_path = read_node.knob("file").value()
+                entry = ChannelCatalog.get_current().get_entry(seq_path, int(read_node.knob("first").value()))
+                if entry is None:
+                    print("### Warning : Light groups of " + seq_path + " not shuffled : unknown channels")
+                    continue
+                layers.extend([layer for layer in entry["layers"] if layer not in layers])
+            return {"layers": layers, "light_groups": ExrHeader.get_light_group_channels(layers)}
+        if node.Class() == "Read":
+            seq_path = nuke.filename(node)
+            if seq_path:
+                entry = ChannelCatalog.get_current().get_entry(seq_path, int(node.knob("first").value()),
+                                                               node.channels)
+                if entry is not None:
+                    return entry
+        layers = ChannelCatalog.get_layers(node.channels())
+        return {"layers": layers, "light_groups": ExrHeader.get_light_group_channels(layers)}
+
+    @staticmethod
+    def __get_source_reads(node):
+        """
+        Get the Read nodes of the graph upstream of a graph node (beauty and utility)
+        :param node
+        :return: graph Read nodes
+        """
+        read_nodes = []
+        visited = set()
+        nodes_to_visit = [node]
+        while len(nodes_to_visit) > 0:
+            current = nodes_to_visit.pop()
+            if id(current) in visited:
+                continue
+            visited.add(id(current))
+            if current.Class() == "Read" and current.knob("file").value():
+                read_nodes.append(current)
+            nodes_to_visit.extend([input_node for input_node in current.get_inputs()
+                                   if isinstance(input_node, GraphNode)])
+        return read_nodes
+
     @staticmethod
     def get_light_group_channels(node):
         """
@@ -30,15 +82,7 @@ class ShuffleMode:
         :param node
         :return: channels
         """
-        detailed_channels = node.channels()
-        visited_channels = []
-        channels = []
-        for channel in detailed_channels:
-            channel_split = channel.split(".")[0]
-            if (channel_split.startswith("RGBA_") or channel_split in _EXTRA_CHANNELS) and channel_split not in visited_channels:
-                channels.append(channel_split)
-                visited_channels.append(channel_split)
-        return channels
+        return ShuffleMode.get_channel_entry(node)["light_groups"]
 
     @staticmethod
     def get_present_channels(read_node):
@@ -82,6 +126,8 @@ class ShuffleMode:
         self._var_by_name = {}
         self._shuffle_nodes = {}
         self._output_nodes = {}
+        # {layer: {"layers": [...], "light_groups": [...]}} prefetched before the shuffle
+        self._channel_map = {}
 
     def set_var_set(self, var_set):
         """
@@ -91,13 +137,34 @@ class ShuffleMode:
         """
         self._var_set = var_set
 
-    def _get_channels(self, node_var):
+    def set_channel_map(self, channel_map):
+        """
+        Setter of the channels of the layers read before the shuffle, the layers missing are read from their node
+        :param channel_map : {layer: {"layers": [...], "light_groups": [...]}}
+        :return:
+        """
+        self._channel_map = channel_map
+
+    def _get_channel_entry(self, var, node_var):
+        """
+        Get the layers and light groups of a variable, from the channel map or from its node
+        :param var
+        :param node_var
+        :return: {"layers": [...], "light_groups": [...]}
+        """
+        entry = self._channel_map.get(var.get_layer())
+        if entry is None:
+            entry = ShuffleMode.get_channel_entry(node_var)
+        return entry
+
+    def _get_channels(self, var, node_var):
         """
         Get the channels to shuffle
+        :param var
         :param node_var
         :return: channels
         """
-        return ShuffleMode.get_light_group_channels(node_var)
+        return self._get_channel_entry(var, node_var)["light_groups"]
 
     def run(self, only_core_shuffle = False):
         """
@@ -146,24 +213,20 @@ class ShuffleMode:
         if only_core_shuffle:
             dot_node = None
         else:
-            init_dot = nuke.nodes.Dot(name=_PREFIX_DOT + layer, inputs=[node_var])
+            init_dot = self._layout_manager.create_node("Dot", name=_PREFIX_DOT + layer, inputs=[node_var])
 
             self._layout_manager.add_nodes_to_backdrop(backdrop_longname, [init_dot])
             self._layout_manager.add_backdrop_option(shuffle_backdrop_longname, "margin_bottom", 56)
             self._layout_manager.add_backdrop_option(shuffle_backdrop_longname, "font_size", 30)
             self._layout_manager.add_node_layout_relation(node_var, init_dot, LayoutManager.POS_RIGHT,
                                                           _DISTANCE_READ_TO_SHUFFLE / 2.0)
-            dot_node = nuke.nodes.Dot(name=_PREFIX_DOT + layer, inputs=[init_dot])
+            dot_node = self._layout_manager.create_node("Dot", name=_PREFIX_DOT + layer, inputs=[init_dot])
             self._layout_manager.add_nodes_to_backdrop(backdrop_longname, [dot_node])
             self._layout_manager.add_node_layout_relation(init_dot, dot_node, LayoutManager.POS_TOP,
                                                           _HEIGHT_COLUMN_SHUFFLE)
 
         # Get the channels to shuffle
-        channels = self._get_channels(node_var)
-
-        # Unselect all to prevent nuke auto linking
-        for node in nuke.selectedNodes():
-            node.setSelected(False)
+        channels = self._get_channels(var, node_var)
 
         lg_channels = []
         # for each channel create input and connect to the last to create a chain
@@ -175,9 +238,9 @@ class ShuffleMode:
 
             prev_node = dot_node
             if prev_node is None:
-                dot_node = nuke.nodes.Dot(name=_PREFIX_DOT + layer)
+                dot_node = self._layout_manager.create_node("Dot", name=_PREFIX_DOT + layer)
             else:
-                dot_node = nuke.nodes.Dot(name=_PREFIX_DOT + layer, inputs=[prev_node])
+                dot_node = self._layout_manager.create_node("Dot", name=_PREFIX_DOT + layer, inputs=[prev_node])
                 self._layout_manager.add_node_layout_relation(prev_node, dot_node, LayoutManager.POS_RIGHT, dist)
 
             self._layout_manager.add_nodes_to_backdrop(shuffle_backdrop_longname, [dot_node])
@@ -201,7 +264,7 @@ class ShuffleMode:
         :return:
         """
         layer_var = var.get_layer()
-        shuffle_node = nuke.createNode("Shuffle2")
+        shuffle_node = self._layout_manager.create_node("Shuffle2")
         shuffle_node["in1"].setValue(channel)
         shuffle_node["postage_stamp"].setValue(True)
         shuffle_node.setName(_PREFIX_SHUFFLE + layer_var + "_" + channel.replace("RGBA_", ""))
@@ -232,10 +295,11 @@ class ShuffleMode:
                 name_node = _PREFIX_MERGE_SHUFFLED + var_layer if i == nb_var_shuffle_nodes-1 else None
                 if first and not only_core_shuffle:
                     first = False
-                    merge_node = nuke.nodes.Dot(name=_PREFIX_DOT + var_layer if name_node is None else name_node,
-                                                inputs=[node])
+                    merge_node = self._layout_manager.create_node(
+                        "Dot", name=_PREFIX_DOT + var_layer if name_node is None else name_node, inputs=[node])
                 else:
-                    merge_node = nuke.nodes.Merge(
+                    merge_node = self._layout_manager.create_node(
+                        "Merge2",
                         name=_PREFIX_MERGE_SHUFFLE + var_layer if name_node is None else name_node,
                         operation="plus", A="rgb", inputs=[current_node, node])
                 self._layout_manager.add_nodes_to_backdrop(shuffle_backdrop_longname, [merge_node])
@@ -268,7 +332,8 @@ class ShuffleMode:
                 else:
                     dist = (max_len - 1) * _DISTANCE_COLUMN_SHUFFLE + _DISTANCE_READ_TO_SHUFFLE + _DISTANCE_OUTPUT_SHUFFLE
             # Create a end dot to the correct distance from the output node
-            dot_node = nuke.nodes.Dot(name=_PREFIX_DOT + layer_name, inputs=[output_node])
+            dot_node = self._layout_manager.create_node("Dot", name=_PREFIX_DOT + layer_name,
+                                                        inputs=[output_node])
             self._layout_manager.add_nodes_to_backdrop(BACKDROP_MERGE, [dot_node])
             self._layout_manager.add_node_layout_relation(output_node, dot_node,
                                                           LayoutManager.POS_RIGHT, dist)
@@ -289,13 +354,14 @@ class ShuffleChannelMode(ShuffleMode):
         ShuffleMode.__init__(self, layout_manager)
         self.__channels = channels
 
-    def _get_channels(self, node_var):
+    def _get_channels(self, var, node_var):
         """
         Get the channels to shuffle
+        :param var
         :param node_var
         :return: channels
         """
-        node_channels = map(lambda x: x.split(".")[0], node_var.channels())
+        node_channels = self._get_channel_entry(var, node_var)["layers"]
         channels = []
         for channel in self.__channels:
             if channel in node_channels:
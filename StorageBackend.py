@@ -0,0 +1,588 @@
+import calendar
+import datetime
+import hashlib
+import hmac
+import os
+import re
+import stat
+import threading
+import time
+import xml.etree.ElementTree as ElementTree
+from urllib.error import HTTPError, URLError
+from urllib.parse import quote, urlsplit
+from urllib.request import Request, urlopen
+
+# ######################################################################################################################
+
+_SCHEME_REGEX = re.compile(r"^([a-zA-Z][a-zA-Z0-9+.-]+)://")
+
+_S3_ENDPOINT_ENV = "AUTO_COMP_S3_ENDPOINT"
+_DEFAULT_S3_ENDPOINT = "https://s3.amazonaws.com"
+_DEFAULT_S3_REGION = "us-east-1"
+# Maximum number of keys of a page of a listing (the maximum accepted by S3)
+_S3_PAGE_SIZE = 1000
+_S3_TIMEOUT = 30.0
+_S3_UNSIGNED_PAYLOAD = "UNSIGNED-PAYLOAD"
+
+
+# ######################################################################################################################
+
+
+class StorageStat:
+    """
+    Metadata of a file or a directory of a storage backend. It has the fields of os.stat_result used by the scans
+    (st_size, st_mtime, st_mtime_ns, st_ino) so that it can be given to ScanCache and RenderManifest
+    """
+
+    @staticmethod
+    def from_os_stat(stat_result):
+        """
+        Create the metadata from the result of os.stat
+        :param stat_result
+        :return: storage stat
+        """
+        return StorageStat(stat.S_ISDIR(stat_result.st_mode), stat_result.st_size, stat_result.st_mtime_ns,
+                           stat_result.st_ino)
+
+    def __init__(self, is_dir, size, mtime_ns, ino=0):
+        """
+        Constructor
+        :param is_dir
+        :param size : bytes
+        :param mtime_ns : modification time in nanoseconds
+        :param ino : inode (0 when the storage has no inodes)
+        """
+        self.__is_dir = is_dir
+        self.st_size = size
+        self.st_mtime_ns = mtime_ns
+        self.st_mtime = mtime_ns / 1e9
+        self.st_ino = ino
+
+    def is_dir(self):
+        """
+        Getter of whether it is a directory
+        :return: is dir
+        """
+        return self.__is_dir
+
+
+class StorageEntry:
+    """
+    Entry of a directory listing, its metadata is fetched only if it is asked (POSIX) or given by the listing (S3)
+    """
+
+    def __init__(self, name, is_dir, stat_result=None, stat_getter=None):
+        """
+        Constructor
+        :param name
+        :param is_dir
+        :param stat_result : storage stat if known
+        :param stat_getter : function giving the storage stat when it is not known
+        """
+        self.__name = name
+        self.__is_dir = is_dir
+        self.__stat = stat_result
+        self.__stat_getter = stat_getter
+
+    def get_name(self):
+        """
+        Getter of the name
+        :return: name
+        """
+        return self.__name
+
+    def is_dir(self):
+        """
+        Getter of whether the entry is a directory
+        :return: is dir
+        """
+        return self.__is_dir
+
+    def get_stat(self):
+        """
+        Getter of the metadata of the entry (fetched once)
+        :return: storage stat
+        """
+        if self.__stat is None and self.__stat_getter is not None:
+            self.__stat = self.__stat_getter()
+        return self.__stat
+
+
+class StorageBackend:
+    """
+    Access to the folders of the renders. The backend of a path is chosen by the scheme of the path
+    ("s3://bucket/..." for instance), the paths without scheme are on the POSIX file system.
+    The methods raise OSError (FileNotFoundError if the path doesn't exist) like the os module
+    """
+    __backends = {}
+    __posix_backend = None
+    __lock = threading.Lock()
+
+    @staticmethod
+    def get_scheme(path):
+        """
+        Get the scheme of a path
+        :param path
+        :return: scheme or None for a POSIX path
+        """
+        match = _SCHEME_REGEX.match(path)
+        return match.group(1).lower() if match else None
+
+    @staticmethod
+    def register_backend(scheme, backend):
+        """
+        Use a backend for the paths of a scheme (an S3 backend on another endpoint, a caching proxy...)
+        :param scheme
+        :param backend : None to restore the default backend of the scheme
+        :return:
+        """
+        with StorageBackend.__lock:
+            if backend is None:
+                StorageBackend.__backends.pop(scheme.lower(), None)
+            else:
+                StorageBackend.__backends[scheme.lower()] = backend
+
+    @staticmethod
+    def get_backend(path):
+        """
+        Get the backend of a path
+        :param path
+        :return: backend
+        """
+        scheme = StorageBackend.get_scheme(path)
+        with StorageBackend.__lock:
+            if scheme == "s3" and scheme not in StorageBackend.__backends:
+                StorageBackend.__backends[scheme] = S3Backend.from_environment()
+            if scheme in StorageBackend.__backends:
+                return StorageBackend.__backends[scheme]
+            # Unknown schemes are POSIX paths that don't exist (path being typed for instance)
+            if StorageBackend.__posix_backend is None:
+                StorageBackend.__posix_backend = PosixBackend()
+            return StorageBackend.__posix_backend
+
+    def is_batched(self):
+        """
+        Getter of whether list_tree gets a whole tree with a few requests (instead of one request per directory)
+        :return: is batched
+        """
+        return False
+
+    def normpath(self, path):
+        """
+        Normalize a path of the backend with forward slashes
+        :param path
+        :return: normalized path
+        """
+        return path.rstrip("/")
+
+    def stat(self, path):
+        """
+        Get the metadata of a file or a directory
+        :param path
+        :return: storage stat
+        """
+        raise NotImplementedError
+
+    def is_dir(self, path):
+        """
+        Check if a path is a directory
+        :param path
+        :return: is dir
+        """
+        try:
+            return self.stat(path).is_dir()
+        except OSError:
+            return False
+
+    def list_dir(self, path):
+        """
+        List a directory with the metadata of its entries
+        :param path
+        :return: storage entries
+        """
+        raise NotImplementedError
+
+    def list_tree(self, path, max_depth=None):
+        """
+        List a directory and all its sub directories
+        :param path
+        :param max_depth : depth of the listed sub directories (0 for only the directory), None for no limit
+        :return: {path relative to the directory ("" for the directory): (storage stat, dirs, files)}
+        """
+        # Default implementation : one listing per directory
+        tree = {}
+        dirs_to_list = [("", path, self.stat(path), 0)]
+        while len(dirs_to_list) > 0:
+            rel_path, dir_path, dir_stat, depth = dirs_to_list.pop()
+            try:
+                entries = self.list_dir(dir_path)
+            except OSError:
+                if rel_path == "":
+                    raise
+                continue
+            dirs = []
+            files = []
+            for entry in entries:
+                if not entry.is_dir():
+                    files.append(entry.get_name())
+                    continue
+                dirs.append(entry.get_name())
+                if max_depth is None or depth < max_depth:
+                    try:
+                        dirs_to_list.append(((rel_path + "/" if rel_path else "") + entry.get_name(),
+                                             dir_path + "/" + entry.get_name(), entry.get_stat(), depth + 1))
+                    except OSError:
+                        pass
+            tree[rel_path] = (dir_stat, dirs, files)
+        return tree
+
+    def open_range(self, path, offset=0, length=None):
+        """
+        Read a part of a file
+        :param path
+        :param offset : first byte
+        :param length : number of bytes, None to read until the end
+        :return: bytes
+        """
+        raise NotImplementedError
+
+
+class PosixBackend(StorageBackend):
+    """
+    Storage backend of the local and mounted file systems
+    """
+
+    def normpath(self, path):
+        """
+        Normalize a path with forward slashes
+        :param path
+        :return: normalized path
+        """
+        return os.path.normpath(path).replace("\\", "/")
+
+    def stat(self, path):
+        """
+        Get the metadata of a file or a directory
+        :param path
+        :return: storage stat
+        """
+        return StorageStat.from_os_stat(os.stat(path))
+
+    def is_dir(self, path):
+        """
+        Check if a path is a directory
+        :param path
+        :return: is dir
+        """
+        return os.path.isdir(path)
+
+    def list_dir(self, path):
+        """
+        List a directory, the metadata of an entry is fetched only if it is asked
+        :param path
+        :return: storage entries
+        """
+        with os.scandir(path) as it:
+            return [StorageEntry(entry.name, entry.is_dir(),
+                                 stat_getter=lambda entry=entry: StorageStat.from_os_stat(entry.stat()))
+                    for entry in it]
+
+    def open_range(self, path, offset=0, length=None):
+        """
+        Read a part of a file
+        :param path
+        :param offset : first byte
+        :param length : number of bytes, None to read until the end
+        :return: bytes
+        """
+        with open(path, "rb") as f:
+            f.seek(offset)
+            return f.read() if length is None else f.read(length)
+
+
+class S3Backend(StorageBackend):
+    """
+    Storage backend of an S3 compatible object store (path style requests, signed with AWS Signature V4 when
+    credentials are given). Paths are s3://<bucket>/<key>, the directories are the prefixes of the keys.
+    A tree is listed with a paginated ListObjectsV2 of its prefix : one request per 1000 files whatever the number
+    of directories. The mtime of a directory is the last modification time of the objects under it
+    """
+
+    @staticmethod
+    def from_environment():
+        """
+        Create the backend from the environment variables (AUTO_COMP_S3_ENDPOINT, AWS_ACCESS_KEY_ID,
+        AWS_SECRET_ACCESS_KEY, AWS_SESSION_TOKEN, AWS_REGION)
+        :return: S3 backend
+        """
+        return S3Backend(os.environ.get(_S3_ENDPOINT_ENV, _DEFAULT_S3_ENDPOINT),
+                         os.environ.get("AWS_ACCESS_KEY_ID"), os.environ.get("AWS_SECRET_ACCESS_KEY"),
+                         os.environ.get("AWS_SESSION_TOKEN"),
+                         os.environ.get("AWS_REGION", os.environ.get("AWS_DEFAULT_REGION", _DEFAULT_S3_REGION)))
+
+    def __init__(self, endpoint, access_key=None, secret_key=None, session_token=None, region=_DEFAULT_S3_REGION,
+                 page_size=_S3_PAGE_SIZE):
+        """
+        Constructor
+        :param endpoint : URL of the S3 service (http://localhost:9000 for a local stand-in server for instance)
+        :param access_key : None for anonymous requests
+        :param secret_key
+        :param session_token
+        :param region
+        :param page_size : maximum number of keys of a page of a listing
+        """
+        self.__endpoint = endpoint.rstrip("/")
+        self.__host = urlsplit(self.__endpoint).netloc
+        self.__access_key = access_key
+        self.__secret_key = secret_key
+        self.__session_token = session_token
+        self.__region = region
+        self.__page_size = page_size
+
+    def is_batched(self):
+        """
+        Getter of whether list_tree gets a whole tree with a few requests
+        :return: is batched
+        """
+        return True
+
+    def normpath(self, path):
+        """
+        Normalize an s3:// path (no duplicated, dot or trailing slashes)
+        :param path
+        :return: normalized path
+        """
+        parts = []
+        for part in path[len("s3://"):].replace("\\", "/").split("/"):
+            if part == "..":
+                if len(parts) > 1:
+                    parts.pop()
+            elif part not in ("", "."):
+                parts.append(part)
+        return "s3://" + "/".join(parts)
+
+    @staticmethod
+    def __split_path(path):
+        """
+        Split an s3:// path into its bucket and key
+        :param path
+        :return: bucket, key
+        """
+        bucket, _, key = path[len("s3://"):].partition("/")
+        return bucket, key.strip("/")
+
+    @staticmethod
+    def __parse_time(text):
+        """
+        Parse a time of a listing (2024-01-31T12:00:00.000Z) or of a header (Wed, 31 Jan 2024 12:00:00 GMT)
+        :param text
+        :return: time in nanoseconds
+        """
+        for time_format in ("%Y-%m-%dT%H:%M:%S.%fZ", "%Y-%m-%dT%H:%M:%SZ", "%a, %d %b %Y %H:%M:%S GMT"):
+            try:
+                date = datetime.datetime.strptime(text, time_format)
+            except ValueError:
+                continue
+            return calendar.timegm(date.timetuple()) * 10 ** 9 + date.microsecond * 1000
+        return 0
+
+    def __sign(self, method, canonical_uri, query, headers):
+        """
+        Add the AWS Signature V4 headers to a request
+        :param method
+        :param canonical_uri : URI encoded path
+        :param query : [(name, value)]
+        :param headers : {name: value} completed with the signature
+        :return:
+        """
+        now = time.gmtime()
+        amz_date = time.strftime("%Y%m%dT%H%M%SZ", now)
+        date_stamp = amz_date[:8]
+        headers["x-amz-date"] = amz_date
+        headers["x-amz-content-sha256"] = _S3_UNSIGNED_PAYLOAD
+        if self.__session_token:
+            headers["x-amz-security-token"] = self.__session_token
+        headers["host"] = self.__host
+        signed_names = sorted(name.lower() for name in headers.keys())
+        lower_headers = {name.lower(): str(value).strip() for name, value in headers.items()}
+        canonical_request = "\n".join([
+            method,
+            canonical_uri,
+            "&".join(quote(name, safe="-_.~") + "=" + quote(value, safe="-_.~") for name, value in sorted(query)),
+            "".join(name + ":" + lower_headers[name] + "\n" for name in signed_names),
+            ";".join(signed_names),
+            _S3_UNSIGNED_PAYLOAD,
+        ])
+        scope = "/".join([date_stamp, self.__region, "s3", "aws4_request"])
+        string_to_sign = "\n".join(["AWS4-HMAC-SHA256", amz_date, scope,
+                                    hashlib.sha256(canonical_request.encode("utf-8")).hexdigest()])
+        key = ("AWS4" + self.__secret_key).encode("utf-8")
+        for part in (date_stamp, self.__region, "s3", "aws4_request"):
+            key = hmac.new(key, part.encode("utf-8"), hashlib.sha256).digest()
+        signature = hmac.new(key, string_to_sign.encode("utf-8"), hashlib.sha256).hexdigest()
+        headers["Authorization"] = "AWS4-HMAC-SHA256 Credential=%s/%s, SignedHeaders=%s, Signature=%s" % \
+                                   (self.__access_key, scope, ";".join(signed_names), signature)
+        del headers["host"]
+
+    def __request(self, method, bucket, key="", query=None, headers=None):
+        """
+        Send a request to the service
+        :param method
+        :param bucket
+        :param key
+        :param query : [(name, value)]
+        :param headers : {name: value}
+        :return: status, response headers, body
+        """
+        query = query or []
+        headers = dict(headers or {})
+        canonical_uri = "/" + quote(bucket, safe="") + ("/" + quote(key, safe="/-_.~") if key else "")
+        if self.__access_key and self.__secret_key:
+            self.__sign(method, canonical_uri, query, headers)
+        url = self.__endpoint + canonical_uri
+        if len(query) > 0:
+            url += "?" + "&".join(quote(name, safe="-_.~") + "=" + quote(value, safe="-_.~")
+                                  for name, value in query)
+        try:
+            with urlopen(Request(url, headers=headers, method=method), timeout=_S3_TIMEOUT) as response:
+                return response.status, response.headers, response.read()
+        except HTTPError as e:
+            if e.code == 404:
+                raise FileNotFoundError(2, "No such object", "s3://" + bucket + "/" + key)
+            raise OSError("S3 request failed (HTTP %d) for s3://%s/%s" % (e.code, bucket, key))
+        except URLError as e:
+            raise OSError("S3 request failed for s3://%s/%s : %s" % (bucket, key, e.reason))
+
+    def __list_objects(self, bucket, prefix, delimiter=None):
+        """
+        List the objects of a prefix, page by page
+        :param bucket
+        :param prefix : key prefix ending with / ("" for the whole bucket)
+        :param delimiter : "/" to get only the first level (the sub directories are given as common prefixes)
+        :return: [(key relative to the prefix, size, mtime_ns)], [common prefixes relative to the prefix]
+        """
+        objects = []
+        common_prefixes = []
+        continuation_token = None
+        while True:
+            query = [("list-type", "2"), ("prefix", prefix), ("max-keys", str(self.__page_size))]
+            if delimiter is not None:
+                query.append(("delimiter", delimiter))
+            if continuation_token is not None:
+                query.append(("continuation-token", continuation_token))
+            _, _, body = self.__request("GET", bucket, query=query)
+            try:
+                root = ElementTree.fromstring(body)
+            except ElementTree.ParseError as e:
+                raise OSError("Invalid S3 listing of s3://%s/%s : %s" % (bucket, prefix, e))
+            continuation_token = None
+            is_truncated = False
+            for element in root:
+                tag = element.tag.rpartition("}")[2]
+                if tag == "Contents":
+                    fields = {child.tag.rpartition("}")[2]: child.text or "" for child in element}
+                    objects.append((fields.get("Key", "")[len(prefix):], int(fields.get("Size") or 0),
+                                    S3Backend.__parse_time(fields.get("LastModified", ""))))
+                elif tag == "CommonPrefixes":
+                    for child in element:
+                        if child.tag.rpartition("}")[2] == "Prefix":
+                            common_prefixes.append((child.text or "")[len(prefix):].rstrip("/"))
+                elif tag == "IsTruncated":
+                    is_truncated = (element.text or "").strip().lower() == "true"
+                elif tag == "NextContinuationToken":
+                    continuation_token = element.text
+            if not is_truncated or not continuation_token:
+                return objects, common_prefixes
+
+    def stat(self, path):
+        """
+        Get the metadata of an object, or of a directory (a prefix having objects) with a listing of the prefix
+        :param path
+        :return: storage stat
+        """
+        bucket, key = S3Backend.__split_path(path)
+        if key:
+            try:
+                _, headers, _ = self.__request("HEAD", bucket, key)
+                return StorageStat(False, int(headers.get("Content-Length") or 0),
+                                   S3Backend.__parse_time(headers.get("Last-Modified", "")))
+            except FileNotFoundError:
+                pass
+        return self.list_tree(path, 0)[""][0]
+
+    def list_dir(self, path):
+        """
+        List the first level of a prefix (one request per 1000 entries)
+        :param path
+        :return: storage entries
+        """
+        bucket, key = S3Backend.__split_path(path)
+        prefix = key + "/" if key else ""
+        objects, common_prefixes = self.__list_objects(bucket, prefix, "/")
+        if len(objects) == 0 and len(common_prefixes) == 0:
+            raise FileNotFoundError(2, "No such directory", path)
+        entries = [StorageEntry(name, False, StorageStat(False, size, mtime_ns))
+                   for name, size, mtime_ns in objects if name]
+        entries.extend([StorageEntry(name, True, stat_getter=lambda name=name: self.stat(path + "/" + name))
+                        for name in common_prefixes])
+        return entries
+
+    def list_tree(self, path, max_depth=None):
+        """
+        List a prefix and all its sub prefixes with a single paginated listing
+        :param path
+        :param max_depth : depth of the listed sub directories (0 for only the directory), None for no limit
+        :return: {path relative to the directory ("" for the directory): (storage stat, dirs, files)}
+        """
+        bucket, key = S3Backend.__split_path(path)
+        objects, _ = self.__list_objects(bucket, key + "/" if key else "")
+        if len(objects) == 0:
+            raise FileNotFoundError(2, "No such directory", path)
+        # {rel dir: [dirs, files, mtime_ns]}
+        dirs_data = {"": [[], [], 0]}
+        for rel_key, size, mtime_ns in objects:
+            parts = rel_key.split("/")
+            rel_dir = ""
+            for depth, part in enumerate(parts):
+                dir_data = dirs_data[rel_dir]
+                dir_data[2] = max(dir_data[2], mtime_ns)
+                if part == "":
+                    # Folder marker object (key ending with /)
+                    break
+                if depth == len(parts) - 1:
+                    dir_data[1].append(part)
+                    break
+                child_dir = rel_dir + "/" + part if rel_dir else part
+                if child_dir not in dirs_data:
+                    dir_data[0].append(part)
+                    dirs_data[child_dir] = [[], [], 0]
+                rel_dir = child_dir
+        return {rel_dir: (StorageStat(True, 0, mtime_ns), dirs, files)
+                for rel_dir, (dirs, files, mtime_ns) in dirs_data.items()
+                if max_depth is None or (rel_dir.count("/") + 1 if rel_dir else 0) <= max_depth}
+
+    def open_range(self, path, offset=0, length=None):
+        """
+        Read a part of an object with a ranged GET
+        :param path
+        :param offset : first byte
+        :param length : number of bytes, None to read until the end
+        :return: bytes
+        """
+        bucket, key = S3Backend.__split_path(path)
+        if length is not None and length <= 0:
+            return b""
+        headers = {}
+        if offset > 0 or length is not None:
+            headers["Range"] = "bytes=%d-%s" % (offset, "" if length is None else str(offset + length - 1))
+        try:
+            status, _, body = self.__request("GET", bucket, key, headers=headers)
+        except OSError as e:
+            # Range beyond the end of the object
+            if "HTTP 416" in str(e):
+                return b""
+            raise
+        # A server ignoring the Range header sends the whole object
+        if status == 200 and (offset > 0 or length is not None):
+            body = body[offset:] if length is None else body[offset:offset + length]
+        return body
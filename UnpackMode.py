@@ -1,16 +1,27 @@
 import os
-import re
-import nuke
 import nukescripts
 from common.utils import *
 from .LayoutManager import LayoutManager
 from .RuleSet import StartVariable
+from .FrameSequence import FrameSequence
+from .ShotIndex import ShotIndex
+from .ChannelCatalog import ChannelCatalog
+from .ExrHeader import ExrHeader
+from .ExrPixelStats import ExrPixelStats
+from .VersionPolicy import VersionPolicy, POLICY_LABELS
+from .BBox import BBox
 
 # ######################################################################################################################
 
 _PREFIX_POSTAGE = "postage_"
 _PREFIX_UTILITY = "utility_"
 _PREFIX_UTILITY_MERGE = "utility_merge_"
+_PREFIX_CROP = "crop_"
+_PREFIX_UTILITY_COPY = "utility_copy_"
+# Layer option cropping the overscan of the frames (data window outside the display window)
+_OPTION_CROP_TO_FORMAT = "crop_to_format"
+# Layer option listing the layers of the utility sequence to copy in the beauty (all merged if not set)
+_OPTION_UTILITY_LAYERS = "utility_layers"
 _BACKDROP_INPUTS = "INPUTS"
 BACKDROP_LAYER = "LAYER"
 BACKDROP_MERGE = "MERGE"
@@ -28,6 +39,26 @@ _LAYER_POSTAGE_DISTANCE = 6
 # ######################################################################################################################
 
 class UnpackMode:
+    # Maximum value of the light groups skipped as empty, None to shuffle all the light groups
+    __empty_light_group_threshold = None
+
+    @staticmethod
+    def set_empty_light_group_threshold(threshold):
+        """
+        Setter of the threshold under which the light groups are black in the sample frames of a layer and are not
+        shuffled (None to shuffle all the light groups)
+        :param threshold
+        :return:
+        """
+        UnpackMode.__empty_light_group_threshold = threshold
+
+    @staticmethod
+    def get_empty_light_group_threshold():
+        """
+        Getter of the threshold of the empty light groups
+        :return: threshold or None
+        """
+        return UnpackMode.__empty_light_group_threshold
 
     @staticmethod
     def __ligthen_color(r, g, b):
@@ -55,52 +86,115 @@ class UnpackMode:
 
         return int(r * (1-darken_ratio)), int(g *(1-darken_ratio)), int(b *(1-darken_ratio))
 
+    @staticmethod
+    def get_last_version_from_layer(layer_path, policy=None):
+        """
+        Get the last version of a layer accepted by the version policy (from the index of the shot)
+        :param layer_path
+        :param policy : current version policy if None
+        :return: version, beauty sequence, utility sequence or None
+        """
+        if policy is None:
+            policy = VersionPolicy.get_current()
+        shot_index = ShotIndex.get_index(os.path.dirname(layer_path))
+        return policy.resolve(shot_index, os.path.basename(layer_path))
+
     @staticmethod
     def get_last_seq_from_layer(layer_path):
         """
         Get the last sequence and utility sequence of a layer
         :param layer_path
-        :return: seq_path, utility_path, start_frame, end_frame
+        :return: seq_path, utility_path, start_frame, end_frame, utility_start_frame (None without utility)
         """
-        if not os.path.isdir(layer_path):
+        version_data = UnpackMode.get_last_version_from_layer(layer_path)
+        if version_data is None:
             return None
-        for seq_name in reversed(os.listdir(layer_path)):
-            seq_dir_path = os.path.join(layer_path, seq_name)
-            if os.path.isdir(seq_dir_path):
-                start_frame = None
-                end_frame = None
-                utility_path = None
-                seq_path = None
-                for frame in os.listdir(seq_dir_path):
-                    match = re.match(r"^" + seq_name + r"(_utility)?\.([0-9]{4})\.exr$", frame)
-                    if match:
-                        if match.group(1) is not None:
-                            frame_count = int(match.group(2))
-                            if frame_count < start_frame or start_frame is None:
-                                start_frame = frame_count
-                            if frame_count > end_frame or end_frame is None:
-                                end_frame = frame_count
-                            seq_path = os.path.join(seq_dir_path, seq_name + ".####.exr").replace("\\", "/")
-                        else:
-                            utility_path = os.path.join(seq_dir_path, seq_name + "_utility.####.exr").replace("\\", "/")
-                if seq_path is not None:
-                    return seq_path, utility_path, start_frame, end_frame
-        return None
+        seq_name, beauty_seq, utility_seq = version_data
+        seq_dir_path = os.path.join(layer_path, seq_name)
+        seq_path = os.path.join(seq_dir_path, FrameSequence.get_seq_filename(seq_name)).replace("\\", "/")
+        if utility_seq.is_empty():
+            utility_path = None
+            utility_start_frame = None
+        else:
+            utility_path = os.path.join(seq_dir_path,
+                                        FrameSequence.get_seq_filename(seq_name, True)).replace("\\", "/")
+            utility_start_frame = utility_seq.get_start()
+        return seq_path, utility_path, beauty_seq.get_start(), beauty_seq.get_end(), utility_start_frame
 
     @staticmethod
-    def __create_read_with_postage(name, seq_path, start_frame, end_frame):
+    def __get_read_format(display_window, pixel_aspect):
+        """
+        Get the format knob value of a Read from the header of its frames (the Reads are created from .nk text, they
+        don't read the header of their file when they are created)
+        :param display_window : x min, y min, x max, y max or None if unknown
+        :param pixel_aspect : pixel aspect ratio or None if unknown
+        :return: format or None
+        """
+        if display_window is None:
+            return None
+        width = display_window[2] - display_window[0] + 1
+        height = display_window[3] - display_window[1] + 1
+        return "%d %d 0 0 %d %d %g" % (width, height, width, height, pixel_aspect if pixel_aspect else 1.0)
+
+    def __create_read_with_postage(self, name, seq_path, start_frame, end_frame, crop_size=None, read_format=None):
         """
         Create a read node with a postage stamp node
         :param name
         :param seq_path
         :param start_frame
         :param end_frame
-        :return: read_node, postage_stamp
+        :param crop_size : width, height of the format to crop the read to or None to not crop it
+        :param read_format : format knob value or None if unknown
+        :return: read_node, crop_node or None, postage_stamp
+        """
+        knobs = {"file": seq_path, "first": start_frame, "last": end_frame, "origfirst": start_frame,
+                 "origlast": end_frame, "origset": True}
+        if read_format is not None:
+            knobs["format"] = read_format
+        read_node = self.__layout_manager.create_node("Read", name=name, **knobs)
+        crop_node = None
+        if crop_size is not None:
+            crop_node = self.__layout_manager.create_node("Crop", name=_PREFIX_CROP + name,
+                                                          box=(0, 0, crop_size[0], crop_size[1]),
+                                                          reformat=False, crop=True, inputs=[read_node])
+        postage_stamp = self.__layout_manager.create_node("PostageStamp", name=_PREFIX_POSTAGE + name,
+                                                          hide_input=True,
+                                                          inputs=[read_node if crop_node is None else crop_node],
+                                                          postage_stamp=True)
+        return read_node, crop_node, postage_stamp
+
+    def __create_utility_copies(self, name, beauty_node, utility_node, utility_layers):
+        """
+        Create the chain of Copy nodes bringing layers of the utility sequence in the beauty
+        :param name
+        :param beauty_node
+        :param utility_node
+        :param utility_layers
+        :return: copy nodes
+        """
+        copy_nodes = []
+        previous_node = beauty_node
+        for utility_layer in utility_layers:
+            # Only the layer is copied (the Copy node copies the alpha by default)
+            copy_node = self.__layout_manager.create_node("Copy",
+                                                          name=_PREFIX_UTILITY_COPY + name + "_" + utility_layer,
+                                                          channels=utility_layer, from0="none", to0="none",
+                                                          inputs=[previous_node, utility_node])
+            copy_nodes.append(copy_node)
+            previous_node = copy_node
+        return copy_nodes
+
+    @staticmethod
+    def __get_crop_size(data_window, display_window):
+        """
+        Get the size of the format to crop a sequence to when its data window goes out of its display window
+        :param data_window
+        :param display_window
+        :return: width, height or None if there is no overscan to crop
         """
-        read_node = nuke.nodes.Read(name=name, file=seq_path, first=start_frame, last=end_frame)
-        postage_stamp = nuke.nodes.PostageStamp(name=_PREFIX_POSTAGE + name, hide_input=True, inputs=[read_node],
-                                                postage_stamp=True)
-        return read_node, postage_stamp
+        if data_window is None or display_window is None or BBox.contains(display_window, data_window):
+            return None
+        return display_window[2] - display_window[0] + 1, display_window[3] - display_window[1] + 1
 
     def __init__(self, config_path, name, var_set, shuffle_mode, merge_mode, layout_manager):
         """
@@ -116,6 +210,8 @@ class UnpackMode:
         self.__config_path = config_path
         self.__var_set = var_set
         self.__start_vars_to_unpack = []
+        # {layer: start variable valid for the layer or None}, the rules are evaluated once per layer name
+        self.__layer_matches = {}
         self.__layout_manager = layout_manager
         self.__shuffle_mode = shuffle_mode
         self.__merge_mode = merge_mode
@@ -164,6 +260,31 @@ class UnpackMode:
         """
         return self.__shuffle_mode is not None and self.__merge_mode is not None
 
+    def __match_layer(self, render_layer):
+        """
+        Get the start variable valid for a layer (memoized)
+        :param render_layer
+        :return: start variable or None
+        """
+        if render_layer not in self.__layer_matches:
+            self.__layer_matches[render_layer] = self.__var_set.get_start_variable_valid_for(render_layer)
+        return self.__layer_matches[render_layer]
+
+    def get_layer_coverage(self, shot_index):
+        """
+        Get the layers of a shot index covered by the rules of the mode and the missed ones (no access to disk)
+        :param shot_index
+        :return: covered layers, missed layers
+        """
+        covered_layers = []
+        missed_layers = []
+        for render_layer in shot_index.get_layers():
+            if self.__match_layer(render_layer) is None:
+                missed_layers.append(render_layer)
+            else:
+                covered_layers.append(render_layer)
+        return covered_layers, missed_layers
+
     def scan_layers(self, shot_path, layer_filter_arr =None):
         """
         Retrieve the layers in the shot corresponding to the variable in ruleset
@@ -171,20 +292,18 @@ class UnpackMode:
         :param layer_filter_arr
         :return:
         """
-        if not os.path.isdir(shot_path):
-            return
-        if shot_path.endswith("render_out"):
-            render_path = shot_path
-        else:
-            render_path = os.path.join(shot_path, "render_out")
-        if not os.path.isdir(render_path):
+        # The index stored in the render catalog avoids scanning a shot not yet scanned in the session
+        shot_index = ShotIndex.get_cached_index(shot_path, use_catalog=True)
+        if shot_index is None:
+            shot_index = ShotIndex.get_index(shot_path)
+        if not shot_index.exists():
             return
         self.__start_vars_to_unpack = []
         layer_type_taken = []
-        for render_layer in os.listdir(render_path):
+        for render_layer in shot_index.get_layers():
             if layer_filter_arr is not None and render_layer not in layer_filter_arr: continue
             # Verify that the layer is in the variable
-            start_var = self.__var_set.get_start_variable_valid_for(render_layer)
+            start_var = self.__match_layer(render_layer)
             if start_var is None: continue
             layer_type = start_var.get_name()
             if layer_type in layer_type_taken:
@@ -217,51 +336,194 @@ class UnpackMode:
                 return True
         return False
 
-    def __unpack_layers(self, shot_path):
+    def __get_layer_seqs(self, shot_index):
+        """
+        Get the last sequences of the layers to unpack
+        :param shot_index
+        :return: {layer: (seq_path, utility_path, start_frame, end_frame, utility_start_frame)}
+        """
+        layer_seqs = {}
+        skipped_layers = []
+        for start_var in self.__start_vars_to_unpack:
+            render_layer = start_var.get_layer()
+            if render_layer in layer_seqs or render_layer in skipped_layers or not shot_index.has_layer(render_layer):
+                continue
+            seq_data = UnpackMode.get_last_seq_from_layer(shot_index.get_layer_path(render_layer))
+            if seq_data is not None:
+                layer_seqs[render_layer] = seq_data
+            else:
+                skipped_layers.append(render_layer)
+        if len(skipped_layers) > 0:
+            print("### Warning : No version accepted by the " +
+                  POLICY_LABELS.get(VersionPolicy.get_current().get_mode(), "current") + " policy for " +
+                  ", ".join(skipped_layers))
+        return layer_seqs
+
+    @staticmethod
+    def __prefetch_channels(layer_seqs, utility_options):
+        """
+        Read the channels of all the layers at once (headers parsed in parallel, from the channel catalog when the
+        frames did not change) so that the shuffle doesn't query the nodes one by one.
+        The utility layers already in the beauty frames (multi part files) are not read again
+        :param layer_seqs : {layer: (seq_path, utility_path, start_frame, end_frame, utility_start_frame)}
+        :param utility_options : {layer: utility layers needed by the mode or None for all}
+        :return: {layer: {"layers": [...], "light_groups": [...], "data_window": bbox, "display_window": bbox,
+                 "utility_data_window": bbox, "utility_layers": layers to copy from the utility or None for all}}
+        """
+        seq_frames = []
+        for seq_path, utility_path, start_frame, _, utility_start_frame in layer_seqs.values():
+            seq_frames.append((seq_path, start_frame))
+            if utility_path is not None:
+                seq_frames.append((utility_path, utility_start_frame))
+        entries = ChannelCatalog.get_current().prefetch(seq_frames)
+        channel_map = {}
+        for render_layer, (seq_path, utility_path, start_frame, _, utility_start_frame) in layer_seqs.items():
+            entry = entries.get((seq_path, start_frame))
+            if entry is None:
+                continue
+            layers = list(entry["layers"])
+            utility_data_window = None
+            utility_layers = []
+            utility_entry = entries.get((utility_path, utility_start_frame)) if utility_path is not None else None
+            if utility_path is not None and utility_entry is None:
+                # Unknown utility channels : the layers listed by the mode and not in the beauty are still copied
+                print("### Warning : Unable to read the channels of the utility sequence of " + render_layer)
+                needed_layers = utility_options.get(render_layer)
+                utility_layers = None if needed_layers is None else \
+                    [layer for layer in needed_layers if layer not in layers]
+            # The utility sequence is joined to the beauty, its layers are shuffled too
+            elif utility_path is not None:
+                utility_layers = [layer for layer in utility_entry["layers"] if layer not in layers]
+                needed_layers = utility_options.get(render_layer)
+                if needed_layers is not None:
+                    utility_layers = [layer for layer in utility_layers if layer in needed_layers]
+                    missing_layers = [layer for layer in needed_layers
+                                      if layer not in layers and layer not in utility_layers]
+                    if len(missing_layers) > 0:
+                        print("### Warning : Utility layers of " + render_layer + " not found : " +
+                              ", ".join(missing_layers))
+                layers.extend(utility_layers)
+                utility_data_window = utility_entry["data_window"]
+                # All the utility layers are merged when the mode doesn't list them
+                if needed_layers is None and len(utility_layers) > 0:
+                    utility_layers = None
+            channel_map[render_layer] = {"layers": layers, "light_groups": ExrHeader.get_light_group_channels(layers),
+                                         "data_window": entry["data_window"],
+                                         "display_window": entry["display_window"],
+                                         "pixel_aspect": entry["pixel_aspect"],
+                                         "utility_data_window": utility_data_window,
+                                         "utility_layers": utility_layers}
+        if UnpackMode.__empty_light_group_threshold is not None:
+            UnpackMode.__prune_empty_light_groups(layer_seqs, channel_map)
+        return channel_map
+
+    @staticmethod
+    def __prune_empty_light_groups(layer_seqs, channel_map):
+        """
+        Remove from the channel map the light groups that are black in sample frames of their layer
+        :param layer_seqs : {layer: (seq_path, utility_path, start_frame, end_frame, utility_start_frame)}
+        :param channel_map : {layer: {"layers": [...], "light_groups": [...]}}
+        :return:
+        """
+        if not ExrPixelStats.is_available():
+            print("### Warning : NumPy is not available, the empty light groups are shuffled")
+            return
+        sample_paths = {}
+        for render_layer, (seq_path, _, start_frame, end_frame, _) in layer_seqs.items():
+            if render_layer in channel_map and len(channel_map[render_layer]["light_groups"]) > 0:
+                sample_paths[render_layer] = [ChannelCatalog.get_frame_path(seq_path, frame) for frame in
+                                              ExrPixelStats.get_sample_frames(start_frame, end_frame)]
+        stats_by_frame = ExrPixelStats.read_many([path for paths in sample_paths.values() for path in paths])
+        for render_layer, paths in sample_paths.items():
+            entry = channel_map[render_layer]
+            empty_light_groups = ExrPixelStats.get_empty_light_groups(
+                [stats_by_frame.get(path) for path in paths], entry["light_groups"],
+                UnpackMode.__empty_light_group_threshold)
+            if len(empty_light_groups) == 0:
+                continue
+            print("Empty light groups of " + render_layer + " not shuffled : " + ", ".join(empty_light_groups))
+            entry["light_groups"] = [light_group for light_group in entry["light_groups"]
+                                     if light_group not in empty_light_groups]
+
+    def __unpack_layers(self, layer_seqs, channel_map):
         """
         Retrieve the layers, create the read node, postages and setup layout options
-        :param shot_path
+        :param layer_seqs : {layer: (seq_path, utility_path, start_frame, end_frame, utility_start_frame)}
+        :param channel_map : channels and windows of the layers read from the EXR headers
         :return:
         """
-        render_path = os.path.join(shot_path, "render_out")
         read_nodes = []
         postage_nodes = []
         # for each layer
         for start_var in self.__start_vars_to_unpack:
             render_layer = start_var.get_layer()
-            layer_path = os.path.join(render_path, render_layer)
-            if not os.path.isdir(layer_path):
-                continue
             # Get the last sequence for the layer
-            seq_data = UnpackMode.get_last_seq_from_layer(layer_path)
+            seq_data = layer_seqs.get(render_layer)
             if seq_data is None:
                 continue
-            seq_path, utility_path, start_frame, end_frame = seq_data
+            seq_path, utility_path, start_frame, end_frame, _ = seq_data
+            # The windows of the layer give the bbox of its branch (None if its header couldn't be read)
+            windows = channel_map.get(render_layer, {})
+            display_window = windows.get("display_window")
+            crop = start_var.get_option(_OPTION_CROP_TO_FORMAT) is True
+            data_window = windows.get("data_window")
+            crop_size = UnpackMode.__get_crop_size(data_window, display_window) if crop else None
+            read_format = UnpackMode.__get_read_format(display_window, windows.get("pixel_aspect"))
+            if crop_size is not None:
+                data_window = BBox.intersection(data_window, display_window)
 
             name = start_var.get_name()
-            read_node, postage_stamp = UnpackMode.__create_read_with_postage(render_layer, seq_path, start_frame, end_frame)
+            read_node, crop_node, postage_stamp = \
+                self.__create_read_with_postage(render_layer, seq_path, start_frame, end_frame, crop_size, read_format)
             postage_nodes.append(postage_stamp)
             to_inputs_backdrop = [read_node]
             to_layer_inputs_backdrop = [postage_stamp]
-            # If Utility exists compute it and connect it
+            if crop_node is not None:
+                to_inputs_backdrop.append(crop_node)
+                self.__layout_manager.add_node_layout_relation(read_node, crop_node, LayoutManager.POS_BOTTOM)
+            # If Utility exists compute it and connect it (unless its layers are already in the beauty frames)
+            utility_layers = windows.get("utility_layers")
+            if utility_path is not None and utility_layers is not None and len(utility_layers) == 0:
+                print("Utility sequence of " + render_layer + " not read : no layer needed out of the beauty")
+                utility_path = None
             if utility_path is not None:
-                utility_read_node, utility_postage_stamp = \
-                    UnpackMode.__create_read_with_postage(_PREFIX_UTILITY + render_layer, utility_path, start_frame, end_frame)
-                merge_node = nuke.nodes.Merge(operation="over", also_merge="all",
-                                              inputs=[utility_postage_stamp, postage_stamp])
-                merge_node.setName(_PREFIX_UTILITY_MERGE + render_layer)
+                utility_data_window = windows.get("utility_data_window")
+                utility_crop_size = UnpackMode.__get_crop_size(utility_data_window, display_window) if crop else None
+                if utility_crop_size is not None:
+                    utility_data_window = BBox.intersection(utility_data_window, display_window)
+                utility_read_node, utility_crop_node, utility_postage_stamp = \
+                    self.__create_read_with_postage(_PREFIX_UTILITY + render_layer, utility_path, start_frame,
+                                                    end_frame, utility_crop_size, read_format)
+                if utility_crop_node is not None:
+                    to_inputs_backdrop.append(utility_crop_node)
+                    self.__layout_manager.add_node_layout_relation(utility_read_node, utility_crop_node,
+                                                                   LayoutManager.POS_BOTTOM)
+                data_window = BBox.union(data_window, utility_data_window)
+                if utility_layers is None:
+                    merge_node = self.__layout_manager.create_node("Merge2", operation="over", also_merge="all",
+                                                                   inputs=[utility_postage_stamp, postage_stamp])
+                    merge_node.setName(_PREFIX_UTILITY_MERGE + render_layer)
+                    join_nodes = [merge_node]
+                else:
+                    join_nodes = self.__create_utility_copies(render_layer, postage_stamp, utility_postage_stamp,
+                                                              utility_layers)
                 read_nodes.append((read_node, utility_read_node))
 
                 to_inputs_backdrop.append(utility_read_node)
                 to_layer_inputs_backdrop.append(utility_postage_stamp)
-                to_layer_inputs_backdrop.append(merge_node)
-                start_var.set_node(merge_node)
+                to_layer_inputs_backdrop.extend(join_nodes)
+                start_var.set_node(join_nodes[-1])
                 self.__layout_manager.add_node_layout_relation(read_node, utility_read_node)
-                self.__layout_manager.add_node_layout_relation(postage_stamp, merge_node, mult_distance=1.3)
-                self.__layout_manager.add_node_layout_relation(merge_node, utility_postage_stamp, LayoutManager.POS_TOP)
+                self.__layout_manager.add_node_layout_relation(postage_stamp, join_nodes[0], mult_distance=1.3)
+                self.__layout_manager.add_node_layout_relation(join_nodes[0], utility_postage_stamp,
+                                                               LayoutManager.POS_TOP)
+                for previous_join_node, join_node in zip(join_nodes, join_nodes[1:]):
+                    self.__layout_manager.add_node_layout_relation(previous_join_node, join_node, mult_distance=0.6)
             else:
-                read_nodes.append((read_node))
+                read_nodes.append((read_node,))
                 start_var.set_node(postage_stamp)
+            start_var.set_bbox(data_window)
+            start_var.set_pass_through(BBox.has_pass_through(windows.get("layers")))
 
             # Get the Backdrops name
             input_layer_bd_longname = ".".join([_BACKDROP_INPUTS, render_layer])
@@ -314,6 +576,8 @@ class UnpackMode:
             else:
                 last = read
 
+        if len(postage_nodes) == 0:
+            return
         curr = postage_nodes[0]
         for postage_node in postage_nodes[1:]:
             self.__layout_manager.add_node_layout_relation(curr, postage_node, LayoutManager.POS_BOTTOM,
@@ -329,8 +593,17 @@ class UnpackMode:
         if len(self.__start_vars_to_unpack) == 0: return
         # Retrieve the bounding box of the current graph to place correctly incoming graph
         self.__layout_manager.compute_current_bbox_graph()
+        layer_seqs = self.__get_layer_seqs(ShotIndex.get_index(shot_path))
+        if len(layer_seqs) == 0:
+            print("### Warning : No layer to unpack in " + shot_path)
+            return
+        # Read the channels and the windows of all the layers before creating the nodes
+        utility_options = dict((start_var.get_layer(), start_var.get_option(_OPTION_UTILITY_LAYERS))
+                               for start_var in self.__start_vars_to_unpack)
+        channel_map = UnpackMode.__prefetch_channels(layer_seqs, utility_options)
+        self.__shuffle_mode.set_channel_map(channel_map)
         # Retrieve Layers and create Start Var (Read nodes)
-        self.__unpack_layers(shot_path)
+        self.__unpack_layers(layer_seqs, channel_map)
         # Shuffle those layers if needed
         self.__shuffle_mode.run()
         # Merge all the nodes with right rules
@@ -339,3 +612,5 @@ class UnpackMode:
         self.__layout_manager.build_layout_node_graph()
         # Organize all the backdrops
         self.__layout_manager.build_layout_backdrops()
+        # Create all the nodes in the script at once
+        self.__layout_manager.paste_graph()
@@ -0,0 +1,132 @@
+import time
+
+# ######################################################################################################################
+
+POLICY_LATEST = "latest"
+POLICY_LATEST_COMPLETE = "latest_complete"
+POLICY_LATEST_STABLE = "latest_stable"
+POLICIES = [POLICY_LATEST, POLICY_LATEST_COMPLETE, POLICY_LATEST_STABLE]
+POLICY_LABELS = {
+    POLICY_LATEST: "Latest",
+    POLICY_LATEST_COMPLETE: "Latest complete",
+    POLICY_LATEST_STABLE: "Latest stable",
+}
+
+# Seconds without any new frame before a version is considered as stable
+DEFAULT_SETTLE_TIME = 300
+
+
+# ######################################################################################################################
+
+
+class VersionPolicy:
+    """
+    Policy choosing the version of a layer to use among the versions of the shot index
+    """
+    __current = None
+
+    @staticmethod
+    def get_current():
+        """
+        Getter of the policy used when no policy is given
+        :return: current policy
+        """
+        if VersionPolicy.__current is None:
+            VersionPolicy.__current = VersionPolicy()
+        return VersionPolicy.__current
+
+    @staticmethod
+    def set_current(policy):
+        """
+        Setter of the policy used when no policy is given
+        :param policy
+        :return:
+        """
+        VersionPolicy.__current = policy
+
+    def __init__(self, mode=POLICY_LATEST, settle_time=DEFAULT_SETTLE_TIME, expected_range=None):
+        """
+        Constructor
+        :param mode : latest, latest_complete or latest_stable
+        :param settle_time : seconds without new frame for a version to be stable
+        :param expected_range : (first frame, last frame) that a complete version must contain
+        """
+        self.__mode = mode if mode in POLICIES else POLICY_LATEST
+        self.__settle_time = settle_time
+        self.__expected_range = expected_range
+
+    def get_mode(self):
+        """
+        Getter of the mode
+        :return: mode
+        """
+        return self.__mode
+
+    def get_settle_time(self):
+        """
+        Getter of the settle time
+        :return: settle time
+        """
+        return self.__settle_time
+
+    def get_expected_range(self):
+        """
+        Getter of the expected frame range
+        :return: expected range
+        """
+        return self.__expected_range
+
+    def is_complete(self, beauty_seq):
+        """
+        Check if a beauty sequence is complete : all the frames of the expected range or no gap.
+        An expected range that doesn't overlap the sequence at all (frame range of the script not set) is ignored
+        :param beauty_seq
+        :return: is complete
+        """
+        if beauty_seq.is_empty():
+            return False
+        if self.__expected_range is not None:
+            first_frame, last_frame = self.__expected_range
+            if first_frame <= beauty_seq.get_end() and last_frame >= beauty_seq.get_start():
+                return beauty_seq.is_complete(first_frame, last_frame)
+        return beauty_seq.get_missing_count() == 0
+
+    def accepts(self, beauty_seq, mtime, now=None, complete=None):
+        """
+        Check if a version is accepted by the policy
+        :param beauty_seq
+        :param mtime : time of the last frame written in the version
+        :param now
+        :param complete : completion state given by the manifest of the layer, None if unknown
+        :return: is accepted
+        """
+        if beauty_seq.is_empty():
+            return False
+        if self.__mode == POLICY_LATEST:
+            return True
+        if complete is False or (complete is None and not self.is_complete(beauty_seq)):
+            return False
+        if self.__mode == POLICY_LATEST_STABLE:
+            if mtime is None:
+                return False
+            now = time.time() if now is None else now
+            return now - mtime >= self.__settle_time
+        return True
+
+    def resolve(self, shot_index, layer, now=None):
+        """
+        Get the last version of a layer accepted by the policy (only from the shot index, without any access to disk)
+        :param shot_index
+        :param layer
+        :param now
+        :return: version, beauty sequence, utility sequence or None
+        """
+        now = time.time() if now is None else now
+        for version in reversed(shot_index.get_versions(layer)):
+            beauty_seq, utility_seq = shot_index.get_frame_sequences(layer, version)
+            manifest_entry = shot_index.get_manifest_entry(layer, version)
+            complete = manifest_entry.get("complete") if manifest_entry is not None else None
+            if self.accepts(beauty_seq, shot_index.get_version_mtime(layer, version), now,
+                            complete if isinstance(complete, bool) else None):
+                return version, beauty_seq, utility_seq
+        return None
@@ -0,0 +1,52 @@
+"""
+Estimate the cost of the comp an unpack mode would build on shots (nodes by class, channels carried through each
+Merge, memory of a frame at the data windows of the layers) from the render_out trees and the EXR headers, without
+Nuke. With --max-memory the exit code is 1 when a shot goes over the limit, to check the shots before sending them
+to the render nodes.
+
+Usage : python estimate_comp_cost.py <shot path> [<shot path> ...] [--mode <unpack mode json>] [--max-memory <MB>]
+"""
+import argparse
+import importlib
+import os
+import sys
+
+_PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(_PACKAGE_DIR))
+_PACKAGE_NAME = os.path.basename(_PACKAGE_DIR)
+_DEFAULT_MODE_PATH = os.path.join(_PACKAGE_DIR, "mode", "classic_unpack_mode.json")
+
+
+# ######################################################################################################################
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Estimate the cost of the comp of an unpack mode on shots")
+    parser.add_argument("paths", nargs="+", help="shot or render_out folders")
+    parser.add_argument("--mode", default=_DEFAULT_MODE_PATH, help="unpack mode config file")
+    parser.add_argument("--max-memory", type=float, default=None,
+                        help="memory of a frame in MB over which the shot is reported (exit code 1)")
+    args = parser.parse_args()
+
+    estimator_cls = importlib.import_module(_PACKAGE_NAME + ".CompCostEstimator").CompCostEstimator
+    catalog_cls = importlib.import_module(_PACKAGE_NAME + ".ChannelCatalog").ChannelCatalog
+    try:
+        estimator = estimator_cls.from_mode_file(args.mode)
+    except (IOError, OSError, ValueError) as e:
+        print("### Warning : Unable to read the unpack mode " + args.mode + " : " + str(e))
+        sys.exit(2)
+    over_limit = False
+    for path in args.paths:
+        cost = estimator.estimate(path)
+        print(path)
+        for line in cost.get_report():
+            print("    " + line)
+        if args.max_memory is not None and cost.get_frame_bytes() > args.max_memory * 1024 * 1024:
+            print("### Warning : %s goes over %.0f MB per frame" % (path, args.max_memory))
+            over_limit = True
+    catalog_cls.get_current().save()
+    sys.exit(1 if over_limit else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Write the manifest.json of the layer folders of existing render_out trees, so that the panel reads one small file per
+layer instead of listing all the version folders.
+The versions still being written (modified less than 2 seconds ago) are written without mtime and are always listed.
+With --channels, the channels of each version are read from the header of its first frame (without Nuke).
+
+Usage : python generate_manifests.py <shot or render_out path> [<shot or render_out path> ...] [--complete] [--channels]
+"""
+import argparse
+import importlib
+import os
+import sys
+
+_PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(_PACKAGE_DIR))
+_PACKAGE_NAME = os.path.basename(_PACKAGE_DIR)
+
+
+# ######################################################################################################################
+
+
+def list_dir(path):
+    """
+    List the sub directories and files of a directory
+    :param path
+    :return: dirs, files
+    """
+    dirs = []
+    files = []
+    with os.scandir(path) as it:
+        for entry in it:
+            if entry.is_dir():
+                dirs.append(entry.name)
+            else:
+                files.append(entry.name)
+    return dirs, files
+
+
+def read_version_channels(exr_header_cls, version_path, version, entry):
+    """
+    Read the channels of a version from the header of its first beauty frame
+    :param exr_header_cls
+    :param version_path
+    :param version
+    :param entry : manifest entry of the version
+    :return: channel names or None if the version has no readable frame
+    """
+    if len(entry["frames"]) == 0:
+        return None
+    frame_path = version_path + "/" + "%s.%04d.exr" % (version, entry["frames"][0][0])
+    try:
+        return exr_header_cls.read(frame_path).get_channels()
+    except (IOError, OSError, ValueError) as e:
+        print("### Warning : Unable to read the header of " + frame_path + " : " + str(e))
+        return None
+
+
+def generate_layer_manifest(render_manifest_cls, layer_path, complete, exr_header_cls=None):
+    """
+    Write the manifest of a layer folder
+    :param render_manifest_cls
+    :param layer_path
+    :param complete : mark the versions without missing frames as complete
+    :param exr_header_cls : read the channels of the versions if not None
+    :return: number of versions
+    """
+    entries = {}
+    for version in list_dir(layer_path)[0]:
+        version_path = layer_path + "/" + version
+        # Stat before listing : a frame written during the listing makes the entry stale
+        stat_result = os.stat(version_path)
+        filenames = list_dir(version_path)[1]
+        entry = render_manifest_cls.build_version_entry(version, filenames, stat_result)
+        if exr_header_cls is not None:
+            channels = read_version_channels(exr_header_cls, version_path, version, entry)
+            if channels is not None:
+                entry["channels"] = channels
+        if complete:
+            entry["complete"] = len(entry["frames"]) == 1
+        entries[version] = entry
+    render_manifest_cls.write(layer_path, entries)
+    return len(entries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write the manifests of the layers of render_out folders")
+    parser.add_argument("paths", nargs="+", help="shot or render_out folders")
+    parser.add_argument("--complete", action="store_true",
+                        help="write the completion state (complete when the beauty frames have no gap)")
+    parser.add_argument("--channels", action="store_true",
+                        help="write the channels read from the header of the first frame of each version")
+    args = parser.parse_args()
+
+    shot_index_cls = importlib.import_module(_PACKAGE_NAME + ".ShotIndex").ShotIndex
+    render_manifest_cls = importlib.import_module(_PACKAGE_NAME + ".RenderManifest").RenderManifest
+    exr_header_cls = importlib.import_module(_PACKAGE_NAME + ".ExrHeader").ExrHeader if args.channels else None
+    for path in args.paths:
+        render_path = shot_index_cls.get_shot_render_path(path)
+        if not os.path.isdir(render_path):
+            print("### Warning : " + render_path + " is not a folder")
+            continue
+        for layer in sorted(list_dir(render_path)[0]):
+            layer_path = render_path + "/" + layer
+            try:
+                nb_versions = generate_layer_manifest(render_manifest_cls, layer_path, args.complete,
+                                                      exr_header_cls)
+            except (IOError, OSError) as e:
+                print("### Warning : Unable to write the manifest of " + layer_path + " : " + str(e))
+                continue
+            print("%s : %d versions" % (render_manifest_cls.get_manifest_path(layer_path), nb_versions))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""
+Local stand-in of an S3 service serving the folders of a directory as buckets (ListObjectsV2, HEAD and ranged GET,
+without authentication) to try the S3 storage backend without an object store.
+
+Usage : python s3_standin_server.py <root dir> [--port 9000] [--page-size 1000]
+Then : AUTO_COMP_S3_ENDPOINT=http://localhost:9000 and shot paths like s3://<folder of root dir>/<shot>
+"""
+import argparse
+import email.utils
+import os
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+from xml.sax.saxutils import escape
+
+
+# ######################################################################################################################
+
+
+def list_keys(bucket_dir):
+    """
+    List all the files of a bucket folder as sorted keys
+    :param bucket_dir
+    :return: [(key, size, mtime)]
+    """
+    keys = []
+    for dir_path, _, filenames in os.walk(bucket_dir):
+        for filename in filenames:
+            file_path = os.path.join(dir_path, filename)
+            stat_result = os.stat(file_path)
+            key = os.path.relpath(file_path, bucket_dir).replace(os.sep, "/")
+            keys.append((key, stat_result.st_size, stat_result.st_mtime))
+    keys.sort()
+    return keys
+
+
+def format_iso_time(timestamp):
+    """
+    Format a time like the listings of S3
+    :param timestamp
+    :return: text
+    """
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(timestamp)) + ".%03dZ" % (int(timestamp * 1000) % 1000)
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    root_dir = "."
+    page_size = 1000
+    request_count = 0
+
+    def __resolve(self):
+        """
+        Get the bucket, the key and the query of the request
+        :return: bucket, key, query
+        """
+        url = urlsplit(self.path)
+        bucket, _, key = unquote(url.path).lstrip("/").partition("/")
+        return bucket, key, parse_qs(url.query, keep_blank_values=True)
+
+    def __send(self, status, body=b"", headers=None):
+        """
+        Send a response
+        :param status
+        :param body
+        :param headers
+        :return:
+        """
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def __list_objects(self, bucket_dir, query):
+        """
+        Answer a ListObjectsV2 request
+        :param bucket_dir
+        :param query
+        :return:
+        """
+        prefix = query.get("prefix", [""])[0]
+        delimiter = query.get("delimiter", [""])[0]
+        max_keys = min(int(query.get("max-keys", [str(self.page_size)])[0]), self.page_size)
+        start_after = query.get("continuation-token", [""])[0]
+        contents = []
+        common_prefixes = []
+        next_token = None
+        for key, size, mtime in list_keys(bucket_dir):
+            if not key.startswith(prefix) or key <= start_after:
+                continue
+            if len(contents) + len(common_prefixes) >= max_keys:
+                next_token = start_after
+                break
+            rest = key[len(prefix):]
+            if delimiter and delimiter in rest:
+                common_prefix = prefix + rest.split(delimiter)[0] + delimiter
+                if common_prefix not in common_prefixes:
+                    common_prefixes.append(common_prefix)
+                # The next page starts after all the keys of the common prefix
+                start_after = common_prefix + "￿"
+                continue
+            contents.append("<Contents><Key>%s</Key><LastModified>%s</LastModified><Size>%d</Size></Contents>" %
+                            (escape(key), format_iso_time(mtime), size))
+            start_after = key
+        body = "<?xml version=\"1.0\" encoding=\"UTF-8\"?>" \
+               "<ListBucketResult xmlns=\"http://s3.amazonaws.com/doc/2006-03-01/\">" \
+               "<Prefix>%s</Prefix><KeyCount>%d</KeyCount><IsTruncated>%s</IsTruncated>%s%s%s</ListBucketResult>" % \
+               (escape(prefix), len(contents) + len(common_prefixes), "true" if next_token else "false",
+                "<NextContinuationToken>%s</NextContinuationToken>" % escape(next_token) if next_token else "",
+                "".join(contents),
+                "".join("<CommonPrefixes><Prefix>%s</Prefix></CommonPrefixes>" % escape(common_prefix)
+                        for common_prefix in common_prefixes))
+        self.__send(200, body.encode("utf-8"), {"Content-Type": "application/xml"})
+
+    def do_GET(self):
+        StandInHandler.request_count += 1
+        bucket, key, query = self.__resolve()
+        bucket_dir = os.path.join(self.root_dir, bucket)
+        if not bucket or not os.path.isdir(bucket_dir):
+            self.__send(404)
+            return
+        if not key and query.get("list-type", [""])[0] == "2":
+            self.__list_objects(bucket_dir, query)
+            return
+        file_path = os.path.join(bucket_dir, key)
+        if not key or not os.path.isfile(file_path):
+            self.__send(404)
+            return
+        stat_result = os.stat(file_path)
+        headers = {"Last-Modified": email.utils.formatdate(stat_result.st_mtime, usegmt=True)}
+        if self.command == "HEAD":
+            self.send_response(200)
+            self.send_header("Content-Length", str(stat_result.st_size))
+            self.send_header("Last-Modified", headers["Last-Modified"])
+            self.end_headers()
+            return
+        with open(file_path, "rb") as f:
+            data = f.read()
+        range_header = self.headers.get("Range")
+        if range_header is None:
+            self.__send(200, data, headers)
+            return
+        first, _, last = range_header.replace("bytes=", "").partition("-")
+        first = int(first)
+        last = int(last) if last else len(data) - 1
+        if first >= len(data):
+            self.__send(416)
+            return
+        headers["Content-Range"] = "bytes %d-%d/%d" % (first, min(last, len(data) - 1), len(data))
+        self.__send(206, data[first:last + 1], headers)
+
+    def do_HEAD(self):
+        self.do_GET()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in of an S3 service")
+    parser.add_argument("root_dir", help="directory whose folders are served as buckets")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--page-size", type=int, default=1000, help="maximum number of keys of a listing page")
+    args = parser.parse_args()
+    StandInHandler.root_dir = os.path.abspath(args.root_dir)
+    StandInHandler.page_size = args.page_size
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), StandInHandler)
+    print("Serving %s on http://127.0.0.1:%d" % (StandInHandler.root_dir, args.port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Benchmark of the render_out scan with an injected latency on each directory access to simulate a network share.
+Compare the serial scan (1 thread) and the parallel scan.
+
+Usage : python scan_benchmark.py [--layers 40] [--versions 5] [--frames 100] [--latency 0.02] [--threads 8]
+"""
+import argparse
+import importlib
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+_PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(_PACKAGE_DIR))
+_PACKAGE_NAME = os.path.basename(_PACKAGE_DIR)
+
+
+# ######################################################################################################################
+
+
+def build_tree(root, nb_layers, nb_versions, nb_frames):
+    """
+    Build a fake shot with a render_out folder
+    :param root
+    :param nb_layers
+    :param nb_versions
+    :param nb_frames
+    :return: shot path
+    """
+    shot_path = os.path.join(root, "shot")
+    for i_layer in range(nb_layers):
+        layer = "LAYER_%02d" % i_layer
+        for i_version in range(1, nb_versions + 1):
+            version = "%s.%04d" % (layer, i_version)
+            version_path = os.path.join(shot_path, "render_out", layer, version)
+            os.makedirs(version_path)
+            for frame in range(1001, 1001 + nb_frames):
+                open(os.path.join(version_path, "%s.%04d.exr" % (version, frame)), "w").close()
+    return shot_path
+
+
+def inject_latency(root, latency):
+    """
+    Add a latency to os.scandir and os.stat for the paths inside root
+    :param root
+    :param latency
+    :return:
+    """
+    scandir = os.scandir
+    stat = os.stat
+
+    def __slow_scandir(path="."):
+        if str(path).startswith(root):
+            time.sleep(latency)
+        return scandir(path)
+
+    def __slow_stat(path, *args, **kwargs):
+        if str(path).startswith(root):
+            time.sleep(latency)
+        return stat(path, *args, **kwargs)
+
+    os.scandir = __slow_scandir
+    os.stat = __slow_stat
+
+
+def run(shot_index_cls, shot_path, threads):
+    """
+    Run a cold scan (empty scan cache) with a number of threads
+    :param shot_index_cls
+    :param shot_path
+    :param threads
+    :return: duration, shot index
+    """
+    os.environ["AUTO_COMP_CACHE_DIR"] = tempfile.mkdtemp(prefix="auto_comp_bench_cache_")
+    shot_index_cls.set_scan_threads(threads)
+    start = time.time()
+    shot_index = shot_index_cls.get_index(shot_path, refresh=True)
+    duration = time.time() - start
+    shutil.rmtree(os.environ["AUTO_COMP_CACHE_DIR"], ignore_errors=True)
+    return duration, shot_index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark of the serial and parallel render_out scans")
+    parser.add_argument("--layers", type=int, default=40)
+    parser.add_argument("--versions", type=int, default=5)
+    parser.add_argument("--frames", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds added to each directory access")
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    shot_index_cls = importlib.import_module(_PACKAGE_NAME + ".ShotIndex").ShotIndex
+    root = tempfile.mkdtemp(prefix="auto_comp_bench_")
+    try:
+        shot_path = build_tree(root, args.layers, args.versions, args.frames)
+        inject_latency(root, args.latency)
+        serial_duration, serial_index = run(shot_index_cls, shot_path, 1)
+        parallel_duration, parallel_index = run(shot_index_cls, shot_path, args.threads)
+        same = all(serial_index.get_versions(layer) == parallel_index.get_versions(layer)
+                   for layer in serial_index.get_layers()) and \
+            serial_index.get_layers() == parallel_index.get_layers()
+        print("Layers : %d, Versions per layer : %d, Frames per version : %d, Latency : %.3fs" %
+              (args.layers, args.versions, args.frames, args.latency))
+        print("Serial   (1 thread)   : %.3fs" % serial_duration)
+        print("Parallel (%d threads) : %.3fs" % (args.threads, parallel_duration))
+        print("Speedup : x%.1f, Same result : %s" % (serial_duration / max(parallel_duration, 1e-6), same))
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()